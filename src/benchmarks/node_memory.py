@@ -0,0 +1,129 @@
+"""
+Memory held by the nodes of every IR layer (AST, typed AST, CIL and MIPS) for
+a large synthetic program, with the slotted node classes against the same
+classes keeping their fields in a per-instance __dict__ (the node modules are
+loaded with their __slots__ declarations removed).
+
+Each layout runs in its own process: once under tracemalloc, for the bytes a
+phase retains per node it builds (the nodes and the lists and strings they
+hold), and once without it, for the peak RSS.
+
+    python -m benchmarks.node_memory [classes]
+"""
+import gc
+import importlib.util
+import json
+import re
+import resource
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.programs import check_program, parse_program, synthetic_program
+
+NODE_MODULES = [
+    "semantic.ast_nodes",
+    "code_gen.ast_typed_nodes",
+    "cmp.cil",
+    "code_gen.mips_nodes",
+]
+LAYOUTS = ["dict", "slots"]
+
+
+def install_dict_layout():
+    for name in NODE_MODULES:
+        spec = importlib.util.find_spec(name)
+        source = Path(spec.origin).read_text()
+        source = re.sub(r"^(\s+)__slots__ = .*$", r"\1pass", source, flags=re.M)
+
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        exec(compile(source, spec.origin, "exec"), module.__dict__)
+
+
+def fields(node):
+    for cls in type(node).__mro__:
+        for key in getattr(cls, "__slots__", ()):
+            if hasattr(node, key):
+                yield getattr(node, key)
+    yield from getattr(node, "__dict__", {}).values()
+
+
+def count_nodes(root, module):
+    seen = set()
+    pending = [root]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif type(value).__module__ == module and id(value) not in seen:
+            seen.add(id(value))
+            pending.extend(fields(value))
+    return len(seen)
+
+
+def run_layout(layout, classes, trace):
+    if layout == "dict":
+        install_dict_layout()
+
+    from code_gen.cil_builder import CILBuilder
+    from code_gen.mips_builder import MIPSBuilder
+    from code_gen.runtime import load_runtime
+
+    text = synthetic_program(classes)
+    runtime = load_runtime()
+
+    phases = [
+        ("ast", "semantic.ast_nodes", parse_program),
+        ("typed-ast", "code_gen.ast_typed_nodes", check_program),
+        ("cil", "cmp.cil", lambda typed_ast: CILBuilder().visit(typed_ast)),
+        ("mips", "code_gen.mips_nodes", lambda cil_ast: MIPSBuilder(runtime=runtime).visit(cil_ast)),
+    ]
+
+    if trace:
+        tracemalloc.start()
+
+    layers = {}
+    value = text
+    kept = []  # every layer stays alive, as in the compiler
+    for name, module, phase in phases:
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0] if trace else 0
+        value = phase(value)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0] if trace else 0
+        kept.append(value)
+        layers[name] = (count_nodes(value, module), after - before)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {"layers": layers, "peak_rss": peak_rss}
+
+
+def measure(layout, classes, trace):
+    args = [sys.executable, "-m", "benchmarks.node_memory", "--worker", layout, str(classes)]
+    if trace:
+        args.append("--trace")
+    sp = subprocess.run(args, capture_output=True, check=True)
+    return json.loads(sp.stdout.decode().splitlines()[-1])
+
+
+def main(classes=300):
+    traced = {layout: measure(layout, classes, True)["layers"] for layout in LAYOUTS}
+    peak_rss = {layout: measure(layout, classes, False)["peak_rss"] for layout in LAYOUTS}
+
+    print(f"{classes} classes")
+    print(f"{'layer':<10} {'nodes':>9} " + " ".join(f"{layout + ' B/node':>13}" for layout in LAYOUTS))
+    for name, (nodes, _) in traced["slots"].items():
+        per_node = [traced[layout][name][1] / traced[layout][name][0] for layout in LAYOUTS]
+        print(f"{name:<10} {nodes:>9} " + " ".join(f"{value:>13.1f}" for value in per_node))
+    print(f"{'peak RSS':<20} " + " ".join(f"{peak_rss[layout] / 2 ** 20:>10.1f} MB" for layout in LAYOUTS))
+
+
+if __name__ == "__main__":
+    sys.setrecursionlimit(10000)
+    if sys.argv[1:2] == ["--worker"]:
+        layout, classes = sys.argv[2], int(sys.argv[3])
+        print(json.dumps(run_layout(layout, classes, "--trace" in sys.argv)))
+    else:
+        main(*map(int, sys.argv[1:]))
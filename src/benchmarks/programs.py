@@ -0,0 +1,60 @@
+"""
+Synthetic COOL programs for the benchmarks, and the compiler front end to
+turn them into ASTs.
+"""
+
+CLASS_TEMPLATE = """
+class C{i} {{
+    io : IO <- new IO;
+    x : Int <- {i};
+    s : String <- "c{i}";
+    f(a : Int, b : Int) : Int {{
+        let y : Int <- a * b + x in
+            if y < 10 then y + 1 else {{ y <- y - 1; ~y; }} fi
+    }};
+    g() : Object {{
+        {{ io.out_string(s.concat("!")); io.out_int(f(x, 2)); isvoid self; not true; }}
+    }};
+}};
+"""
+
+MAIN = """
+class Main inherits IO {
+    main() : Object { out_string("done") };
+};
+"""
+
+
+def synthetic_program(classes):
+    return "".join(CLASS_TEMPLATE.format(i=i) for i in range(classes)) + MAIN
+
+
+def parse_program(text):
+    from parsing.cool_grammar import define_cool_grammar
+    from parsing.lexical_analizer import tokenize_cool_text
+    from parsing.shift_reduce_parsers import LR1Parser
+    from cmp.evaluation import evaluate_reverse_parse
+
+    errors = []
+    grammar, idx, type_id, string, num = define_cool_grammar()
+    tokens = tokenize_cool_text(grammar, idx, type_id, string, num, text, errors)
+    parse, operations = LR1Parser(grammar, errors)(tokens)
+    assert not errors, errors
+    return evaluate_reverse_parse(parse, operations, tokens)
+
+
+def check_program(ast):
+    from semantic.type_collector import TypeCollector
+    from semantic.type_builder import TypeBuilder
+    from semantic.type_checker import TypeChecker
+
+    errors = []
+    for phase in [TypeCollector(errors), TypeBuilder(errors)]:
+        ast = phase.visit(ast)
+    _, typed_ast = TypeChecker(errors).visit(ast)
+    assert not errors, errors
+    return typed_ast
+
+
+def typed_program(classes):
+    return check_program(parse_program(synthetic_program(classes)))
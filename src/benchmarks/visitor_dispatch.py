@@ -0,0 +1,93 @@
+"""
+Visitor calls per second over a large typed AST, with the MRO-cached dispatch
+of cmp.visitor against the previous dispatch (exact class lookup, falling back
+to calling every handler registered for a superclass).
+
+    python -m benchmarks.visitor_dispatch [classes]
+"""
+import gc
+import sys
+import time
+
+import cmp.visitor as visitor
+from benchmarks.programs import typed_program
+
+
+class LegacyDispatcher(visitor.Dispatcher):
+    def __call__(self, *args, **kw):
+        typ = args[self.param_index].__class__
+        d = self.targets.get(typ)
+        if d is not None:
+            return d(*args, **kw)
+        else:
+            issub = issubclass
+            t = self.targets
+            ks = t.keys()
+            ans = [t[k](*args, **kw) for k in ks if issub(typ, k)]
+            if len(ans) == 1:
+                return ans.pop()
+            return ans
+
+
+class CountingDispatcher(visitor.Dispatcher):
+    calls = 0
+
+    def __call__(self, *args, **kw):
+        CountingDispatcher.calls += 1
+        return visitor.Dispatcher.__call__(self, *args, **kw)
+
+
+def dispatchers(*visitor_types):
+    return [visitor_type.visit.dispatcher for visitor_type in visitor_types]
+
+
+def measure(dispatcher_type, run, dispatchers, program, repeat=20):
+    for dispatcher in dispatchers:
+        dispatcher.__class__ = dispatcher_type
+    best = None
+    for _ in range(repeat):
+        # a run is a few milliseconds, a collection in the middle of one
+        # would be most of what it measures
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run(program)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    for dispatcher in dispatchers:
+        dispatcher.__class__ = visitor.Dispatcher
+    return best
+
+
+def main(classes=200):
+    from parsing.visitor_type_ast import FormatVisitorTypedAst
+    from code_gen.cil_builder import CILBuilder
+
+    program = typed_program(classes)
+
+    benchmarks = [
+        ("FormatVisitorTypedAst", lambda ast: FormatVisitorTypedAst().visit(ast), dispatchers(FormatVisitorTypedAst)),
+        ("CILBuilder", lambda ast: CILBuilder().visit(ast), dispatchers(CILBuilder)),
+    ]
+
+    print(f"{classes} classes")
+    for name, run, visitor_dispatchers in benchmarks:
+        CountingDispatcher.calls = 0
+        measure(CountingDispatcher, run, visitor_dispatchers, program, repeat=1)
+        calls = CountingDispatcher.calls
+
+        legacy = measure(LegacyDispatcher, run, visitor_dispatchers, program)
+        cached = measure(visitor.Dispatcher, run, visitor_dispatchers, program)
+        print(
+            f"{name:<22} {calls} calls  "
+            f"legacy {calls / legacy:12.0f} calls/s  "
+            f"mro-cached {calls / cached:12.0f} calls/s  "
+            f"({legacy / cached:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -2,10 +2,12 @@ import cmp.visitor as visitor
 
 
 class Node:
-    pass
+    __slots__ = ()
 
 
 class ProgramNode(Node):
+    __slots__ = ("dottypes", "dotdata", "dotcode")
+
     def __init__(self, dottypes, dotdata, dotcode):
         self.dottypes = dottypes
         self.dotdata = dotdata
@@ -13,19 +15,60 @@ class ProgramNode(Node):
 
 
 class TypeNode(Node):
-    def __init__(self, name):
+    __slots__ = ("name", "parent", "attributes", "methods")
+
+    def __init__(self, name, parent=None):
         self.name = name
+        self.parent = parent  # name of the parent type, None for Object
         self.attributes = []
         self.methods = []
 
 
+# ids of the built-in types, they don't depend on the program (the runtime is
+# built once): IO, the only one a class can inherit from, is numbered last
+BUILTIN_TYPE_IDS = {"Object": 0, "Int": 1, "String": 2, "Bool": 3, "IO": 4}
+
+
+def type_intervals(parents):
+    """
+    Numbers the types descending from Object in depth first preorder, given the
+    parent of every type (None for Object). Returns the id of each type and the
+    last id in its subtree: the types conforming to a type are the ones with
+    an id in its interval. Children are numbered in the order of
+    BUILTIN_TYPE_IDS, then by name.
+    """
+    children = {}
+    for name, parent in parents.items():
+        children.setdefault(parent, []).append(name)
+    for names in children.values():
+        names.sort(key=lambda name: (BUILTIN_TYPE_IDS.get(name, len(BUILTIN_TYPE_IDS)), name))
+
+    intervals = {}
+    order = []
+    pending = [("Object", False)]
+    while pending:
+        name, finished = pending.pop()
+        if finished:
+            intervals[name] = (intervals[name][0], len(order) - 1)
+            continue
+        intervals[name] = (len(order), None)
+        order.append(name)
+        pending.append((name, True))
+        pending.extend((child, False) for child in reversed(children.get(name, [])))
+    return intervals
+
+
 class DataNode(Node):
+    __slots__ = ("name", "value")
+
     def __init__(self, vname, value):
         self.name = vname
         self.value = value
 
 
 class FunctionNode(Node):
+    __slots__ = ("name", "params", "localvars", "instructions")
+
     def __init__(self, fname, params, localvars, instructions):
         self.name = fname
         self.params = params
@@ -34,26 +77,34 @@ class FunctionNode(Node):
 
 
 class ParamNode(Node):
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
 
 class LocalNode(Node):
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
 
 class InstructionNode(Node):
-    pass
+    __slots__ = ()
 
 
 class AssignNode(InstructionNode):
+    __slots__ = ("dest", "source")
+
     def __init__(self, dest, source):
         self.dest = dest
         self.source = source
 
 
 class ArithmeticNode(InstructionNode):
+    __slots__ = ("dest", "left", "right")
+
     def __init__(
         self,
         dest,
@@ -66,54 +117,60 @@ class ArithmeticNode(InstructionNode):
 
 
 class PlusNode(ArithmeticNode):
-    pass
+    __slots__ = ()
 
 
 class MinusNode(ArithmeticNode):
-    pass
+    __slots__ = ()
 
 
 class StarNode(ArithmeticNode):
-    pass
+    __slots__ = ()
 
 
 class DivNode(ArithmeticNode):
-    pass
+    __slots__ = ()
 
 
 class LessNode(ArithmeticNode):
-    pass
+    __slots__ = ()
 
 
 class LessEqualNode(ArithmeticNode):
-    pass
+    __slots__ = ()
 
 
 class EqualNode(ArithmeticNode):
-    pass
+    __slots__ = ()
 
 
 class StrEqualNode(ArithmeticNode):
-    pass
+    __slots__ = ()
 
 
 class UnaryNode(InstructionNode):
+    __slots__ = ("dest", "expr")
+
     def __init__(self, dest, expr):
         self.dest = dest
         self.expr = expr
 
 
 class NotNode(UnaryNode):
-    pass
+    __slots__ = ()
 
 
 class IntComplementNode(UnaryNode):
+    __slots__ = ("source",)
+
     def __init__(self, dest, source):
         self.source = source
         self.dest = dest
 
 
 class GetAttribNode(InstructionNode):
+    __slots__ = ("dest", "instance", "attr", "type")
+
     def __init__(self, dest, instance, attr, typex):
         self.dest = dest
         self.instance = instance
@@ -122,6 +179,8 @@ class GetAttribNode(InstructionNode):
 
 
 class SetAttribNode(InstructionNode):
+    __slots__ = ("instance", "value", "attr", "type")
+
     def __init__(self, instance, attr, value, typex):
         self.instance = instance
         self.value = value
@@ -130,12 +189,16 @@ class SetAttribNode(InstructionNode):
 
 
 class AllocateNode(InstructionNode):
+    __slots__ = ("type", "dest")
+
     def __init__(self, itype, dest):
         self.type = itype
         self.dest = dest
 
 
 class TypeOfNode(InstructionNode):
+    __slots__ = ("obj", "dest", "flag", "type")
+
     def __init__(self, obj, dest, flag=False, typex=None):
         self.obj = obj
         self.dest = dest
@@ -144,57 +207,80 @@ class TypeOfNode(InstructionNode):
 
 
 class LabelNode(InstructionNode):
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
 
 class GotoNode(InstructionNode):
+    __slots__ = ("label",)
+
     def __init__(self, label):
         self.label = label
 
 
 class GotoIfNode(InstructionNode):
+    __slots__ = ("condition", "label")
+
     def __init__(self, condition, label):
         self.condition = condition
         self.label = label
 
 
 class StaticCallNode(InstructionNode):
+    __slots__ = ("function", "dest")
+
     def __init__(self, function, dest):
         self.function = function
         self.dest = dest
 
 
 class DynamicCallNode(InstructionNode):
-    def __init__(self, instance_type, method_index, dest):
+    __slots__ = ("instance_type", "method_index", "dest", "static_type")
+
+    def __init__(self, instance_type, method_index, dest, static_type=None):
         self.instance_type = instance_type
         self.method_index = method_index
         self.dest = dest
+        # static type of the receiver, only given when the receiver can't be
+        # void (the call may then be bound to the method of that type)
+        self.static_type = static_type
 
 
 class ArgNode(InstructionNode):
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
 
 class ReturnNode(InstructionNode):
+    __slots__ = ("value",)
+
     def __init__(self, value=None):
         self.value = value
 
 
 class LoadNode(InstructionNode):
+    __slots__ = ("dest", "msg")
+
     def __init__(self, dest, msg):
         self.dest = dest
         self.msg = msg
 
 
 class LengthNode(InstructionNode):
+    __slots__ = ("dest", "source")
+
     def __init__(self, dest, source):
         self.dest = dest
         self.source = source
 
 
 class ConcatNode(InstructionNode):
+    __slots__ = ("dest", "left", "right")
+
     def __init__(self, dest, left, right):
         self.dest = dest
         self.left = left
@@ -202,6 +288,8 @@ class ConcatNode(InstructionNode):
 
 
 class SubstringNode(InstructionNode):
+    __slots__ = ("dest", "source", "index", "length")
+
     def __init__(self, dest, source, index, length):
         self.dest = dest
         self.source = source
@@ -210,66 +298,106 @@ class SubstringNode(InstructionNode):
 
 
 class ReadStringNode(InstructionNode):
+    __slots__ = ("dest",)
+
     def __init__(self, dest):
         self.dest = dest
 
 
 class ReadIntNode(InstructionNode):
+    __slots__ = ("dest",)
+
     def __init__(self, dest):
         self.dest = dest
 
 
 class RuntimeErrorNode(InstructionNode):
+    __slots__ = ("msg",)
+
     def __init__(self, msg):
         self.msg = msg
 
 
 class CopyNode(InstructionNode):
+    __slots__ = ("dest", "source")
+
     def __init__(self, dest, source):
         self.dest = dest
         self.source = source
 
 
 class PrintStrNode(InstructionNode):
+    __slots__ = ("str_addr",)
+
     def __init__(self, str_addr):
         self.str_addr = str_addr
 
 
 class PrintIntNode(InstructionNode):
+    __slots__ = ("int_addr",)
+
     def __init__(self, int_addr):
         self.int_addr = int_addr
 
 
 class TypeNameNode(InstructionNode):
+    __slots__ = ("dest", "source")
+
     def __init__(self, dest, source):
         self.dest = dest
         self.source = source
 
 
 class DefaultValueNode(InstructionNode):
+    __slots__ = ("dest", "type")
+
     def __init__(self, dest, typex):
         self.dest = dest
         self.type = typex
 
 
 class IsVoidNode(InstructionNode):
+    __slots__ = ("dest", "value")
+
     def __init__(self, dest, value):
         self.dest = dest
         self.value = value
 
 
 class CompareTypes(InstructionNode):
+    __slots__ = ("dest", "typeof", "type")
+
     def __init__(self, dest, typeof, typex: str):
         self.dest = dest
         self.typeof = typeof
         self.type = typex
 
 
+class TypeIdNode(InstructionNode):
+    __slots__ = ("dest", "obj")
+
+    def __init__(self, dest, obj):
+        self.dest = dest
+        self.obj = obj  # object (not void) whose type id is read, see type_intervals
+
+
 class ExitNode(InstructionNode):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
 
+class PhiNode(InstructionNode):
+    # only in functions in SSA form (see code_gen.cil_ssa), `sources` maps each
+    # predecessor block to the variable that holds the value coming from it
+    __slots__ = ("dest", "sources")
+
+    def __init__(self, dest, sources):
+        self.dest = dest
+        self.sources = sources
+
+
 class PrintVisitor(object):
     @visitor.on("node")
     def visit(self, node):
@@ -458,10 +586,18 @@ class PrintVisitor(object):
     def visit(self, node):
         return f"{node.dest} = {node.typeof} TYPE_EQUALS {node.type}"
 
+    @visitor.when(TypeIdNode)
+    def visit(self, node):
+        return f"{node.dest} = TYPEID {node.obj}"
+
     @visitor.when(ExitNode)
     def visit(self, node):
         return f"EXIT"
 
+    @visitor.when(PhiNode)
+    def visit(self, node):
+        return f"{node.dest} = PHI {' '.join(str(source) for source in node.sources.values())}"
+
 
 # printer = PrintVisitor()
 # return lambda ast: printer.visit(ast)
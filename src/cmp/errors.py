@@ -35,6 +35,43 @@ class InvalidInputFileError(CompilerError):
         CompilerError.__init__(self, f"File `{path}` is not a valid file.")
 
 
+class InvalidArtifactError(CompilerError):
+    """
+    Reported when an unknown artifact is requested with --emit.
+    """
+
+    def __init__(self, artifact: str) -> None:
+        CompilerError.__init__(self, f"Unknown artifact `{artifact}` requested to emit.")
+
+
+class InvalidOptLevelError(CompilerError):
+    """
+    Reported when an unknown optimization level is requested with -O.
+    """
+
+    def __init__(self, level: int) -> None:
+        CompilerError.__init__(self, f"Unknown optimization level `{level}`.")
+
+
+class InvalidCILFileError(CompilerError):
+    """
+    Reported when a serialized CIL program given as input can't be loaded.
+    """
+
+    def __init__(self, path: str, reason: str) -> None:
+        CompilerError.__init__(self, f"File `{path}` is not a valid CIL program: {reason}.")
+
+
+class UnavailableArtifactError(CompilerError):
+    """
+    Reported when an artifact of the phases before CIL is requested for a CIL
+    program.
+    """
+
+    def __init__(self, artifact: str) -> None:
+        CompilerError.__init__(self, f"Artifact `{artifact}` can't be emitted from a CIL program.")
+
+
 # Lexicographic errors
 
 
@@ -0,0 +1,6 @@
+# Every phase walks the ast recursively, a level of nesting in the program
+# (let, if, parenthesis, ...) costs a few frames. The compiler, and each
+# process checking classes in parallel (see semantic.parallel_checker), runs
+# in a thread with a stack big enough for very deeply nested programs.
+RECURSION_LIMIT = 1 << 20
+STACK_SIZE = 1 << 30
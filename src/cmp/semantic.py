@@ -1,7 +1,3 @@
-import itertools as itt
-from collections import OrderedDict
-
-
 class SemanticError(Exception):
     @property
     def text(self):
@@ -48,102 +44,160 @@ class Type:
         self.attributes = []
         self.methods = []
         self.parent = None
+        # position in the TypeHierarchy of its context, once it is built
+        self.hierarchy = None
+        self.hierarchy_id = None
+        # resolved member tables, see attribute_table and method_table
+        self.resolved_attributes = None
+        self.resolved_methods = None
+        self.dependents = {}  # id -> subtype whose tables extend these ones
+        self.frozen = False
+
+    def check_not_frozen(self):
+        if self.frozen:
+            raise SemanticError(f"Type {self.name} can't be changed once the context is frozen.")
 
     def set_parent(self, parent):
+        self.check_not_frozen()
         if self.parent is not None:
             raise SemanticError(f"Parent type is already set for {self.name}.")
         if parent.name == "String" or parent.name == "Bool" or parent.name == "Int":
             raise SemanticError(f"Is not possible to inherit from {parent.name}")
         self.parent = parent
-
-    def get_attribute(self, name: str, index: int, visited=None):
-        if visited is None:
-            visited = []
-        try:
-            return next((attr, index) for attr in self.attributes if attr.name == name)
-        except StopIteration:
-            visited.append(self.name)
-            if self.parent is None:
-                raise SemanticError(
-                    f'Attribute "{name}" is not defined in {self.name}.'
-                )
-            try:
-                if self.parent.name in visited:
-                    raise SemanticError(
-                        f'Attribute "{name}" is not defined in {self.name}.'
-                    )
-                return self.parent.get_attribute(name, index + 1, visited=visited)
-            except SemanticError:
-                raise SemanticError(
-                    f'Attribute "{name}" is not defined in {self.name}.'
-                )
+        self.invalidate_tables()
+
+    def invalidate_tables(self):
+        pending = [self]
+        while pending:
+            typex = pending.pop()
+            typex.resolved_attributes = None
+            typex.resolved_methods = None
+            pending.extend(typex.dependents.values())
+            typex.dependents = {}
+
+    def resolve_tables(self):
+        # ancestors whose tables are missing, up to the first one that has them
+        chain = []
+        seen = set()
+        typex = self
+        while typex is not None and typex.resolved_methods is None and id(typex) not in seen:
+            seen.add(id(typex))
+            chain.append(typex)
+            typex = typex.parent
+
+        # in an inheritance cycle every member of the chain has its own
+        # lookup order, only the table of this type is computed (and not kept)
+        cycle = typex is not None and id(typex) in seen
+        if typex is None or cycle:
+            attributes, methods = {}, {}
+        else:
+            attributes, methods = typex.resolved_attributes, typex.resolved_methods
+
+        for typex in reversed(chain):
+            attributes = dict(attributes)
+            for attr in typex.attributes:
+                _, _, index = attributes.get(attr.name, (None, None, len(attributes)))
+                attributes[attr.name] = (attr, typex, index)
+
+            methods = dict(methods)
+            for method in typex.methods:
+                _, _, index = methods.get(method.name, (None, None, len(methods)))
+                methods[method.name] = (method, typex, index)
+
+            if not cycle:
+                typex.resolved_attributes = attributes
+                typex.resolved_methods = methods
+                if typex.parent is not None:
+                    typex.parent.dependents[id(typex)] = typex
+
+        return attributes, methods
+
+    def attribute_table(self):
+        """
+        Attributes of the type, inherited ones included, as
+        name -> (Attribute, defining type, slot index) in slot order.
+        """
+        if self.resolved_attributes is None:
+            return self.resolve_tables()[0]
+        return self.resolved_attributes
+
+    def method_table(self):
+        """
+        Methods of the type, inherited ones included, as
+        name -> (Method, defining type, slot index) in slot order. A redefined
+        method keeps the slot of the method it overrides.
+        """
+        if self.resolved_methods is None:
+            return self.resolve_tables()[1]
+        return self.resolved_methods
+
+    def find_attribute(self, name: str):
+        entry = self.attribute_table().get(name)
+        return None if entry is None else entry[0]
+
+    def get_attribute(self, name: str):
+        attribute = self.find_attribute(name)
+        if attribute is None:
+            raise SemanticError(f'Attribute "{name}" is not defined in {self.name}.')
+        return attribute
 
     def define_attribute(self, name: str, typex):
-        try:
-            attr, index = self.get_attribute(name, 0)
-        except SemanticError:
-            attribute = Attribute(name, typex)
-            self.attributes.append(attribute)
-            return attribute
-        else:
-            if index > 0:
-                mssg = "an inherited class"
-            else:
-                mssg = self.name
+        self.check_not_frozen()
+        entry = self.attribute_table().get(name)
+        if entry is not None:
+            _, owner, _ = entry
+            mssg = self.name if owner is self else "an inherited class"
             raise SemanticError(f'Attribute "{name}" is already defined in {mssg}.')
 
-    def get_method(self, name: str, non_rec=False, visited=None):
-        if visited is None:
-            visited = []
-        try:
-            return next(method for method in self.methods if method.name == name)
-        except StopIteration:
-            visited.append(self.name)
-            if non_rec or self.parent is None:
-                raise SemanticError(f'Method "{name}" is not defined in {self.name}.')
-            try:
-                if self.parent.name in visited:
-                    raise SemanticError(
-                        f'Method "{name}" is not defined in {self.name}.'
-                    )
-                return self.parent.get_method(name, visited=visited)
-            except SemanticError:
-                raise SemanticError(f'Method "{name}" is not defined in {self.name}.')
+        attribute = Attribute(name, typex)
+        self.attributes.append(attribute)
+        self.invalidate_tables()
+        return attribute
+
+    def find_method(self, name: str, non_rec=False):
+        entry = self.method_table().get(name)
+        if entry is None or non_rec and entry[1] is not self:
+            return None
+        return entry[0]
+
+    def get_method(self, name: str, non_rec=False):
+        method = self.find_method(name, non_rec)
+        if method is None:
+            raise SemanticError(f'Method "{name}" is not defined in {self.name}.')
+        return method
 
     def define_method(
         self, name: str, param_names: list, param_types: list, return_type
     ):
+        self.check_not_frozen()
         if name in (method.name for method in self.methods):
             raise SemanticError(f'Method "{name}" already defined in {self.name}')
 
         method = Method(name, param_names, param_types, return_type)
         self.methods.append(method)
+        self.invalidate_tables()
         return method
 
-    def all_attributes(self, clean=True):
-        plain = (
-            OrderedDict() if self.parent is None else self.parent.all_attributes(False)
-        )
-        for attr in self.attributes:
-            plain[attr.name] = (attr, self)
-        return plain.values() if clean else plain
+    def all_attributes(self):
+        return [(attr, owner) for attr, owner, _ in self.attribute_table().values()]
 
-    def all_methods(self, clean=True):
-        plain = OrderedDict() if self.parent is None else self.parent.all_methods(False)
-        for method in self.methods:
-            plain[method.name] = (method, self)
-        return plain.values() if clean else plain
+    def all_methods(self):
+        return [(method, owner) for method, owner, _ in self.method_table().values()]
 
     def conforms_to(self, other):
-
-        return (
+        if (
             other.bypass()
             or self == other
             or self.name == "AUTO_TYPE"
             or other.name == "AUTO_TYPE"
-            or self.parent != None
-            and self.parent.conforms_to(other)
-        )
+        ):
+            return True
+
+        hierarchy = self.hierarchy
+        if hierarchy is not None and hierarchy is other.hierarchy:
+            return hierarchy.conforms_to(self, other)
+
+        return self.parent is not None and self.parent.conforms_to(other)
 
     def bypass(self):
         return False
@@ -231,21 +285,124 @@ class IOType(Type):
         Type.__init__(self, "IO")
 
 
+class TypeHierarchy:
+    """
+    Index of the inheritance tree of a context, built once every parent is set.
+    Types are numbered in depth first preorder, so the subtypes of a type are
+    the ones numbered from it to the last type of its subtree, and the least
+    common ancestor of two types is found by binary lifting. Types that don't
+    descend from a root (involved in an inheritance cycle) aren't indexed.
+    """
+
+    def __init__(self, context):
+        children = {name: [] for name in context.types}
+        roots = []
+        for typex in context.types.values():
+            if typex.parent is None:
+                roots.append(typex)
+            elif typex.parent.name in children:
+                children[typex.parent.name].append(typex)
+
+        self.order = []  # types in preorder
+        self.last = []  # preorder number of the last type in each subtree
+        self.depth = []
+        parents = []  # a root is its own parent
+
+        for root in roots:
+            pending = [(root, False)]
+            while pending:
+                typex, finished = pending.pop()
+                if finished:
+                    self.last[typex.hierarchy_id] = len(self.order) - 1
+                    continue
+
+                index = len(self.order)
+                typex.hierarchy = self
+                typex.hierarchy_id = index
+                self.order.append(typex)
+                self.last.append(index)
+                if typex.parent is None:
+                    parents.append(index)
+                    self.depth.append(0)
+                else:
+                    parents.append(typex.parent.hierarchy_id)
+                    self.depth.append(self.depth[typex.parent.hierarchy_id] + 1)
+
+                pending.append((typex, True))
+                pending.extend((child, False) for child in reversed(children[typex.name]))
+
+        # ancestors[k][i] is the 2^k-th ancestor of the i-th type
+        self.ancestors = [parents]
+        for _ in range(max(self.depth, default=0).bit_length() - 1):
+            previous = self.ancestors[-1]
+            self.ancestors.append([previous[previous[i]] for i in range(len(previous))])
+
+    def conforms_to(self, typex, other):
+        return other.hierarchy_id <= typex.hierarchy_id <= self.last[other.hierarchy_id]
+
+    def subtypes(self, typex):
+        return self.order[typex.hierarchy_id : self.last[typex.hierarchy_id] + 1]
+
+    def least_common_ancestor(self, type_a, type_b):
+        a, b = type_a.hierarchy_id, type_b.hierarchy_id
+        if self.depth[a] < self.depth[b]:
+            a, b = b, a
+
+        distance = self.depth[a] - self.depth[b]
+        k = 0
+        while distance:
+            if distance & 1:
+                a = self.ancestors[k][a]
+            distance >>= 1
+            k += 1
+
+        if a == b:
+            return self.order[a]
+
+        for jumps in reversed(self.ancestors):
+            if jumps[a] != jumps[b]:
+                a, b = jumps[a], jumps[b]
+
+        a, b = self.ancestors[0][a], self.ancestors[0][b]
+        return self.order[a] if a == b else None  # None for types in different trees
+
+
 class Context:
     def __init__(self):
         self.types = {}
+        # TypeHierarchy, built when the context is frozen
+        self.hierarchy = None
+        self.frozen = False
+
+    def freeze(self):
+        """
+        Called once every type is built. Indexes the hierarchy and resolves the
+        member tables of every type, then forbids any change to the context or
+        its types: the later phases share the frozen context instead of copying it.
+        """
+        self.hierarchy = TypeHierarchy(self)
+        for typex in self.types.values():
+            typex.resolve_tables()
+            typex.frozen = True
+        self.frozen = True
+        return self
 
     def create_type(self, name: str):
+        if self.frozen:
+            raise SemanticError(f"Type {name} can't be created once the context is frozen.")
         if name in self.types:
             raise SemanticError(f"Type with the same name {name} already in context.")
         typex = self.types[name] = Type(name)
         return typex
 
+    def find_type(self, name: str):
+        return self.types.get(name)
+
     def get_type(self, name: str):
-        try:
-            return self.types[name]
-        except KeyError:
+        typex = self.types.get(name)
+        if typex is None:
             raise SemanticError(f'Type "{name}" is not defined.')
+        return typex
 
     def __str__(self):
         return (
@@ -258,9 +415,12 @@ class Context:
         return str(self)
 
     def __copy__(self):
+        if self.frozen:
+            return self
         newContext = Context()
         for key, value in self.types.items():
             newContext.types[key] = value
+        newContext.hierarchy = self.hierarchy
         return newContext
 
 
@@ -275,39 +435,53 @@ class VariableInfo:
 
 
 class Scope:
-    def __init__(self, parent=None):
+    """
+    A child scope sees the variables its parent had defined when the child was
+    created (the first `index` locals of the parent), not the ones defined in
+    the parent later on. With keep_children=False the scope tree isn't kept:
+    children reference their parent but a scope doesn't reference its children,
+    so the scopes of a method are released once it has been checked.
+    """
+
+    def __init__(self, parent=None, keep_children=True):
         self.locals = []
+        self.positions = {}  # name -> position of its first definition in locals
         self.parent = parent
         self.children = []
+        self.keep_children = keep_children
         self.index = 0 if parent is None else len(parent)
 
     def __len__(self):
         return len(self.locals)
 
     def create_child(self):
-        child = Scope(self)
-        self.children.append(child)
+        child = Scope(self, self.keep_children)
+        if self.keep_children:
+            self.children.append(child)
         return child
 
     def define_variable(self, vname, vtype):
         info = VariableInfo(vname, vtype)
+        self.positions.setdefault(vname, len(self.locals))
         self.locals.append(info)
         return info
 
     def find_variable(self, vname, index=None):
-        locals = self.locals if index is None else itt.islice(self.locals, index)
-        try:
-            return next(x for x in locals if x.name == vname)
-        except StopIteration:
-            if self.parent is not None:
-                return self.parent.find_variable(vname, self.index)
-            return None
+        scope = self
+        while scope is not None:
+            # the first definition of the name is the one a lookup finds, so
+            # if it isn't visible from here no other one is
+            position = scope.positions.get(vname)
+            if position is not None and (index is None or position < index):
+                return scope.locals[position]
+            scope, index = scope.parent, scope.index
+        return None
 
     def is_defined(self, vname):
         return self.find_variable(vname) is not None
 
     def is_local(self, vname):
-        return any(True for x in self.locals if x.name == vname)
+        return vname in self.positions
 
     def __str__(self):
         output = "LOCALS: \n"
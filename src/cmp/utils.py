@@ -229,6 +229,11 @@ def find_least_type(type_a, type_b, context):
     if type_b.conforms_to(type_a):
         return type_a
 
+    hierarchy = context.hierarchy
+    if hierarchy is not None and type_a.hierarchy is hierarchy and type_b.hierarchy is hierarchy:
+        least = hierarchy.least_common_ancestor(type_a, type_b)
+        return least if least is not None else context.get_type("Object")
+
     solve = type_a.parent
     while solve is not None:
         if type_b.conforms_to(solve):
@@ -52,24 +52,31 @@ class Dispatcher(object):
     top_level = frame.f_locals == frame.f_globals
     self.param_index = self.__argspec(fn).args.index(param_name)
     self.param_name = param_name
+    self.default = fn
     self.targets = {}
+    # concrete class -> handler resolved for it, see resolve
+    self.resolved = {}
 
   def __call__(self, *args, **kw):
     typ = args[self.param_index].__class__
-    d = self.targets.get(typ)
-    if d is not None:
-      return d(*args, **kw)
-    else:
-      issub = issubclass
-      t = self.targets
-      ks = t.keys()
-      ans = [t[k](*args, **kw) for k in ks if issub(typ, k)]
-      if len(ans) == 1:
-        return ans.pop()
-      return ans
+    try:
+      d = self.resolved[typ]
+    except KeyError:
+      d = self.resolve(typ)
+    return d(*args, **kw)
+
+  def resolve(self, typ):
+    # The most specific handler is the first class in the MRO with one
+    # registered; the function decorated with `on` handles the rest.
+    # It is looked up once per concrete class.
+    t = self.targets
+    d = next((t[k] for k in typ.__mro__ if k in t), self.default)
+    self.resolved[typ] = d
+    return d
 
   def add_target(self, typ, target):
     self.targets[typ] = target
+    self.resolved.clear()
 
   @staticmethod
   def __argspec(fn):
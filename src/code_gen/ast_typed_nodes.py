@@ -2,27 +2,35 @@ from cmp.semantic import Context
 
 
 class Node:
-    pass
+    __slots__ = ()
 
 
 class ProgramNode(Node):
+    __slots__ = ("declarations", "context")
+
     def __init__(self, declarations, context=None):
         self.declarations = declarations
         self.context = context
 
 
 class ExpressionNode(Node):
+    __slots__ = ("static_type",)
+
     def __init__(self, etype):
         self.static_type = etype
 
 
 class ClassDeclarationNode:
+    __slots__ = ("id", "parent", "features")
+
     def __init__(self, idx, features, parent=None):
         self.id = idx
         self.parent = parent
         self.features = features
 
 class FuncDeclarationNode:
+    __slots__ = ("id", "params", "type", "body")
+
     def __init__(self, idx, params, return_type, body):
         self.id = idx
         self.params = params
@@ -31,6 +39,8 @@ class FuncDeclarationNode:
 
 
 class AttrDeclarationNode:
+    __slots__ = ("id", "type", "init_exp")
+
     def __init__(self, idx, typex, init_exp=None):
         self.id = idx
         self.type = typex
@@ -38,6 +48,8 @@ class AttrDeclarationNode:
 
 
 class AssignNode(ExpressionNode):
+    __slots__ = ("id", "expr")
+
     def __init__(self, idx, expr, etype = None ):
         self.id = idx
         self.expr = expr
@@ -45,6 +57,8 @@ class AssignNode(ExpressionNode):
 
 
 class LetNode(ExpressionNode):
+    __slots__ = ("identifiers", "body")
+
     def __init__(self, identifiers, body, etype = None ):
         self.identifiers = identifiers
         self.body = body
@@ -52,6 +66,8 @@ class LetNode(ExpressionNode):
 
 
 class VarDeclarationNode:
+    __slots__ = ("id", "type", "expr", "static_type")
+
     def __init__(self, idx, typex, expr=None, etype = None ):
         self.id = idx
         self.type = typex
@@ -60,6 +76,8 @@ class VarDeclarationNode:
 
 
 class IfNode(ExpressionNode):
+    __slots__ = ("if_expr", "then_expr", "else_expr")
+
     def __init__(self, if_exp, then_exp, else_exp, etype = None ):
         self.if_expr = if_exp
         self.then_expr = then_exp
@@ -68,6 +86,8 @@ class IfNode(ExpressionNode):
 
 
 class WhileNode(ExpressionNode):
+    __slots__ = ("condition", "body")
+
     def __init__(self, condition, body, etype = None ):
         self.condition = condition
         self.body = body
@@ -75,6 +95,8 @@ class WhileNode(ExpressionNode):
 
 
 class CaseNode(ExpressionNode):
+    __slots__ = ("expr", "case_items")
+
     def __init__(self, exp, case_items, etype = None ):
         self.expr = exp
         self.case_items = case_items
@@ -82,6 +104,8 @@ class CaseNode(ExpressionNode):
 
 
 class CaseItemNode(ExpressionNode):
+    __slots__ = ("id", "type", "expr")
+
     def __init__(self, idx, typex, exp, etype = None ):
         self.id = idx
         self.type = typex
@@ -90,6 +114,8 @@ class CaseItemNode(ExpressionNode):
 
 
 class CallNode(ExpressionNode):
+    __slots__ = ("obj", "id", "args", "at_type", "obj_type")
+
     def __init__(self, idx, args, obj=None, at_type=None, obj_type = None, etype = None):
         self.obj = obj
         self.id = idx
@@ -99,24 +125,32 @@ class CallNode(ExpressionNode):
         self.static_type = etype
 
 class BlockNode(ExpressionNode):
+    __slots__ = ("expression_list",)
+
     def __init__(self, expression_list, etype = None ):
         self.expression_list = expression_list
         self.static_type = etype
 
 
 class AtomicNode(ExpressionNode):
+    __slots__ = ("lex",)
+
     def __init__(self, lex, etype = None ):
         self.lex = lex
         self.static_type = etype
 
 
 class UnaryNode(ExpressionNode):
+    __slots__ = ("expr",)
+
     def __init__(self, expr, etype = None ):
         self.expr = expr
         self.static_type = etype
 
 
 class BinaryNode(ExpressionNode):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right, etype = None ):
         self.left = left
         self.right = right
@@ -124,73 +158,75 @@ class BinaryNode(ExpressionNode):
 
 
 class ArithmeticOperation(BinaryNode):
-    pass
+    __slots__ = ()
 
 
 class ComparisonOperation(BinaryNode):
-    pass
+    __slots__ = ()
 
 
 class ConstantNumNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class VariableNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class StringNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class BooleanNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class InstantiateNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class NotNode(UnaryNode):
-    pass
+    __slots__ = ()
 
 
 class IsvoidNode(UnaryNode):
-    pass
+    __slots__ = ()
 
 
 class NegNode(UnaryNode):
-    pass
+    __slots__ = ()
 
 
 class PlusNode(ArithmeticOperation):
-    pass
+    __slots__ = ()
 
 
 class MinusNode(ArithmeticOperation):
-    pass
+    __slots__ = ()
 
 
 class StarNode(ArithmeticOperation):
-    pass
+    __slots__ = ()
 
 
 class DivNode(ArithmeticOperation):
-    pass
+    __slots__ = ()
 
 
 class LessNode(ComparisonOperation):
-    pass
+    __slots__ = ()
 
 
 class LessEqualNode(ComparisonOperation):
-    pass
+    __slots__ = ()
 
 
 class EqualNode(ComparisonOperation):
-    pass
+    __slots__ = ()
 
 
 class DefaultValueNode(ExpressionNode):
+    __slots__ = ("type",)
+
     def __init__(self, typex):
         self.type = typex
\ No newline at end of file
@@ -1,5 +1,5 @@
+import hashlib
 
-import cmp.nbpackage
 import cmp.visitor as visitor
 
 import code_gen.ast_typed_nodes as cool
@@ -47,7 +47,8 @@ from cmp.cil import (
     DefaultValueNode,
     IsVoidNode,
     ExitNode,
-    CompareTypes
+    TypeIdNode,
+    type_intervals,
 )
 from semantic.cool_visitor import FormatVisitor
 
@@ -57,28 +58,55 @@ from cmp.semantic import Context, VariableInfo
 
 from cmp.semantic import Scope
 
+BUILTIN_TYPES = ["Object", "IO", "Int", "Bool", "String"]
+
+# messages of the runtime, they are data of the runtime (see build_runtime)
+# and the code of every class refers to the same labels
+CASE_ERROR = "runtime_error"
+CASE_VOID_ERROR = "case_void_error"
+RUNTIME_MESSAGES = {
+    CASE_ERROR: "No branch can be selected for evaluation\\n",
+    CASE_VOID_ERROR: "Case on void\\n",
+}
+
 
 class CILBuilder:
-    def __init__(self):
+    def __init__(self, cache=None):
+        # code_gen.incremental.ClassCache, the code of unchanged classes is
+        # taken from it instead of generated again
+        self.cache = cache
         self.types = []
         self.code = []
         self.data = []
         self.current_type = None
         self.current_function = None
-        self.string_count = 0
+        self.strings = set()  # labels of the string literals of the class
         self._count = 0
         self.internal_count = 0
         self.context = None
         self.methods = {}
         self.attrs = {}
-
-    def generate_next_string_id(self):
-        self.string_count += 1
-        return "string_" + str(self.string_count)
+        self.type_intervals = {}  # type name -> (id, last id of its subtree)
+
+    # string literals are named after their value and label ids are numbered
+    # per class, so the code generated for a class doesn't depend on the
+    # classes declared before it
+    def register_string(self, value):
+        digest = hashlib.sha1(value.encode()).hexdigest()[:12]
+        name = f"string_{digest}"
+        if name not in self.strings:
+            self.strings.add(name)
+            self.data.append(DataNode(name, value))
+        return name
+
+    def program_data(self):
+        # a literal used by several classes is in the data of each of them
+        # (their code may come from the cache), the program keeps one
+        return list({data.name: data for data in self.data}.values())
 
     def next_id(self):
         self._count += 1
-        return str(self._count)
+        return f"{self.current_type.name}_{self._count}"
 
     def to_function_name(self, method_name, type_name):
         return f"{type_name}_{method_name}"
@@ -89,6 +117,22 @@ class CILBuilder:
     def to_attr_name(self, type_name, attr_name):
         return f"{type_name}_{attr_name}"
 
+    @property
+    def current_function(self):
+        return self._current_function
+
+    @current_function.setter
+    def current_function(self, function):
+        self._current_function = function
+        # name -> (kind, slot) of the params and locals of the function, kept
+        # as they are registered so names are looked up without scanning them
+        self.symbols = {}
+        if function is not None:
+            for slot, param in enumerate(function.params):
+                self.symbols.setdefault(param.name, ("param", slot))
+            for slot, local in enumerate(function.localvars):
+                self.symbols.setdefault(local.name, ("local", slot))
+
     @property
     def params(self):
         return self.current_function.params
@@ -108,8 +152,8 @@ class CILBuilder:
     def register_instruction(self, instruction):
         self.current_function.instructions.append(instruction)
 
-    def register_type(self, name):
-        type_node = TypeNode(name)
+    def register_type(self, name, parent=None):
+        type_node = TypeNode(name, parent)
         self.types.append(type_node)
         return type_node
 
@@ -126,15 +170,22 @@ class CILBuilder:
             f"local_{name}" if name else f"local_{len(self.current_function.localvars)}"
         )
         local_node = LocalNode(local_name)
+        self.symbols.setdefault(local_name, ("local", len(self.localvars)))
         self.current_function.localvars.append(local_node)
         return local_name
 
     def register_param(self, vinfo):
         vinfo.name = self.build_internal_vname(vinfo.name)
         arg_node = ParamNode(vinfo.name)
+        self.symbols.setdefault(vinfo.name, ("param", len(self.params)))
         self.params.append(arg_node)
         return vinfo
 
+    def register_self(self):
+        # the receiver, first param of every method and constructor
+        self.symbols.setdefault("self", ("param", len(self.params)))
+        self.params.append(ParamNode("self"))
+
     def get_param(self, name):
         return f"param_{name}"
 
@@ -146,18 +197,31 @@ class CILBuilder:
     def define_internal_local(self):
         return self.register_local()
 
+    def never_void(self, expr):
+        # self, new objects and values of the basic types are never void
+        if expr is None or isinstance(expr, cool.InstantiateNode):
+            return True
+        if isinstance(expr, cool.VariableNode) and expr.lex == "self":
+            return True
+        return expr.static_type.name in ["Int", "Bool", "String"]
+
     def is_attribute(self, vname):
-        return vname not in [var.name for var in self.current_function.localvars] and (
-            vname not in [param.name for param in self.current_function.params]
-        )
+        return vname not in self.symbols
+
+    def lookup(self, vname):
+        # the local or param holding the variable `vname` of the COOL code,
+        # None if it's an attribute
+        for name in (self.get_local(vname), self.get_param(vname)):
+            if name in self.symbols:
+                return name
+        return None
 
     def add_builtin_constructors(self):
-        builtin_types = ["Object", "IO", "Int", "Bool", "String"]
-        for typex in builtin_types:
+        for typex in BUILTIN_TYPES:
             self.current_function = FunctionNode(
                 self.to_function_name("constructor", typex), [], [], []
             )
-            self.params.append(ParamNode("self"))
+            self.register_self()
             # instance = self.define_internal_local()
             # self.register_instruction(AllocateNode(typex, instance))
             self.register_instruction(ReturnNode("self"))
@@ -170,8 +234,7 @@ class CILBuilder:
             self.to_function_name("constructor", node.id)
         )
 
-        self.params.append(ParamNode("self"))
-        self.current_type.define_method("constructor", [], [], "Object")
+        self.register_self()
 
 
         for attr, (_, typex) in self.attrs[self.current_type.name].items():
@@ -212,7 +275,7 @@ class CILBuilder:
             self.cil_predef_method("in_string", "IO", self.io_instring),
             self.cil_predef_method("in_int", "IO", self.io_inint),
         ]
-        io_type = TypeNode("IO")
+        io_type = TypeNode("IO", "Object")
         io_type.attributes = []
         io_type.methods =  functions
 
@@ -226,7 +289,7 @@ class CILBuilder:
             self.cil_predef_method("concat", "String", self.string_concat),
             self.cil_predef_method("substr", "String", self.string_substr),
         ]
-        string_type = TypeNode("String")
+        string_type = TypeNode("String", "Object")
         string_type.attributes = [
             VariableInfo("length").name,
             VariableInfo("str_ref").name,
@@ -235,7 +298,7 @@ class CILBuilder:
 
         # Int
         # self.attrs["Int"] = {"value": (0, "Int")}
-        int_type = TypeNode("Int")
+        int_type = TypeNode("Int", "Object")
         int_type.attributes = [VariableInfo("value").name]
         int_type.methods =  [
             self.cil_predef_method("abort", "Int", self.object_abort),
@@ -245,7 +308,7 @@ class CILBuilder:
 
         # Bool
         # self.attrs["Bool"] = {"value": (0, "Int")}
-        bool_type = TypeNode("Bool")
+        bool_type = TypeNode("Bool", "Object")
         bool_type.attributes = [VariableInfo("value").name]
         bool_type.methods =  [
             self.cil_predef_method("abort", "Bool", self.object_abort),
@@ -258,8 +321,7 @@ class CILBuilder:
 
     # predefined functions cil
     def cil_predef_method(self, mname, cname, specif_code):
-        self.current_type = self.context.get_type(cname)
-        self.current_method = self.current_type.get_method(mname)
+        self.current_type = Type(cname)
         self.current_function = FunctionNode(
             self.to_function_name(mname, cname), [], [], []
         )
@@ -301,7 +363,7 @@ class CILBuilder:
         self.current_function = None
 
     def string_length(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
 
         result = self.define_internal_local()
 
@@ -309,7 +371,7 @@ class CILBuilder:
         self.register_instruction(ReturnNode(result))
 
     def string_concat(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
         other_arg = VariableInfo("other_arg")
         self.register_param(other_arg)
 
@@ -319,7 +381,7 @@ class CILBuilder:
         self.register_instruction(ReturnNode(ret_vinfo))
 
     def string_substr(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
         idx_arg = VariableInfo("idx_arg")
         self.register_param(idx_arg)
         length_arg = VariableInfo("length_arg")
@@ -340,7 +402,7 @@ class CILBuilder:
         self.register_instruction(RuntimeErrorNode(error))
 
     def object_copy(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
         copy_local = self.define_internal_local()
         self.register_instruction(AllocateNode(self.current_type.name, copy_local))
 
@@ -371,7 +433,7 @@ class CILBuilder:
         self.register_instruction(ReturnNode(copy_local))
 
     def object_type_name(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
         self.data.append(
             DataNode(f"type_name_{self.current_type.name}", f"{self.current_type.name}")
         )
@@ -389,40 +451,55 @@ class CILBuilder:
         self.register_instruction(ReturnNode(type_name))
 
     def io_outstring(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
         str_arg = VariableInfo("str")
         self.register_param(str_arg)
         self.register_instruction(PrintStrNode(str_arg.name))
         self.register_instruction(ReturnNode("self"))
 
     def io_outint(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
         int_arg = VariableInfo("int")
         self.register_param(int_arg)
         self.register_instruction(PrintIntNode(int_arg.name))
         self.register_instruction(ReturnNode("self"))
 
     def io_instring(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
         ret_vinfo = self.define_internal_local()
         self.register_instruction(ReadStringNode(ret_vinfo))
         self.register_instruction(ReturnNode(ret_vinfo))
 
     def io_inint(self):
-        self.params.append(ParamNode("self"))
+        self.register_self()
         ret_vinfo = self.define_internal_local()
         self.register_instruction(ReadIntNode(ret_vinfo))  
         self.register_instruction(ReturnNode(ret_vinfo))
 
+    def build_runtime(self):
+        # Built-in classes don't depend on the program being compiled, they are
+        # built once into the runtime (see code_gen.runtime) and linked with it
+        self.attrs = {typex: {} for typex in BUILTIN_TYPES}
+        self.add_builtin_functions()
+        self.add_builtin_constructors()
+        self.data.extend(DataNode(name, value) for name, value in RUNTIME_MESSAGES.items())
+
+        program_node = ProgramNode(self.types, self.data, self.code)
+
+        self.reset_state()
+
+        return program_node
+
     def reset_state(self):
         self.types = []
         self.code = []
         self.data = []
         self.current_type = None
         self.current_function = None
-        self.string_count = 0
+        self.strings = set()
         self._count = 0
         self.context = None
+        self.type_intervals = {}
 
     @visitor.on("node")
     def visit(self, node=None, return_var=None):
@@ -431,17 +508,23 @@ class CILBuilder:
     @visitor.when(cool.ProgramNode)
     def visit(self, node, return_var=None):
         self.context = node.context
+        self.type_intervals = type_intervals(
+            {
+                typex.name: typex.parent.name if typex.parent is not None else None
+                for typex in self.context.types.values()
+            }
+        )
 
         for type in self.context.types.values():
             self.attrs[type.name] = {
-                attr.name: (i, htype.name)
-                for i, (attr, htype) in enumerate(type.all_attributes())
+                name: (i, htype.name)
+                for name, (_, htype, i) in type.attribute_table().items()
             }
             self.methods[type.name] = {
-                method.name: (i, htype.name)
-                if htype.name != "Object" or method.name not in ["abort","type_name", "copy"]
+                name: (i, htype.name)
+                if htype.name != "Object" or name not in ["abort","type_name", "copy"]
                 else (i, type.name)
-                for i, (method, htype) in enumerate(type.all_methods())
+                for name, (_, htype, i) in type.method_table().items()
             }
         self.current_function = FunctionNode("main", [], [], [])
         self.code.append(self.current_function)
@@ -468,13 +551,10 @@ class CILBuilder:
 
         self.current_function = None
 
-        self.add_builtin_functions()
-        self.add_builtin_constructors()
-
         for declaration in node.declarations:
             self.visit(declaration)
 
-        program_node = ProgramNode(self.types, self.data, self.code)
+        program_node = ProgramNode(self.types, self.program_data(), self.code)
 
         self.reset_state()
 
@@ -483,12 +563,11 @@ class CILBuilder:
     @visitor.when(cool.ClassDeclarationNode)
     def visit(self, node, return_var=None):
         self.current_type = self.context.get_type(node.id)
+        self.strings = set()
+        self._count = 0
 
-        self.register_abort()
-        self.register_copy()
-        self.register_type_name()
-
-        type_node = self.register_type(self.current_type.name)
+        parent = self.current_type.parent
+        type_node = self.register_type(self.current_type.name, parent.name if parent is not None else None)
 
         current_type = self.current_type
         while current_type is not None:
@@ -503,18 +582,33 @@ class CILBuilder:
         type_node.attributes.reverse()
 
         type_node.methods = [(method_name, self.to_function_name(method_name, typex)) for method_name,(_, typex) in self.methods[node.id].items()]
-        print(type_node.methods)
+
+        fragment = self.cache.lookup(node.id) if self.cache is not None else None
+        if fragment is not None:
+            self.code.extend(fragment.code)
+            self.data.extend(fragment.data)
+            return
+
+        code_start, data_start = len(self.code), len(self.data)
+
+        self.register_abort()
+        self.register_copy()
+        self.register_type_name()
+
         self.build_constructor(node)
 
        
         for feature in node.features:
             self.visit(feature)
 
+        if self.cache is not None:
+            self.cache.store_cil(node.id, self.code[code_start:], self.data[data_start:])
+
     @visitor.when(cool.AttrDeclarationNode)
     def visit(self, node, return_var=None):
         self.current_function = self.register_function(self.to_function_name(f"{node.id}_constructor", self.current_type.name))
 
-        self.params.append(ParamNode("self"))
+        self.register_self()
          
         # Assign init_expr if not None
         if node.init_exp:
@@ -540,7 +634,7 @@ class CILBuilder:
         )
 
         # Add params
-        self.current_function.params.append(ParamNode("self"))
+        self.register_self()
         for pname, _ in node.params:
             self.register_param(VariableInfo(pname))
 
@@ -561,14 +655,9 @@ class CILBuilder:
     def visit(self, node, return_var):
         self.visit(node.expr, return_var)
 
-        local_id = self.get_local(node.id)
-        if any(local_id == l.name for l in self.current_function.localvars):
-            self.register_instruction(AssignNode(local_id, return_var))
-            return
-
-        param_id = self.get_param(node.id)
-        if any(param_id == p.name for p in self.current_function.params):
-            self.register_instruction(AssignNode(param_id, return_var))
+        name = self.lookup(node.id)
+        if name is not None:
+            self.register_instruction(AssignNode(name, return_var))
             return
 
         self.register_instruction(
@@ -615,8 +704,9 @@ class CILBuilder:
 
         else:
             method_index = self.get_method_id(obj_type, node.id)
+            static_type = obj_type if self.never_void(node.obj) else None
             self.register_instruction(
-                DynamicCallNode(instance_type, method_index, return_var)
+                DynamicCallNode(instance_type, method_index, return_var, static_type)
             )
 
     @visitor.when(cool.IfNode)
@@ -687,7 +777,7 @@ class CILBuilder:
     def visit(self, node, return_var=None):
         # Add LOCAL variable
         idx = self.get_local(node.id)
-        if not any(idx == l.name for l in self.current_function.localvars):
+        if idx not in self.symbols:
             self.register_local(node.id)
 
         # Add Assignment Node
@@ -698,60 +788,67 @@ class CILBuilder:
 
     @visitor.when(cool.CaseNode)
     def visit(self, node, return_var=None):
-        def get_children(static_type):
-            children = []
-            for t in self.context.types.values():
-                 if t.conforms_to(static_type) and t.name != "AUTO_TYPE":
-                     children.append(t)
-
-            return children
-
-        def get_least_type(expr_dynamic_type):
-            case_item_types = [case_item.type for case_item in node.case_items]
-            solve = expr_dynamic_type
-            while solve is not None:
-                if solve.name in case_item_types:
-                    return solve.name
-                solve = solve.parent
-
-            return None
-
-        def get_asserted_branch(least_type:str):
-            for case_item in node.case_items:
-                if case_item.type == least_type:
-                    return case_item
-            return None
-
         expr_value = self.define_internal_local()
         self.visit(node.expr, expr_value)
 
-        possible_dynamic_types = get_children(node.expr.static_type)
+        # the types conforming to a type have the ids in its interval, see
+        # type_intervals, and two intervals are either nested or disjoint: the
+        # branch taken is the first one whose interval has the type id when the
+        # innermost (last numbered) intervals are tested first
+        static_type = node.expr.static_type.name
+        low, high = self.type_intervals.get(static_type, self.type_intervals["Object"])
+        branches = sorted(node.case_items, key=lambda item: self.type_intervals[item.type][0], reverse=True)
+
+        error_label = "CASE_ERROR_" + self.next_id()
+        void_label = None
+        type_id = self.define_internal_local()
+        if static_type not in ["Int", "Bool", "String"]:
+            void_label = "CASE_VOID_" + self.next_id()
+            is_void = self.define_internal_local()
+            self.register_instruction(IsVoidNode(is_void, expr_value))
+            self.register_instruction(GotoIfNode(is_void, void_label))
+        if low == high:
+            # Int and Bool values don't have a type id, their type is known
+            self.register_instruction(AssignNode(type_id, low))
+        else:
+            self.register_instruction(TypeIdNode(type_id, expr_value))
 
         branch_labels = []
-        for t in possible_dynamic_types:
-            dynamic_type = self.define_internal_local()
-            self.register_instruction(TypeOfNode(expr_value, dynamic_type))
+        in_range = self.define_internal_local()
+        for branch in branches:
+            first, last = self.type_intervals[branch.type]
+            if last < low or high < first:
+                continue  # no type of the expression conforms to it
 
             label = "BRANCH" + self.next_id()
-            equals = self.define_internal_local()
-            self.register_instruction(CompareTypes(equals, dynamic_type, t.name))
-            self.register_instruction(GotoIfNode(equals,label))
-
-            least_type = get_least_type(t)
-            asserted_branch = get_asserted_branch(least_type)
-            branch_labels.append((asserted_branch, label))
-        
+            branch_labels.append((branch, label))
+            if first <= low and high <= last:
+                # every type not taken by the branches before conforms to it
+                self.register_instruction(GotoNode(label))
+                break
+
+            if low < first and last < high:
+                next_label = "CASE_NEXT_" + self.next_id()
+                self.register_instruction(LessNode(in_range, type_id, first))
+                self.register_instruction(GotoIfNode(in_range, next_label))
+                self.register_instruction(LessEqualNode(in_range, type_id, last))
+                self.register_instruction(GotoIfNode(in_range, label))
+                self.register_instruction(LabelNode(next_label))
+            elif low < first:
+                self.register_instruction(LessEqualNode(in_range, first, type_id))
+                self.register_instruction(GotoIfNode(in_range, label))
+            else:
+                self.register_instruction(LessEqualNode(in_range, type_id, last))
+                self.register_instruction(GotoIfNode(in_range, label))
 
-        self.data.append(
-            DataNode("runtime_error", "No branch can be selected for evaluation")
-        )
-        error = "runtime_error"
-        self.register_instruction(RuntimeErrorNode(error))
+        self.register_instruction(LabelNode(error_label))
+        self.register_instruction(RuntimeErrorNode(CASE_ERROR))
+        if void_label is not None:
+            self.register_instruction(LabelNode(void_label))
+            self.register_instruction(RuntimeErrorNode(CASE_VOID_ERROR))
 
         end_case_label = "END_CASE_" + self.next_id()
         for branch, label in branch_labels:
-            if not branch:
-                continue
             self.register_instruction(LabelNode(label))
             new_local = self.register_local(branch.id)
             self.register_instruction(AssignNode(new_local, expr_value))
@@ -859,12 +956,7 @@ class CILBuilder:
     def visit(self, node, return_var):
         value = self.define_internal_local()
         self.visit(node.expr, value)
-        constant = self.define_internal_local()
-        self.register_instruction(
-            StaticCallNode(self.to_function_name("constructor", "Bool"), constant)
-        )
-        self.register_instruction(AssignNode(constant, 1))
-        self.register_instruction(MinusNode(return_var, constant, value))
+        self.register_instruction(EqualNode(return_var, value, False))
 
     @visitor.when(cool.NegNode)
     def visit(self, node, return_var):
@@ -883,14 +975,9 @@ class CILBuilder:
             self.register_instruction(AssignNode(return_var, "self"))
             return
 
-        local_id = self.get_local(node.lex)
-        if any(local_id == l.name for l in self.current_function.localvars):
-            self.register_instruction(AssignNode(return_var, local_id))
-            return
-
-        param_id = self.get_param(node.lex)
-        if any(param_id == p.name for p in self.current_function.params):
-            self.register_instruction(AssignNode(return_var, param_id))
+        name = self.lookup(node.lex)
+        if name is not None:
+            self.register_instruction(AssignNode(return_var, name))
             return
 
         self.register_instruction(
@@ -904,16 +991,17 @@ class CILBuilder:
 
     @visitor.when(cool.StringNode)
     def visit(self, node, return_var):
-        idx = self.generate_next_string_id()
-        self.data.append(DataNode(idx, node.lex))
+        idx = self.register_string(node.lex)
         self.register_instruction(
             LoadNode(return_var, VariableInfo(idx, None, node.lex))
         )
 
     @visitor.when(cool.BooleanNode)
     def visit(self, node, return_var):
+        # Bool values are Python bools in the CIL, an int everywhere else than
+        # in the interpreter (see code_gen.cil_interpreter)
         self.register_instruction(
-            AssignNode(return_var, 1 if node.lex == "true" else 0)
+            AssignNode(return_var, node.lex == "true")
         )
 
     @visitor.when(cool.DefaultValueNode)
@@ -0,0 +1,262 @@
+import cmp.cil as cil
+
+# Control flow graph of the instructions of a CIL function. A block starts at a
+# label or after a jump and ends at a jump or before a label, control enters a
+# block only through its first instruction and leaves it only after the last.
+# The blocks are kept in layout order, a block whose last instruction isn't a
+# jump continues with the next one.
+
+# Operands each instruction reads, besides the variable it defines (`dest`).
+# The operands in VALUE_OPERANDS may also be given as an int constant
+VALUE_OPERANDS = {
+    cil.AssignNode: ("source",),
+    cil.PlusNode: ("left", "right"),
+    cil.MinusNode: ("left", "right"),
+    cil.StarNode: ("left", "right"),
+    cil.DivNode: ("left", "right"),
+    cil.LessNode: ("left", "right"),
+    cil.LessEqualNode: ("left", "right"),
+    cil.EqualNode: ("left", "right"),
+    cil.NotNode: ("expr",),
+    cil.IntComplementNode: ("source",),
+    cil.SetAttribNode: ("value",),
+    cil.GotoIfNode: ("condition",),
+    cil.ArgNode: ("name",),
+    cil.ReturnNode: ("value",),
+    cil.PrintIntNode: ("int_addr",),
+    cil.SubstringNode: ("index", "length"),
+}
+OBJECT_OPERANDS = {
+    cil.StrEqualNode: ("left", "right"),
+    cil.GetAttribNode: ("instance",),
+    cil.SetAttribNode: ("instance",),
+    cil.TypeOfNode: ("obj",),
+    cil.DynamicCallNode: ("instance_type",),
+    cil.LengthNode: ("source",),
+    cil.ConcatNode: ("left", "right"),
+    cil.SubstringNode: ("source",),
+    cil.CopyNode: ("source",),
+    cil.PrintStrNode: ("str_addr",),
+    cil.TypeNameNode: ("source",),
+    cil.IsVoidNode: ("value",),
+    cil.CompareTypes: ("typeof",),
+    cil.TypeIdNode: ("obj",),
+}
+
+# every operand of each instruction type
+OPERANDS = {
+    node_type: VALUE_OPERANDS.get(node_type, ()) + OBJECT_OPERANDS.get(node_type, ())
+    for node_type in {**VALUE_OPERANDS, **OBJECT_OPERANDS}
+}
+
+# instructions after which the next one isn't executed
+JUMPS = (cil.GotoNode, cil.ReturnNode, cil.RuntimeErrorNode, cil.ExitNode)
+
+
+def operands(instruction):
+    """
+    Returns the names of the variables read by `instruction`.
+    """
+    if type(instruction) is cil.PhiNode:
+        return list(instruction.sources.values())
+
+    names = []
+    for field in OPERANDS.get(type(instruction), ()):
+        value = getattr(instruction, field)
+        if isinstance(value, str):
+            names.append(value)
+    return names
+
+
+def defined(instruction):
+    """
+    Returns the name of the variable defined by `instruction`, if any.
+    """
+    return getattr(instruction, "dest", None)
+
+
+class BasicBlock:
+    __slots__ = ("index", "instructions", "successors", "predecessors")
+
+    def __init__(self, instructions):
+        self.index = None  # position in the layout
+        self.instructions = instructions
+        self.successors = []
+        self.predecessors = []
+
+    @property
+    def label(self):
+        if self.instructions and isinstance(self.instructions[0], cil.LabelNode):
+            return self.instructions[0].name
+        return None
+
+    @property
+    def terminator(self):
+        # the jump that ends the block, if any
+        if self.instructions and isinstance(self.instructions[-1], JUMPS + (cil.GotoIfNode,)):
+            return self.instructions[-1]
+        return None
+
+    def falls_through(self):
+        return not self.instructions or not isinstance(self.instructions[-1], JUMPS)
+
+    def __repr__(self):
+        return f"<block {self.index} {self.label or ''}>"
+
+
+class ControlFlowGraph:
+    def __init__(self, instructions):
+        self.blocks = []
+
+        block = []
+        for instruction in instructions:
+            if isinstance(instruction, cil.LabelNode) and block:
+                self.blocks.append(BasicBlock(block))
+                block = []
+            block.append(instruction)
+            if isinstance(instruction, JUMPS + (cil.GotoIfNode,)):
+                self.blocks.append(BasicBlock(block))
+                block = []
+        if block or not self.blocks:
+            self.blocks.append(BasicBlock(block))
+
+        self.link()
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def link(self):
+        """
+        Computes the edges between the blocks, it's called again after blocks
+        are added, removed or moved, or their jumps changed.
+        """
+        labels = {}
+        for index, block in enumerate(self.blocks):
+            block.index = index
+            block.successors = []
+            block.predecessors = []
+            if block.label is not None:
+                labels[block.label] = block
+
+        for block in self.blocks:
+            terminator = block.terminator
+            if isinstance(terminator, (cil.GotoNode, cil.GotoIfNode)):
+                block.successors.append(labels[terminator.label])
+            if block.falls_through() and block.index + 1 < len(self.blocks):
+                following = self.blocks[block.index + 1]
+                if following not in block.successors:
+                    block.successors.append(following)
+            for successor in block.successors:
+                successor.predecessors.append(block)
+
+    def add_entry_block(self):
+        """
+        Adds an empty block before the entry, so that no edge goes to the
+        entry block (it's the only way to reach it).
+        """
+        self.blocks.insert(0, BasicBlock([]))
+        self.link()
+        return self.entry
+
+    def instructions(self):
+        return [instruction for block in self.blocks for instruction in block.instructions]
+
+    def reachable(self):
+        """
+        Returns the blocks reachable from the entry, in reverse postorder.
+        """
+        postorder = []
+        visited = {self.entry}
+        stack = [(self.entry, iter(self.entry.successors))]
+        while stack:
+            block, successors = stack[-1]
+            for successor in successors:
+                if successor not in visited:
+                    visited.add(successor)
+                    stack.append((successor, iter(successor.successors)))
+                    break
+            else:
+                stack.pop()
+                postorder.append(block)
+        postorder.reverse()
+        return postorder
+
+    def remove_unreachable(self):
+        """
+        Removes the blocks that can't be reached from the entry. Returns the
+        number of instructions removed.
+        """
+        reachable = set(self.reachable())
+        removed = sum(len(block.instructions) for block in self.blocks if block not in reachable)
+        self.blocks = [block for block in self.blocks if block in reachable]
+        self.link()
+        return removed
+
+    def immediate_dominators(self):
+        """
+        Returns the immediate dominator of every reachable block (None for the
+        entry), computed as in "A Simple, Fast Dominance Algorithm" (Cooper,
+        Harvey and Kennedy).
+        """
+        order = self.reachable()
+        position = {block: index for index, block in enumerate(order)}
+        idom = {self.entry: self.entry}
+
+        def intersect(a, b):
+            while a is not b:
+                while position[a] > position[b]:
+                    a = idom[a]
+                while position[b] > position[a]:
+                    b = idom[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new_idom = None
+                for predecessor in block.predecessors:
+                    if predecessor in idom:
+                        new_idom = predecessor if new_idom is None else intersect(predecessor, new_idom)
+                if idom.get(block) is not new_idom:
+                    idom[block] = new_idom
+                    changed = True
+
+        idom[self.entry] = None
+        return idom
+
+    def dominator_tree(self, idom=None):
+        """
+        Returns the children of every reachable block in the dominator tree.
+        """
+        idom = self.immediate_dominators() if idom is None else idom
+        children = {block: [] for block in idom}
+        for block, dominator in idom.items():
+            if dominator is not None:
+                children[dominator].append(block)
+        return children
+
+    def dominates(self, a, b, idom=None):
+        idom = self.immediate_dominators() if idom is None else idom
+        while b is not None and b is not a:
+            b = idom[b]
+        return b is a
+
+    def dominance_frontiers(self, idom=None):
+        """
+        Returns, for every reachable block, the blocks where its dominance ends:
+        the ones it doesn't strictly dominate with a predecessor it dominates.
+        """
+        idom = self.immediate_dominators() if idom is None else idom
+        frontiers = {block: set() for block in idom}
+        for block in idom:
+            predecessors = [predecessor for predecessor in block.predecessors if predecessor in idom]
+            if len(predecessors) < 2:
+                continue
+            for predecessor in predecessors:
+                runner = predecessor
+                while runner is not idom[block]:
+                    frontiers[runner].add(block)
+                    runner = idom[runner]
+        return frontiers
@@ -0,0 +1,114 @@
+from collections import deque
+
+from code_gen.cil_cfg import defined, operands
+
+# Dataflow analyses over a code_gen.cil_cfg.ControlFlowGraph. The facts of a
+# block are frozensets, the facts flowing into a block are the union of the
+# ones flowing out of its neighbours (predecessors for forward analyses,
+# successors for backward ones).
+
+
+def solve(cfg, transfer, forward=True, boundary=frozenset()):
+    """
+    Solves a dataflow problem with `transfer(block, facts)`, that returns the
+    facts at the end of `block` (at its start for backward problems) given the
+    ones at its start. `boundary` flows into the entry (out of the blocks
+    without successors, for backward problems). Returns the facts at the
+    start and at the end of each block, indexed by block index.
+    """
+    blocks = cfg.blocks
+    before = [frozenset()] * len(blocks)  # facts flowing into the block
+    after = [frozenset()] * len(blocks)  # facts flowing out of it
+
+    # one pass in reverse postorder (postorder for backward problems) is
+    # enough for most functions, the worklist picks up loops
+    order = cfg.reachable()
+    reached = set(order)
+    order += [block for block in blocks if block not in reached]
+    if not forward:
+        order.reverse()
+
+    worklist = deque(order)
+    pending = set(order)
+    while worklist:
+        block = worklist.popleft()
+        pending.discard(block)
+
+        sources = block.predecessors if forward else block.successors
+        facts = frozenset().union(*(after[source.index] for source in sources))
+        at_boundary = block is cfg.entry if forward else not block.successors
+        if at_boundary:
+            facts |= boundary
+        before[block.index] = facts
+
+        result = transfer(block, facts)
+        if result != after[block.index]:
+            after[block.index] = result
+            for dependent in block.successors if forward else block.predecessors:
+                if dependent not in pending:
+                    pending.add(dependent)
+                    worklist.append(dependent)
+
+    if forward:
+        return before, after
+    return after, before
+
+
+def block_uses_and_defs(block):
+    # variables read before being defined in the block, and the ones defined
+    uses, defs = set(), set()
+    for instruction in block.instructions:
+        uses.update(name for name in operands(instruction) if name not in defs)
+        dest = defined(instruction)
+        if dest is not None:
+            defs.add(dest)
+    return uses, defs
+
+
+def liveness(cfg):
+    """
+    Returns the variables live at the start and at the end of each block.
+    """
+    summaries = [block_uses_and_defs(block) for block in cfg.blocks]
+
+    def transfer(block, live_out):
+        uses, defs = summaries[block.index]
+        return frozenset(uses) | (live_out - defs)
+
+    return solve(cfg, transfer, forward=False)
+
+
+def live_after(block, live_out):
+    """
+    Yields every instruction of `block` from the last one to the first, with
+    the variables live right after it.
+    """
+    live = set(live_out)
+    for instruction in reversed(block.instructions):
+        yield instruction, live
+        dest = defined(instruction)
+        if dest is not None:
+            live.discard(dest)
+        live.update(operands(instruction))
+
+
+def reaching_definitions(cfg):
+    """
+    Returns the definitions that reach the start and the end of each block, as
+    (variable, block index, instruction index) triples. A read with no
+    definition reaching it reads a param or a local never assigned.
+    """
+    summaries = []
+    for block in cfg.blocks:
+        last_definitions = {}
+        for position, instruction in enumerate(block.instructions):
+            dest = defined(instruction)
+            if dest is not None:
+                last_definitions[dest] = (dest, block.index, position)
+        summaries.append((frozenset(last_definitions), frozenset(last_definitions.values())))
+
+    def transfer(block, reaching):
+        defs, generated = summaries[block.index]
+        return frozenset(definition for definition in reaching if definition[0] not in defs) | generated
+
+    return solve(cfg, transfer, forward=True)
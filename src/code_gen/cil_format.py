@@ -0,0 +1,308 @@
+import json
+
+import cmp.cil as cil
+from cmp.semantic import VariableInfo
+from code_gen.cil_cfg import OBJECT_OPERANDS, VALUE_OPERANDS
+
+# Serialized CIL programs (`.cilo` files), the CIL of a compile that can be
+# read back: linked into MIPS without compiling the COOL program again, kept
+# as per-class code or written by hand as test fixtures.
+#
+# The first line is the header, FORMAT_HEADER and the version. Every other
+# line is a JSON array, a record starting with its kind:
+#
+#     ["type", name, parent, [attribute, ...], [[method, function], ...]]
+#     ["data", name, value]
+#     ["function", name, [param, ...], [local, ...]]
+#     [opcode, field, ...]       an instruction of the last function
+#
+# The opcode of an instruction is the name of its class without the "Node"
+# suffix, its fields are the slots of the class in declaration order (see
+# FIELDS). String constants of LoadNode are written as {"name": .., "data": ..}.
+# A loaded program is checked: every field holds what its instruction expects
+# (see FIELD_KINDS) and the labels, functions, types and data it refers to
+# exist, in the program or in the one it's linked with (the runtime).
+
+FORMAT_HEADER = "COOL-CIL"
+# bumped whenever a record or an instruction changes its fields
+FORMAT_VERSION = 1
+
+
+class CILFormatError(Exception):
+    pass
+
+
+def instruction_types(base=cil.InstructionNode):
+    for node_type in base.__subclasses__():
+        yield node_type
+        yield from instruction_types(node_type)
+
+
+def slots(node_type):
+    names = []
+    for cls in reversed(node_type.__mro__):
+        names.extend(name for name in getattr(cls, "__slots__", ()) if name not in names)
+    return tuple(names)
+
+
+# SSA form only lives in memory (phis refer to the blocks of a graph)
+OPCODES = {
+    node_type: node_type.__name__.removesuffix("Node")
+    for node_type in instruction_types()
+    if node_type is not cil.PhiNode
+}
+INSTRUCTIONS = {opcode: node_type for node_type, opcode in OPCODES.items()}
+FIELDS = {node_type: slots(node_type) for node_type in OPCODES}
+
+# what the fields that aren't operands (see code_gen.cil_cfg) hold, a field of
+# a given instruction first
+FIELD_KINDS = {
+    (cil.DefaultValueNode, "type"): "name",
+    (cil.TypeOfNode, "type"): "optional type",
+    (cil.IntComplementNode, "expr"): "unused",
+    (cil.ReturnNode, "value"): "optional value",
+    (cil.LoadNode, "msg"): "constant",
+    (cil.RuntimeErrorNode, "msg"): "data",
+    (cil.LabelNode, "name"): "name",
+    "dest": "variable",
+    "type": "type",
+    "attr": "name",
+    "label": "label",
+    "function": "function",
+    "flag": "flag",
+    "method_index": "index",
+    "static_type": "optional type",
+}
+
+
+def field_kind(node_type, field):
+    if field in VALUE_OPERANDS.get(node_type, ()) and (node_type, field) not in FIELD_KINDS:
+        return "value"
+    if field in OBJECT_OPERANDS.get(node_type, ()):
+        return "variable"
+    return FIELD_KINDS.get((node_type, field), FIELD_KINDS.get(field))
+
+
+KINDS = {node_type: tuple(field_kind(node_type, field) for field in fields) for node_type, fields in FIELDS.items()}
+
+
+def encode_value(value):
+    if isinstance(value, VariableInfo):
+        return {"name": value.name, "data": value.data}
+    return value
+
+
+def decode_value(value):
+    if isinstance(value, dict):
+        return VariableInfo(value["name"], None, value["data"])
+    return value
+
+
+def encode_instruction(instruction):
+    node_type = type(instruction)
+    if node_type not in OPCODES:
+        raise CILFormatError(f"{node_type.__name__} can't be serialized")
+    return [OPCODES[node_type]] + [encode_value(getattr(instruction, field, None)) for field in FIELDS[node_type]]
+
+
+def records(program):
+    for node in program.dottypes:
+        yield ["type", node.name, node.parent, node.attributes, [list(method) for method in node.methods]]
+    for node in program.dotdata:
+        yield ["data", node.name, node.value]
+    for function in program.dotcode:
+        yield [
+            "function",
+            function.name,
+            [param.name for param in function.params],
+            [local.name for local in function.localvars],
+        ]
+        for instruction in function.instructions:
+            yield encode_instruction(instruction)
+
+
+def dump_lines(program):
+    """
+    Yields the lines (without line breaks) of the serialized `program`.
+    """
+    yield f"{FORMAT_HEADER} {FORMAT_VERSION}"
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    for record in records(program):
+        yield encoder.encode(record)
+
+
+def dumps(program):
+    return "".join(line + "\n" for line in dump_lines(program))
+
+
+def build_instruction(record):
+    node_type = INSTRUCTIONS.get(record[0])
+    if node_type is None:
+        raise CILFormatError(f"unknown instruction `{record[0]}`")
+    fields = FIELDS[node_type]
+    if len(record) != len(fields) + 1:
+        raise CILFormatError(f"`{record[0]}` takes {len(fields)} fields, got {len(record) - 1}")
+    # the nodes are built field by field, their constructors take their
+    # arguments in different orders
+    instruction = node_type.__new__(node_type)
+    for field, value in zip(fields, record[1:]):
+        setattr(instruction, field, decode_value(value))
+    return instruction
+
+
+def loads(text, linked=None, check=True):
+    """
+    Builds the cil.ProgramNode serialized in `text`, to be linked with the
+    `linked` program (the runtime, see code_gen.runtime). Raises
+    CILFormatError if it isn't a valid CIL program of this FORMAT_VERSION.
+    With `check` false the fields and references aren't checked (the code of
+    a single class refers to the rest of its program).
+    """
+    header, _, body = text.partition("\n")
+    if header != f"{FORMAT_HEADER} {FORMAT_VERSION}":
+        if header.startswith(FORMAT_HEADER):
+            raise CILFormatError(f"unsupported version `{header[len(FORMAT_HEADER):].strip()}`, expected {FORMAT_VERSION}")
+        raise CILFormatError("not a serialized CIL program")
+
+    # the records are parsed at once, as the items of a single JSON array
+    lines = body.splitlines()
+    try:
+        parsed = json.loads("[" + ",".join(line for line in lines if line) + "]")
+    except json.JSONDecodeError as e:
+        raise CILFormatError(f"malformed record: {e}") from None
+
+    types, data, code = [], [], []
+    function = None
+    for record in parsed:
+        if not isinstance(record, list) or not record:
+            raise CILFormatError(f"malformed record: {record!r}")
+        kind = record[0]
+        try:
+            if kind == "type":
+                _, name, parent, attributes, methods = record
+                node = cil.TypeNode(name, parent)
+                node.attributes = attributes
+                node.methods = [tuple(method) for method in methods]
+                types.append(node)
+            elif kind == "data":
+                _, name, value = record
+                data.append(cil.DataNode(name, value))
+            elif kind == "function":
+                _, name, params, localvars = record
+                function = cil.FunctionNode(
+                    name,
+                    [cil.ParamNode(param) for param in params],
+                    [cil.LocalNode(local) for local in localvars],
+                    [],
+                )
+                code.append(function)
+            elif function is None:
+                raise CILFormatError(f"instruction `{kind}` outside of a function")
+            else:
+                function.instructions.append(build_instruction(record))
+        except (ValueError, TypeError, KeyError):
+            raise CILFormatError(f"malformed `{kind}` record") from None
+
+    program = cil.ProgramNode(types, data, code)
+    if check:
+        check_program(program, linked)
+    return program
+
+
+class ProgramChecker:
+    """
+    Checks the records of a loaded program, the names it refers to are looked
+    up in the program and in `linked`.
+    """
+
+    def __init__(self, program, linked):
+        programs = [program] if linked is None else [linked, program]
+        self.types = {node.name: node for source in programs for node in source.dottypes}
+        self.functions = {node.name for source in programs for node in source.dotcode}
+        self.data = {node.name for source in programs for node in source.dotdata}
+
+    def check(self, program):
+        for node in program.dottypes:
+            expect(isinstance(node.name, str), f"malformed type name {node.name!r}")
+            expect(node.parent is None or node.parent in self.types, f"unknown parent `{node.parent}` of `{node.name}`")
+            expect(all(isinstance(attr, str) for attr in node.attributes), f"malformed attributes of `{node.name}`")
+            for method in node.methods:
+                expect(len(method) == 2 and isinstance(method[0], str), f"malformed method of `{node.name}`")
+                expect(method[1] in self.functions, f"unknown function `{method[1]}` in `{node.name}`")
+
+        for node in program.dotdata:
+            expect(isinstance(node.name, str) and isinstance(node.value, str), f"malformed data `{node.name}`")
+
+        for function in program.dotcode:
+            self.check_function(function)
+
+    def check_function(self, function):
+        names = [param.name for param in function.params] + [local.name for local in function.localvars]
+        expect(all(isinstance(name, str) for name in names + [function.name]), f"malformed function `{function.name}`")
+
+        variables = set(names)
+        labels = {node.name for node in function.instructions if type(node) is cil.LabelNode}
+        for instruction in function.instructions:
+            node_type = type(instruction)
+            for field, kind in zip(FIELDS[node_type], KINDS[node_type]):
+                value = getattr(instruction, field)
+                expect(
+                    self.valid(kind, value, variables, labels),
+                    f"`{OPCODES[node_type]}` in `{function.name}`: invalid {field} {value!r}",
+                )
+
+    def valid(self, kind, value, variables, labels):
+        if kind == "variable":
+            return value in variables
+        if kind == "value":
+            return isinstance(value, int) or value in variables
+        if kind == "optional value":
+            return value is None or isinstance(value, int) or value in variables
+        if kind == "name":
+            return isinstance(value, str)
+        if kind == "type":
+            return value in self.types
+        if kind == "optional type":
+            return value is None or value in self.types
+        if kind == "label":
+            return value in labels
+        if kind == "function":
+            return value in self.functions
+        if kind == "data":
+            return value in self.data
+        if kind == "constant":
+            return isinstance(value, VariableInfo) and isinstance(value.name, str) and isinstance(value.data, str)
+        if kind == "flag":
+            return isinstance(value, bool)
+        if kind == "index":
+            return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+        return value is None  # unused
+
+
+def expect(condition, message):
+    if not condition:
+        raise CILFormatError(message)
+
+
+def check_program(program, linked=None):
+    """
+    Raises CILFormatError if an instruction of `program` holds a field it
+    doesn't expect or refers to a label, function, type or data that isn't in
+    `program` nor in `linked`.
+    """
+    try:
+        ProgramChecker(program, linked).check(program)
+    except TypeError:
+        raise CILFormatError("malformed record") from None
+
+
+def dump(program, path):
+    with open(path, "w", encoding="utf-8") as file:
+        for line in dump_lines(program):
+            file.write(line)
+            file.write("\n")
+
+
+def load(path, linked=None):
+    with open(path, encoding="utf-8") as file:
+        return loads(file.read(), linked)
@@ -0,0 +1,553 @@
+import cmp.cil as cil
+
+# Interpreter of CIL programs, runs a cil.ProgramNode without generating MIPS
+# (nor needing SPIM). The built-in classes are the ones of the runtime (see
+# code_gen.runtime.runtime_cil), so the program is linked like its MIPS code.
+#
+# Before running, every function is compiled to a list of closures over the
+# slots of its frame (params, then locals, then the pushed args and the return
+# value), labels become instruction indexes and every type gets its dispatch
+# table: the compiled function of each vtable slot. Values are Python ints
+# (Int), bools (Bool), strs (String), Instance (other classes) and None (void).
+
+# frame slots after the variables of the function
+ARGS = -2  # args pushed for the next call
+RESULT = -1
+
+WORD_BITS = 32
+
+# exit status of a program stopped by a runtime error (or an abort)
+ERROR_STATUS = 1
+
+# messages of the runtime errors the CIL code doesn't check itself
+DISPATCH_VOID = "Dispatch on void"
+CASE_VOID = "Case on void"
+ZERO_DIVISION = "Division by zero"
+SUBSTR_OUT_RANGE = "Substring out of range"
+STACK_OVERFLOW = "Stack overflow"
+
+# escape sequences kept in the data of the program, the assembler decodes them
+ESCAPES = {"n": "\n", "t": "\t", "b": "\b", "f": "\f", '"': '"', "\\": "\\"}
+
+# Int, Bool and String values aren't objects: copying them returns the value
+NATIVE_FUNCTIONS = {
+    "Int_copy": lambda value: value,
+    "Bool_copy": lambda value: value,
+    "String_copy": lambda value: value,
+}
+
+
+class CILRuntimeError(Exception):
+    pass
+
+
+class ProgramExit(Exception):
+    def __init__(self, status=0):
+        super().__init__(status)
+        self.status = status
+
+
+class RuntimeType:
+    __slots__ = ("name", "id", "attributes", "vtable")
+
+    def __init__(self, name, type_id, attributes):
+        self.name = name
+        self.id = type_id
+        self.attributes = {attr: index for index, attr in enumerate(attributes)}
+        self.vtable = []  # Function of each method slot
+
+
+class Instance:
+    __slots__ = ("type", "attributes")
+
+    def __init__(self, typex, attributes):
+        self.type = typex
+        self.attributes = attributes
+
+
+class Function:
+    __slots__ = ("name", "params", "size", "code", "native")
+
+    def __init__(self, name, params, size):
+        self.name = name
+        self.params = params  # number of params
+        self.size = size  # params and locals
+        self.code = []
+        self.native = NATIVE_FUNCTIONS.get(name)
+
+
+def decode(text):
+    chars = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == "\\" and index + 1 < len(text):
+            index += 1
+            char = ESCAPES.get(text[index], text[index])
+        chars.append(char)
+        index += 1
+    return "".join(chars)
+
+
+def word(value):
+    # ints wrap around like the 32 bits registers
+    value &= (1 << WORD_BITS) - 1
+    return value - (1 << WORD_BITS) if value >> (WORD_BITS - 1) else value
+
+
+def divide(left, right):
+    if right == 0:
+        raise CILRuntimeError(ZERO_DIVISION)
+    quotient = abs(left) // abs(right)
+    return word(quotient if (left < 0) == (right < 0) else -quotient)
+
+
+def read_line(stream):
+    line = stream.readline()
+    return line[:-1] if line.endswith("\n") else line
+
+
+def read_int(stream):
+    digits = read_line(stream).strip()
+    try:
+        return word(int(digits))
+    except ValueError:
+        return 0
+
+
+class CILInterpreter:
+    def __init__(self, program, stdin, stdout, runtime=None):
+        if runtime is None:
+            from code_gen.runtime import runtime_cil
+
+            runtime = runtime_cil()
+
+        self.stdin = stdin
+        self.stdout = stdout
+
+        type_nodes = runtime.dottypes + program.dottypes
+        intervals = cil.type_intervals({node.name: node.parent for node in type_nodes})
+        self.types = {node.name: RuntimeType(node.name, intervals[node.name][0], node.attributes) for node in type_nodes}
+        self.data = {node.name: decode(node.value) for node in runtime.dotdata + program.dotdata}
+
+        function_nodes = runtime.dotcode + program.dotcode
+        self.functions = {}
+        for node in function_nodes:
+            names = dict.fromkeys([param.name for param in node.params] + [local.name for local in node.localvars])
+            self.functions[node.name] = Function(node.name, len(node.params), len(names))
+
+        for node in type_nodes:
+            self.types[node.name].vtable = [self.functions[function] for _, function in node.methods]
+        for node in function_nodes:
+            self.functions[node.name].code = self.compile_function(node)
+
+    def run(self):
+        """
+        Runs the program, from its `main` function, until it exits or aborts.
+        Returns the exit status of the program, ERROR_STATUS if it stopped on
+        a runtime error.
+        """
+        status = 0
+        try:
+            self.invoke(self.functions["main"], [])
+        except ProgramExit as e:
+            status = e.status
+        except CILRuntimeError as e:
+            self.stdout.write(f"{e}\n")
+            status = ERROR_STATUS
+        except RecursionError:
+            # the calls of the program are calls of the interpreter, a recursion
+            # deeper than the stack of the compiler (see cmp.limits) stops it
+            self.stdout.write(f"{STACK_OVERFLOW}\n")
+            status = ERROR_STATUS
+        self.stdout.flush()
+        return status
+
+    def invoke(self, function, args):
+        if function.native is not None:
+            return function.native(*args[len(args) - function.params :])
+
+        # the params are the last args pushed (abort has none)
+        frame = args[len(args) - function.params :] if function.params else []
+        frame.extend([None] * (function.size - function.params))
+        frame.append([])
+        frame.append(None)
+
+        code = function.code
+        end = len(code)
+        pc = 0
+        while pc < end:
+            target = code[pc](frame)
+            pc = pc + 1 if target is None else target
+        return frame[RESULT]
+
+    def type_of(self, value):
+        if isinstance(value, Instance):
+            return value.type
+        if isinstance(value, str):
+            return self.types["String"]
+        if isinstance(value, bool):
+            return self.types["Bool"]
+        if isinstance(value, int):
+            return self.types["Int"]
+        return None
+
+    def compile_function(self, node):
+        slots = {}
+        for name in [param.name for param in node.params] + [local.name for local in node.localvars]:
+            slots.setdefault(name, len(slots))
+
+        labels = {}
+        instructions = []
+        for instruction in node.instructions:
+            if isinstance(instruction, cil.LabelNode):
+                labels[instruction.name] = len(instructions)
+            else:
+                instructions.append(instruction)
+
+        compiler = InstructionCompiler(self, slots, labels, len(instructions))
+        return [compiler.visit(instruction) for instruction in instructions]
+
+
+class InstructionCompiler:
+    """
+    Compiles each instruction of a function to a closure that runs it on a
+    frame. It returns the index of the next instruction if it jumps, None to
+    go on with the following one.
+    """
+
+    def __init__(self, interpreter, slots, labels, end):
+        self.interpreter = interpreter
+        self.slots = slots
+        self.labels = labels
+        self.end = end  # index after the last instruction, returns jump there
+
+    def slot(self, name):
+        return self.slots[name]
+
+    def reader(self, operand):
+        # operands holding ints may be given as constants (see code_gen.cil_optimizer)
+        if isinstance(operand, int):
+            return lambda frame: operand
+        slot = self.slots[operand]
+        return lambda frame: frame[slot]
+
+    def binary(self, node, operation):
+        dest = self.slot(node.dest)
+        left, right = self.reader(node.left), self.reader(node.right)
+
+        def run(frame):
+            frame[dest] = operation(left(frame), right(frame))
+
+        return run
+
+    def visit(self, node):
+        compile_instruction = getattr(self, "compile_" + type(node).__name__, None)
+        if compile_instruction is None:
+            raise ValueError(f"{type(node).__name__} can't be interpreted")
+        return compile_instruction(node)
+
+    def compile_AssignNode(self, node):
+        dest, source = self.slot(node.dest), self.reader(node.source)
+
+        def run(frame):
+            frame[dest] = source(frame)
+
+        return run
+
+    def compile_PlusNode(self, node):
+        return self.binary(node, lambda left, right: word(left + right))
+
+    def compile_MinusNode(self, node):
+        return self.binary(node, lambda left, right: word(left - right))
+
+    def compile_StarNode(self, node):
+        return self.binary(node, lambda left, right: word(left * right))
+
+    def compile_DivNode(self, node):
+        return self.binary(node, divide)
+
+    def compile_LessNode(self, node):
+        return self.binary(node, lambda left, right: left < right)
+
+    def compile_LessEqualNode(self, node):
+        return self.binary(node, lambda left, right: left <= right)
+
+    def compile_EqualNode(self, node):
+        # ints are compared by value, objects by reference
+        return self.binary(node, lambda left, right: left == right if isinstance(left, int) else left is right)
+
+    def compile_StrEqualNode(self, node):
+        return self.binary(node, lambda left, right: left == right)
+
+    def compile_NotNode(self, node):
+        dest, expr = self.slot(node.dest), self.reader(node.expr)
+
+        def run(frame):
+            frame[dest] = not expr(frame)
+
+        return run
+
+    def compile_IntComplementNode(self, node):
+        dest, source = self.slot(node.dest), self.reader(node.source)
+
+        def run(frame):
+            frame[dest] = word(-source(frame))
+
+        return run
+
+    def compile_GetAttribNode(self, node):
+        dest, instance = self.slot(node.dest), self.slot(node.instance)
+        index = self.interpreter.types[node.type].attributes[node.attr]
+
+        def run(frame):
+            try:
+                frame[dest] = frame[instance].attributes[index]
+            except AttributeError:
+                raise CILRuntimeError(DISPATCH_VOID) from None
+
+        return run
+
+    def compile_SetAttribNode(self, node):
+        instance, value = self.slot(node.instance), self.reader(node.value)
+        index = self.interpreter.types[node.type].attributes[node.attr]
+
+        def run(frame):
+            try:
+                frame[instance].attributes[index] = value(frame)
+            except AttributeError:
+                raise CILRuntimeError(DISPATCH_VOID) from None
+
+        return run
+
+    def compile_AllocateNode(self, node):
+        dest = self.slot(node.dest)
+        typex = self.interpreter.types[node.type]
+        size = len(typex.attributes)
+
+        def run(frame):
+            frame[dest] = Instance(typex, [None] * size)
+
+        return run
+
+    def compile_DefaultValueNode(self, node):
+        dest = self.slot(node.dest)
+        value = {"Int": 0, "Bool": False, "String": ""}.get(node.type)
+
+        def run(frame):
+            frame[dest] = value
+
+        return run
+
+    def compile_TypeOfNode(self, node):
+        dest = self.slot(node.dest)
+        if node.flag:
+            typex = self.interpreter.types[node.type]
+
+            def run(frame):
+                frame[dest] = typex
+
+        else:
+            obj, type_of = self.slot(node.obj), self.interpreter.type_of
+
+            def run(frame):
+                frame[dest] = type_of(frame[obj])
+
+        return run
+
+    def compile_TypeIdNode(self, node):
+        dest, obj, type_of = self.slot(node.dest), self.slot(node.obj), self.interpreter.type_of
+
+        def run(frame):
+            typex = type_of(frame[obj])
+            if typex is None:
+                raise CILRuntimeError(CASE_VOID)
+            frame[dest] = typex.id
+
+        return run
+
+    def compile_CompareTypes(self, node):
+        dest, typeof = self.slot(node.dest), self.slot(node.typeof)
+        typex = self.interpreter.types[node.type]
+
+        def run(frame):
+            frame[dest] = frame[typeof] is typex
+
+        return run
+
+    def compile_TypeNameNode(self, node):
+        dest, source, type_of = self.slot(node.dest), self.slot(node.source), self.interpreter.type_of
+
+        def run(frame):
+            frame[dest] = type_of(frame[source]).name
+
+        return run
+
+    def compile_IsVoidNode(self, node):
+        dest, value = self.slot(node.dest), self.slot(node.value)
+
+        def run(frame):
+            frame[dest] = frame[value] is None
+
+        return run
+
+    def compile_CopyNode(self, node):
+        dest, source = self.slot(node.dest), self.slot(node.source)
+
+        def run(frame):
+            value = frame[source]
+            if isinstance(value, Instance):
+                value = Instance(value.type, list(value.attributes))
+            frame[dest] = value
+
+        return run
+
+    def compile_GotoNode(self, node):
+        target = self.labels[node.label]
+        return lambda frame: target
+
+    def compile_GotoIfNode(self, node):
+        condition, target = self.reader(node.condition), self.labels[node.label]
+
+        def run(frame):
+            if condition(frame):
+                return target
+
+        return run
+
+    def compile_ArgNode(self, node):
+        value = self.reader(node.name)
+
+        def run(frame):
+            frame[ARGS].append(value(frame))
+
+        return run
+
+    def compile_StaticCallNode(self, node):
+        dest, function, invoke = self.slot(node.dest), self.interpreter.functions[node.function], self.interpreter.invoke
+
+        # every function with params takes self first, a static dispatch on
+        # void passes None
+        receiver = -function.params
+
+        def run(frame):
+            args = frame[ARGS]
+            if receiver and args[receiver] is None:
+                raise CILRuntimeError(DISPATCH_VOID)
+            frame[ARGS] = []
+            frame[dest] = invoke(function, args)
+
+        return run
+
+    def compile_DynamicCallNode(self, node):
+        dest, instance_type, index = self.slot(node.dest), self.slot(node.instance_type), node.method_index
+        invoke = self.interpreter.invoke
+
+        def run(frame):
+            typex = frame[instance_type]
+            if typex is None:
+                raise CILRuntimeError(DISPATCH_VOID)
+            args = frame[ARGS]
+            frame[ARGS] = []
+            frame[dest] = invoke(typex.vtable[index], args)
+
+        return run
+
+    def compile_ReturnNode(self, node):
+        end = self.end
+        if node.value is None:
+            def run(frame):
+                return end
+
+            return run
+
+        value = self.reader(node.value)
+
+        def run(frame):
+            frame[RESULT] = value(frame)
+            return end
+
+        return run
+
+    def compile_LoadNode(self, node):
+        dest, value = self.slot(node.dest), self.interpreter.data.get(node.msg.name, decode(node.msg.data))
+
+        def run(frame):
+            frame[dest] = value
+
+        return run
+
+    def compile_LengthNode(self, node):
+        dest, source = self.slot(node.dest), self.slot(node.source)
+
+        def run(frame):
+            frame[dest] = len(frame[source])
+
+        return run
+
+    def compile_ConcatNode(self, node):
+        dest, left, right = self.slot(node.dest), self.slot(node.left), self.slot(node.right)
+
+        def run(frame):
+            frame[dest] = frame[left] + frame[right]
+
+        return run
+
+    def compile_SubstringNode(self, node):
+        dest, source = self.slot(node.dest), self.slot(node.source)
+        index, length = self.reader(node.index), self.reader(node.length)
+
+        def run(frame):
+            string, start, count = frame[source], index(frame), length(frame)
+            if start < 0 or count < 0 or start + count > len(string):
+                raise CILRuntimeError(SUBSTR_OUT_RANGE)
+            frame[dest] = string[start : start + count]
+
+        return run
+
+    def compile_ReadStringNode(self, node):
+        dest, stdin = self.slot(node.dest), self.interpreter.stdin
+
+        def run(frame):
+            frame[dest] = read_line(stdin)
+
+        return run
+
+    def compile_ReadIntNode(self, node):
+        dest, stdin = self.slot(node.dest), self.interpreter.stdin
+
+        def run(frame):
+            frame[dest] = read_int(stdin)
+
+        return run
+
+    def compile_PrintStrNode(self, node):
+        value, write = self.slot(node.str_addr), self.interpreter.stdout.write
+
+        def run(frame):
+            write(frame[value])
+
+        return run
+
+    def compile_PrintIntNode(self, node):
+        value, write = self.reader(node.int_addr), self.interpreter.stdout.write
+
+        def run(frame):
+            write(str(value(frame)))
+
+        return run
+
+    def compile_RuntimeErrorNode(self, node):
+        message, write = self.interpreter.data[node.msg], self.interpreter.stdout.write
+
+        def run(frame):
+            write(message)
+            raise ProgramExit(ERROR_STATUS)
+
+        return run
+
+    def compile_ExitNode(self, node):
+        def run(frame):
+            raise ProgramExit()
+
+        return run
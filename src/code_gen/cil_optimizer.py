@@ -0,0 +1,709 @@
+import copy
+import time
+from collections import Counter, defaultdict
+
+import cmp.cil as cil
+from code_gen.cil_cfg import OPERANDS, VALUE_OPERANDS, ControlFlowGraph, defined, operands
+from code_gen.cil_dataflow import live_after, liveness
+
+# Optimization of the CIL program, run between CILBuilder and MIPSBuilder. A
+# pass rewrites the instructions of one function at a time. Every local and
+# param is a slot of the function's own frame (none of them is reachable from
+# other functions), so calls never change them and only the attributes are
+# read and written through memory.
+
+# ints are 32 bits words, an operation whose result doesn't fit is left to run
+# (add and sub trap on overflow)
+INT_MIN = -(1 << 31)
+INT_MAX = (1 << 31) - 1
+
+# instructions without any effect but defining `dest`, dropped when it's dead
+# (unless they can trap, see traps)
+PURE_INSTRUCTIONS = (
+    cil.AssignNode,
+    cil.ArithmeticNode,
+    cil.UnaryNode,
+    cil.GetAttribNode,
+    cil.AllocateNode,
+    cil.TypeOfNode,
+    cil.LoadNode,
+    cil.LengthNode,
+    cil.ConcatNode,
+    cil.CopyNode,
+    cil.TypeNameNode,
+    cil.DefaultValueNode,
+    cil.IsVoidNode,
+    cil.CompareTypes,
+    cil.TypeIdNode,
+)
+
+
+class CILPass:
+    """
+    An optimization over the instructions of a function. `run` rewrites the
+    function, adds what it changed to `counts` and returns whether it changed
+    anything. `prepare` is called with the whole program and the functions
+    that are going to be optimized, before any of them is.
+    """
+
+    name = None
+
+    def prepare(self, program, functions):
+        pass
+
+    def call_target(self, instruction):
+        # name of the function a dynamic call will be bound to by the pass
+        return None
+
+    def run(self, function, counts):
+        return False
+
+
+class Devirtualization(CILPass):
+    """
+    Binds the dynamic calls with a single possible target to that method
+    (class hierarchy analysis): the method in the vtable slot of the call is
+    the same for the static type of the receiver and all its subtypes. Only
+    calls on receivers that can't be void are bound, the TypeOf left dead is
+    removed by the dead code elimination.
+    """
+
+    name = "devirtualization"
+
+    def __init__(self):
+        self.targets = {}  # type name -> function of each vtable slot, None if overridden below
+
+    def prepare(self, program, functions):
+        types = {type_node.name: type_node for type_node in program.dottypes}
+        children = defaultdict(list)
+        roots = []
+        for type_node in program.dottypes:
+            if type_node.parent in types:
+                children[type_node.parent].append(type_node)
+            else:
+                roots.append(type_node)
+
+        # children before their parents
+        order = []
+        pending = list(roots)
+        while pending:
+            type_node = pending.pop()
+            order.append(type_node)
+            pending.extend(children[type_node.name])
+
+        self.targets = {}
+        for type_node in reversed(order):
+            targets = [function for _, function in type_node.methods]
+            for child in children[type_node.name]:
+                child_targets = self.targets[child.name]
+                for index, function in enumerate(targets):
+                    if child_targets[index] != function:
+                        targets[index] = None
+            self.targets[type_node.name] = targets
+
+    def call_target(self, instruction):
+        if type(instruction) is not cil.DynamicCallNode or instruction.static_type is None:
+            return None
+        targets = self.targets.get(instruction.static_type, ())
+        if instruction.method_index < len(targets):
+            return targets[instruction.method_index]
+        return None
+
+    def run(self, function, counts):
+        bound = 0
+        for position, instruction in enumerate(function.instructions):
+            target = self.call_target(instruction)
+            if target is not None:
+                function.instructions[position] = cil.StaticCallNode(target, instruction.dest)
+                bound += 1
+
+        counts["calls"] += bound
+        return bound > 0
+
+
+class Inlining(CILPass):
+    """
+    Replaces the static calls to small functions by a copy of their code. The
+    params and locals of the copy are renamed to new locals of the caller and
+    its labels get a prefix unique in the program, its returns assign the
+    result and jump to the end of the copy. Functions are optimized after the
+    functions they call (see CILOptimizer.optimize), so the copied code is
+    already optimized; a call to a function that isn't optimized yet (a
+    recursive call) is never inlined.
+    """
+
+    name = "inlining"
+
+    # most instructions of an inlined function, besides its returns
+    MAX_SIZE = 10
+
+    def __init__(self):
+        self.functions = {}
+        self.pending = set()  # functions not optimized yet
+        self.sites = Counter()  # function name -> calls inlined in it
+        self.inlined = defaultdict(set)  # function name -> functions whose code it got
+
+    def prepare(self, program, functions):
+        self.functions = {function.name: function for function in program.dotcode}
+        self.pending = {function.name for function in functions}
+
+    def inlinable(self, callee, caller):
+        if callee is None or callee is caller or callee.name in self.pending:
+            return False
+        size = 0
+        for instruction in callee.instructions:
+            if type(instruction) is cil.ReturnNode:
+                if instruction.value is None:
+                    return False
+            elif type(instruction) is not cil.LabelNode:
+                size += 1
+        return size <= self.MAX_SIZE
+
+    def arguments(self, instructions, position, callee):
+        # the args pushed for the call at `position`, the call pops every arg
+        # pushed after the previous call
+        start = position - len(callee.params)
+        if start < 0 or (start > 0 and type(instructions[start - 1]) is cil.ArgNode):
+            return None
+        if any(type(instruction) is not cil.ArgNode for instruction in instructions[start:position]):
+            return None
+        return [instruction.name for instruction in instructions[start:position]]
+
+    def expand(self, caller, callee, arguments, dest):
+        self.sites[caller.name] += 1
+        prefix = f"inline_{self.sites[caller.name]}_"
+        label_prefix = f"{caller.name}_INLINE_{self.sites[caller.name]}_"
+        end_label = f"{label_prefix}END"
+
+        names = {param.name: prefix + param.name for param in callee.params}
+        names.update((local.name, prefix + local.name) for local in callee.localvars)
+        caller.localvars.extend(cil.LocalNode(name) for name in dict.fromkeys(names.values()))
+
+        code = [cil.AssignNode(names[param.name], value) for param, value in zip(callee.params, arguments)]
+        for instruction in callee.instructions:
+            instruction = copy.copy(instruction)
+            for field in OPERANDS.get(type(instruction), ()):
+                value = getattr(instruction, field)
+                if isinstance(value, str):
+                    setattr(instruction, field, names.get(value, value))
+            if defined(instruction) is not None:
+                instruction.dest = names.get(instruction.dest, instruction.dest)
+
+            if type(instruction) is cil.ReturnNode:
+                code.append(cil.AssignNode(dest, instruction.value))
+                code.append(cil.GotoNode(end_label))
+            elif isinstance(instruction, cil.LabelNode):
+                instruction.name = label_prefix + instruction.name
+                code.append(instruction)
+            elif isinstance(instruction, (cil.GotoNode, cil.GotoIfNode)):
+                instruction.label = label_prefix + instruction.label
+                code.append(instruction)
+            else:
+                code.append(instruction)
+
+        if code and type(code[-1]) is cil.GotoNode and code[-1].label == end_label:
+            code.pop()
+        if any(type(instruction) is cil.GotoNode and instruction.label == end_label for instruction in code):
+            code.append(cil.LabelNode(end_label))
+        return code
+
+    def run(self, function, counts):
+        self.pending.discard(function.name)
+
+        inlined = 0
+        instructions = []
+        for instruction in function.instructions:
+            callee = None
+            if type(instruction) is cil.StaticCallNode:
+                callee = self.functions.get(instruction.function)
+            if not self.inlinable(callee, function):
+                instructions.append(instruction)
+                continue
+            arguments = self.arguments(instructions, len(instructions), callee)
+            if arguments is None:
+                instructions.append(instruction)
+                continue
+
+            del instructions[len(instructions) - len(arguments) :]
+            code = self.expand(function, callee, arguments, instruction.dest)
+            instructions.extend(code)
+            self.inlined[function.name].add(callee.name)
+            self.inlined[function.name].update(self.inlined[callee.name])
+            inlined += 1
+            counts["instructions"] += len(code)
+
+        counts["calls"] += inlined
+        if inlined:
+            function.instructions = instructions
+        return inlined > 0
+
+
+def call_order(functions, call_target):
+    """
+    Returns `functions` ordered so that every function comes after the
+    functions it calls, but for recursive calls. `call_target(instruction)`
+    returns the name of the function a call instruction calls, if known.
+    """
+    by_name = {function.name: function for function in functions}
+    callees = {}
+    for function in functions:
+        names = (call_target(instruction) for instruction in function.instructions)
+        callees[function.name] = [by_name[name] for name in dict.fromkeys(names) if name in by_name]
+
+    order = []
+    visited = set()
+    for root in functions:
+        if root.name in visited:
+            continue
+        visited.add(root.name)
+        stack = [(root, iter(callees[root.name]))]
+        while stack:
+            function, pending = stack[-1]
+            for callee in pending:
+                if callee.name not in visited:
+                    visited.add(callee.name)
+                    stack.append((callee, iter(callees[callee.name])))
+                    break
+            else:
+                stack.pop()
+                order.append(function)
+    return order
+
+
+class CopyPropagation(CILPass):
+    """
+    Replaces the reads of a variable that holds a copy of another one by reads
+    of the original, within a basic block.
+    """
+
+    name = "copy-propagation"
+
+    def run(self, function, counts):
+        replaced = 0
+        for block in ControlFlowGraph(function.instructions).blocks:
+            copy_of = {}  # variable -> variable it holds a copy of
+            copies = defaultdict(set)  # variable -> variables holding a copy of it
+
+            for instruction in block.instructions:
+                node_type = type(instruction)
+                for field in OPERANDS.get(node_type, ()):
+                    original = copy_of.get(getattr(instruction, field))
+                    if original is not None:
+                        setattr(instruction, field, original)
+                        replaced += 1
+
+                dest = defined(instruction)
+                if dest is None:
+                    continue
+
+                for copy in copies.pop(dest, ()):
+                    del copy_of[copy]
+                if dest in copy_of:
+                    copies[copy_of.pop(dest)].discard(dest)
+
+                if node_type is cil.AssignNode and isinstance(instruction.source, str) and instruction.source != dest:
+                    copy_of[dest] = instruction.source
+                    copies[instruction.source].add(dest)
+
+        counts["copies"] += replaced
+        return replaced > 0
+
+
+def fold_arithmetic(node_type, left, right):
+    if node_type is cil.PlusNode:
+        return left + right
+    if node_type is cil.MinusNode:
+        return left - right
+    if node_type is cil.StarNode:
+        return left * right
+    if node_type is cil.DivNode:
+        if right == 0:
+            return None
+        quotient = abs(left) // abs(right)  # div truncates towards zero
+        return quotient if (left < 0) == (right < 0) else -quotient
+    if node_type is cil.LessNode:
+        return left < right
+    if node_type is cil.LessEqualNode:
+        return left <= right
+    if node_type is cil.EqualNode:
+        return left == right
+    return None
+
+
+def traps(instruction):
+    # whether a pure instruction can stop the program: a division by a divisor
+    # that isn't a non zero constant, an add, sub or complement that isn't
+    # known to fit in a word
+    node_type = type(instruction)
+    if node_type is cil.DivNode:
+        return not isinstance(instruction.right, int) or instruction.right == 0
+    if node_type in (cil.PlusNode, cil.MinusNode):
+        left, right = instruction.left, instruction.right
+        if not isinstance(left, int) or not isinstance(right, int):
+            return True
+        return not INT_MIN <= fold_arithmetic(node_type, left, right) <= INT_MAX
+    if node_type is cil.IntComplementNode:
+        return not isinstance(instruction.source, int) or instruction.source == INT_MIN
+    return False
+
+
+class ConstantFolding(CILPass):
+    """
+    Propagates the int constants assigned to variables within a basic block,
+    computes the operations whose operands are all constants and resolves the
+    conditional jumps on a constant.
+    """
+
+    name = "constant-folding"
+
+    def fold(self, instruction):
+        # returns the instructions that replace `instruction`, None to keep it
+        node_type = type(instruction)
+        if issubclass(node_type, cil.ArithmeticNode) and node_type is not cil.StrEqualNode:
+            if isinstance(instruction.left, int) and isinstance(instruction.right, int):
+                value = fold_arithmetic(node_type, instruction.left, instruction.right)
+                if value is not None and INT_MIN <= value <= INT_MAX:
+                    return [cil.AssignNode(instruction.dest, value)]
+        elif node_type is cil.IntComplementNode:
+            if isinstance(instruction.source, int) and INT_MIN <= -instruction.source <= INT_MAX:
+                return [cil.AssignNode(instruction.dest, -instruction.source)]
+        elif node_type is cil.DefaultValueNode:
+            if instruction.type == "Int":
+                return [cil.AssignNode(instruction.dest, 0)]
+            if instruction.type == "Bool":
+                return [cil.AssignNode(instruction.dest, False)]
+        elif node_type is cil.GotoIfNode:
+            if isinstance(instruction.condition, int):
+                return [cil.GotoNode(instruction.label)] if instruction.condition else []
+        return None
+
+    def run(self, function, counts):
+        cfg = ControlFlowGraph(function.instructions)
+
+        propagated = folded = branches = 0
+        for block in cfg.blocks:
+            constants = {}  # variable -> int it holds
+            result = []
+
+            for instruction in block.instructions:
+                node_type = type(instruction)
+                for field in VALUE_OPERANDS.get(node_type, ()):
+                    value = constants.get(getattr(instruction, field))
+                    if value is not None:
+                        setattr(instruction, field, value)
+                        propagated += 1
+
+                replacement = self.fold(instruction)
+                if replacement is None:
+                    replacement = [instruction]
+                elif node_type is cil.GotoIfNode:
+                    branches += 1
+                else:
+                    folded += 1
+
+                for new_instruction in replacement:
+                    dest = defined(new_instruction)
+                    if dest is None:
+                        continue
+                    if type(new_instruction) is cil.AssignNode and isinstance(new_instruction.source, int):
+                        constants[dest] = new_instruction.source
+                    else:
+                        constants.pop(dest, None)
+                result.extend(replacement)
+            block.instructions = result
+
+        function.instructions = cfg.instructions()
+        counts["constants"] += propagated
+        counts["folded"] += folded
+        counts["branches"] += branches
+        return propagated + folded + branches > 0
+
+
+class DeadCodeElimination(CILPass):
+    """
+    Removes the instructions without effects whose result is never read (dead
+    stores and temporaries) and the locals no instruction uses anymore. The
+    operations that may trap are kept, the program stops at -O0 too.
+    """
+
+    name = "dead-code"
+
+    def run(self, function, counts):
+        cfg = ControlFlowGraph(function.instructions)
+        _, live_out = liveness(cfg)
+
+        removed = 0
+        for block in cfg.blocks:
+            live = set(live_out[block.index])
+            kept = []
+            for instruction in reversed(block.instructions):
+                dest = defined(instruction)
+                if (
+                    dest is not None
+                    and dest not in live
+                    and isinstance(instruction, PURE_INSTRUCTIONS)
+                    and not traps(instruction)
+                ):
+                    removed += 1
+                    continue
+                if type(instruction) is cil.AssignNode and instruction.source == dest:
+                    removed += 1
+                    continue
+                if dest is not None:
+                    live.discard(dest)
+                live.update(operands(instruction))
+                kept.append(instruction)
+            block.instructions = kept[::-1]
+        function.instructions = cfg.instructions()
+
+        used = set()
+        for instruction in function.instructions:
+            used.update(operands(instruction))
+            used.add(defined(instruction))
+        localvars = [local for local in function.localvars if local.name in used]
+        dropped = len(function.localvars) - len(localvars)
+        function.localvars = localvars
+
+        counts["instructions"] += removed
+        counts["locals"] += dropped
+        return removed + dropped > 0
+
+
+class UnreachableCodeElimination(CILPass):
+    """
+    Removes the blocks that can't be reached from the start of the function,
+    the labels no jump goes to and the jumps to the instruction that follows.
+    """
+
+    name = "unreachable-code"
+
+    def run(self, function, counts):
+        cfg = ControlFlowGraph(function.instructions)
+        unreachable = cfg.remove_unreachable()
+        reached = cfg.instructions()
+
+        # a jump to one of the labels right after it does nothing
+        jumps = 0
+        result = []
+        for index, instruction in enumerate(reached):
+            if isinstance(instruction, cil.GotoNode):
+                following = index + 1
+                while following < len(reached) and isinstance(reached[following], cil.LabelNode):
+                    if reached[following].name == instruction.label:
+                        break
+                    following += 1
+                else:
+                    result.append(instruction)
+                    continue
+                jumps += 1
+                continue
+            result.append(instruction)
+
+        targets = {
+            instruction.label for instruction in result if isinstance(instruction, (cil.GotoNode, cil.GotoIfNode))
+        }
+        labels = sum(1 for instruction in result if isinstance(instruction, cil.LabelNode) and instruction.name not in targets)
+        function.instructions = [
+            instruction
+            for instruction in result
+            if not isinstance(instruction, cil.LabelNode) or instruction.name in targets
+        ]
+
+        counts["instructions"] += unreachable
+        counts["jumps"] += jumps
+        counts["labels"] += labels
+        return unreachable + jumps + labels > 0
+
+
+class SlotCoalescing(CILPass):
+    """
+    Gives the locals that are never live at the same time a single stack
+    slot: the locals are colored greedily on their interference graph and the
+    locals of each color are renamed to the first of them. A copy between two
+    locals doesn't make them interfere, when they end up sharing the slot the
+    copy is removed.
+    """
+
+    name = "slot-coalescing"
+
+    # instructions that write `dest` before they are done reading the operands
+    # (MIPSBuilder reads the length of a substring again after storing it)
+    EARLY_WRITES = (cil.SubstringNode,)
+
+    def interference(self, cfg, localvars):
+        _, live_out = liveness(cfg)
+        neighbours = {name: set() for name in localvars}
+
+        for block in cfg.blocks:
+            for instruction, live in live_after(block, live_out[block.index]):
+                dest = defined(instruction)
+                if dest not in neighbours:
+                    continue
+                interfering = set(live)
+                if type(instruction) is cil.AssignNode:
+                    interfering.discard(instruction.source)
+                elif isinstance(instruction, self.EARLY_WRITES):
+                    interfering.update(operands(instruction))
+                interfering.discard(dest)
+                for name in interfering:
+                    if name in neighbours:
+                        neighbours[dest].add(name)
+                        neighbours[name].add(dest)
+        return neighbours
+
+    def run(self, function, counts):
+        localvars = list(dict.fromkeys(local.name for local in function.localvars))
+        cfg = ControlFlowGraph(function.instructions)
+        neighbours = self.interference(cfg, localvars)
+
+        slots = []  # name of the slot of each color
+        colors = {}
+        for name in localvars:
+            taken = {colors[neighbour] for neighbour in neighbours[name] if neighbour in colors}
+            color = next(color for color in range(len(slots) + 1) if color not in taken)
+            if color == len(slots):
+                slots.append(name)
+            colors[name] = color
+        slot_of = {name: slots[color] for name, color in colors.items()}
+
+        if len(slots) == len(function.localvars):
+            return False
+
+        removed = 0
+        instructions = []
+        for instruction in function.instructions:
+            for field in OPERANDS.get(type(instruction), ()):
+                value = getattr(instruction, field)
+                if isinstance(value, str) and value in slot_of:
+                    setattr(instruction, field, slot_of[value])
+            dest = defined(instruction)
+            if dest in slot_of:
+                instruction.dest = slot_of[dest]
+            if type(instruction) is cil.AssignNode and instruction.source == instruction.dest:
+                removed += 1
+                continue
+            instructions.append(instruction)
+
+        counts["locals"] += len(function.localvars) - len(slots)
+        counts["copies"] += removed
+        function.instructions = instructions
+        function.localvars = [cil.LocalNode(name) for name in slots]
+        return True
+
+
+O1_PASSES = [Devirtualization, Inlining, CopyPropagation, ConstantFolding, DeadCodeElimination, UnreachableCodeElimination]
+
+# run once, after the other passes
+FINAL_PASSES = [SlotCoalescing]
+
+# the passes run at -O2 are repeated until none of them changes the function,
+# at most MAX_ROUNDS times
+MAX_ROUNDS = 8
+
+# optimization level -> (passes, rounds, final passes)
+OPT_LEVELS = {
+    0: ([], 1, []),
+    1: (O1_PASSES, 1, FINAL_PASSES),
+    2: (O1_PASSES, MAX_ROUNDS, FINAL_PASSES),
+}
+
+
+class OptimizationStats:
+    def __init__(self, level):
+        self.level = level
+        self.counts = {}  # pass name -> Counter of what it changed
+        self.times = Counter()  # pass name -> seconds
+        self.functions = 0
+        self.instructions = [0, 0]  # before and after the passes
+        self.localvars = [0, 0]
+        self.largest_frame = [0, 0]  # most locals of a function
+        self.dynamic_calls = 0  # before the passes
+
+    def lines(self):
+        yield f"optimization level -O{self.level}, {self.functions} functions"
+        for name, counts in self.counts.items():
+            changes = ", ".join(f"{key} {value}" for key, value in sorted(counts.items()))
+            yield f"  {name:<18} {self.times[name] * 1000:8.1f} ms  {changes or 'no changes'}"
+        yield f"  instructions {self.instructions[0]} -> {self.instructions[1]}"
+        yield f"  locals {self.localvars[0]} -> {self.localvars[1]}"
+        yield f"  largest frame {self.largest_frame[0]} -> {self.largest_frame[1]} locals"
+        if self.dynamic_calls:
+            bound = self.counts.get(Devirtualization.name, Counter())["calls"]
+            yield f"  dynamic calls {self.dynamic_calls}, {bound} devirtualized ({bound / self.dynamic_calls:.0%})"
+
+
+class CILOptimizer:
+    def __init__(self, level=1, passes=None, final_passes=None):
+        # with `passes` or `final_passes` (CILPass instances) the level only
+        # sets the number of rounds and the passes not given
+        default_passes, self.rounds, default_final_passes = OPT_LEVELS[level]
+        self.passes = passes if passes is not None else [pass_type() for pass_type in default_passes]
+        self.final_passes = (
+            final_passes if final_passes is not None else [pass_type() for pass_type in default_final_passes]
+        )
+        self.stats = OptimizationStats(level)
+        for optimization in self.passes + self.final_passes:
+            self.stats.counts[optimization.name] = Counter()
+
+    def run_pass(self, optimization, function):
+        start = time.perf_counter()
+        changed = optimization.run(function, self.stats.counts[optimization.name])
+        self.stats.times[optimization.name] += time.perf_counter() - start
+        return changed
+
+    def optimize_function(self, function):
+        stats = self.stats
+        stats.functions += 1
+        stats.instructions[0] += len(function.instructions)
+        stats.localvars[0] += len(function.localvars)
+        stats.largest_frame[0] = max(stats.largest_frame[0], len(function.localvars))
+        stats.dynamic_calls += sum(type(instruction) is cil.DynamicCallNode for instruction in function.instructions)
+
+        for _ in range(self.rounds):
+            changed = False
+            for optimization in self.passes:
+                changed |= self.run_pass(optimization, function)
+            if not changed:
+                break
+
+        for optimization in self.final_passes:
+            self.run_pass(optimization, function)
+
+        stats.instructions[1] += len(function.instructions)
+        stats.localvars[1] += len(function.localvars)
+        stats.largest_frame[1] = max(stats.largest_frame[1], len(function.localvars))
+
+    def call_target(self, instruction):
+        if type(instruction) is cil.StaticCallNode:
+            return instruction.function
+        for optimization in self.passes:
+            target = optimization.call_target(instruction)
+            if target is not None:
+                return target
+        return None
+
+    @property
+    def inlined(self):
+        # function name -> functions whose code was inlined in it
+        inlined = defaultdict(set)
+        for optimization in self.passes:
+            if isinstance(optimization, Inlining):
+                for name, callees in optimization.inlined.items():
+                    inlined[name].update(callees)
+        return inlined
+
+    def optimize(self, program, skip=None):
+        """
+        Optimizes every function of the CIL `program` in place, but the ones
+        `skip(function)` is true for. Functions are optimized after the ones
+        they call.
+        """
+        functions = [function for function in program.dotcode if skip is None or not skip(function)]
+        for optimization in self.passes + self.final_passes:
+            start = time.perf_counter()
+            optimization.prepare(program, functions)
+            self.stats.times[optimization.name] += time.perf_counter() - start
+
+        for function in call_order(functions, self.call_target):
+            self.optimize_function(function)
+        return program
@@ -0,0 +1,207 @@
+from collections import defaultdict
+
+import cmp.cil as cil
+from code_gen.cil_cfg import OPERANDS, BasicBlock, ControlFlowGraph, defined
+from code_gen.cil_dataflow import liveness
+
+# Static single assignment form of CIL functions. In SSA form every variable
+# is defined by one instruction, a PhiNode at the start of a block picks the
+# variable holding a value according to the predecessor control came from.
+# Functions in SSA form are kept as their ControlFlowGraph (phis refer to its
+# blocks), from_ssa turns them back into a list of instructions.
+
+# the versions of a variable are named `<variable>.<n>`, COOL identifiers
+# can't have dots so they never clash with the names CILBuilder gives
+VERSION_SEPARATOR = "."
+
+
+def insert_phis(block, phis):
+    position = 1 if block.label is not None else 0
+    block.instructions[position:position] = phis
+
+
+def to_ssa(function):
+    """
+    Converts `function` to (pruned) SSA form, with phis only where the
+    variable is live. Returns its ControlFlowGraph, the versions of the
+    variables are added to the locals of `function`. Blocks that can't be
+    reached are removed. The first version of each variable is the variable
+    itself: it's read where no definition reaches (params and unassigned
+    locals).
+    """
+    cfg = ControlFlowGraph(function.instructions)
+    cfg.remove_unreachable()
+    if cfg.entry.predecessors:
+        cfg.add_entry_block()
+
+    idom = cfg.immediate_dominators()
+    frontiers = cfg.dominance_frontiers(idom)
+    live_in, _ = liveness(cfg)
+
+    # phis, at the dominance frontier of every definition (iterated)
+    definitions = defaultdict(set)  # variable -> blocks defining it
+    for block in cfg.blocks:
+        for instruction in block.instructions:
+            dest = defined(instruction)
+            if dest is not None:
+                definitions[dest].add(block)
+
+    phis = defaultdict(list)  # block -> phis at its start
+    phi_variables = {}  # phi -> variable it defines
+    for variable, blocks in definitions.items():
+        pending = list(blocks)
+        placed = set()
+        while pending:
+            block = pending.pop()
+            for frontier in frontiers[block]:
+                if frontier in placed or variable not in live_in[frontier.index]:
+                    continue
+                placed.add(frontier)
+                phi = cil.PhiNode(variable, {})
+                phis[frontier].append(phi)
+                phi_variables[phi] = variable
+                if frontier not in blocks:
+                    pending.append(frontier)
+    for block, block_phis in phis.items():
+        insert_phis(block, block_phis)
+
+    # renaming, walking the dominator tree
+    versions = defaultdict(int)
+    current = defaultdict(list)  # variable -> versions visible, innermost last
+    localvars = []
+
+    def new_version(variable):
+        versions[variable] += 1
+        version = f"{variable}{VERSION_SEPARATOR}{versions[variable]}"
+        current[variable].append(version)
+        localvars.append(cil.LocalNode(version))
+        return version
+
+    def visible(variable):
+        stack = current[variable]
+        return stack[-1] if stack else variable
+
+    children = cfg.dominator_tree(idom)
+    stack = [(cfg.entry, None)]
+    while stack:
+        block, defined_variables = stack.pop()
+        if defined_variables is not None:
+            # leaving the subtree of `block`, its versions aren't visible anymore
+            for variable in defined_variables:
+                current[variable].pop()
+            continue
+
+        defined_variables = []
+        for instruction in block.instructions:
+            if type(instruction) is not cil.PhiNode:
+                for field in OPERANDS.get(type(instruction), ()):
+                    value = getattr(instruction, field)
+                    if isinstance(value, str):
+                        setattr(instruction, field, visible(value))
+            dest = defined(instruction)
+            if dest is not None:
+                defined_variables.append(dest)
+                instruction.dest = new_version(dest)
+
+        for successor in block.successors:
+            for instruction in successor.instructions:
+                if type(instruction) is cil.PhiNode:
+                    instruction.sources[block] = visible(phi_variables[instruction])
+
+        stack.append((block, defined_variables))
+        stack.extend((child, None) for child in reversed(children[block]))
+
+    function.localvars = function.localvars + localvars
+    return cfg
+
+
+def sequentialize(copies, temporary):
+    """
+    Returns assignments with the effect of the parallel `copies` (dest ->
+    source, all of them read before any is written). `temporary()` returns a
+    variable to break cycles.
+    """
+    copies = {dest: source for dest, source in copies.items() if dest != source}
+    readers = defaultdict(int)  # variable -> pending copies reading it
+    for source in copies.values():
+        readers[source] += 1
+
+    assignments = []
+    ready = [dest for dest in copies if readers[dest] == 0]
+    while copies:
+        while ready:
+            dest = ready.pop()
+            source = copies.pop(dest)
+            assignments.append(cil.AssignNode(dest, source))
+            readers[source] -= 1
+            if readers[source] == 0 and source in copies:
+                ready.append(source)
+        if copies:
+            # only cycles are left, one of their variables is saved aside
+            dest = next(iter(copies))
+            saved = temporary()
+            assignments.append(cil.AssignNode(saved, dest))
+            for copy_dest, source in copies.items():
+                if source == dest:
+                    copies[copy_dest] = saved
+                    readers[saved] += 1
+            readers[dest] = 0
+            ready.append(dest)
+    return assignments
+
+
+def from_ssa(function, cfg):
+    """
+    Replaces the phis of `cfg`, the graph of `function` in SSA form, by
+    assignments at the end of its predecessors and sets the instructions of
+    `function`. Edges from a block with two successors to a block with phis
+    get a block of their own for the assignments.
+    """
+    labels = {block.label for block in cfg.blocks}
+    names = {local.name for local in function.localvars}
+    temporaries = []
+
+    def new_name(names, template):
+        count = len(names)
+        while template % count in names:
+            count += 1
+        names.add(template % count)
+        return template % count
+
+    def temporary():
+        name = new_name(names, f"ssa{VERSION_SEPARATOR}%d")
+        temporaries.append(cil.LocalNode(name))
+        return name
+
+    for block in list(cfg.blocks):
+        phis = [instruction for instruction in block.instructions if type(instruction) is cil.PhiNode]
+        if not phis:
+            continue
+        block.instructions = [instruction for instruction in block.instructions if type(instruction) is not cil.PhiNode]
+
+        for predecessor in block.predecessors:
+            copies = {phi.dest: phi.sources[predecessor] for phi in phis if predecessor in phi.sources}
+            assignments = sequentialize(copies, temporary)
+            if not assignments:
+                continue
+
+            terminator = predecessor.terminator
+            if isinstance(terminator, cil.GotoIfNode):
+                # the assignments must only run on the way to `block`
+                label = new_name(labels, f"{function.name}_SSA_%d")
+                instructions = [cil.LabelNode(label)] + assignments
+                if terminator.label == block.label:
+                    terminator.label = label
+                if predecessor.index + 1 < len(cfg.blocks) and cfg.blocks[predecessor.index + 1] is block:
+                    # falls through into `block`, the new block goes in between
+                    cfg.blocks.insert(predecessor.index + 1, BasicBlock(instructions))
+                else:
+                    cfg.blocks.append(BasicBlock(instructions + [cil.GotoNode(block.label)]))
+                cfg.link()
+            elif isinstance(terminator, cil.GotoNode):
+                predecessor.instructions[-1:-1] = assignments
+            else:
+                predecessor.instructions.extend(assignments)
+
+    function.instructions = cfg.instructions()
+    function.localvars = function.localvars + temporaries
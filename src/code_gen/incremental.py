@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import cmp.cil as cil
+import code_gen.mips_nodes as mips
+from code_gen.cil_format import CILFormatError, dumps, loads
+from code_gen.runtime import cache_key
+
+# Incremental compilation: the CIL functions and MIPS procedures generated for
+# each class are cached on disk, next to the compiled program, and reused while
+# the class fingerprint doesn't change. A fingerprint covers the class body and
+# the interface of the whole program (every class name, parent, attribute and
+# method signature), because attribute offsets, method indexes and case
+# branches depend on classes other than the one being compiled. A class whose
+# functions got code of other classes inlined also keeps the fingerprints of
+# those classes. The type nodes (vtables), the main function and the data
+# section are always relinked.
+#
+# A fragment is stored as text, nothing in it is executed when it's read: a
+# JSON line with the fingerprints and the assembled MIPS procedures of the
+# class, then its CIL functions and data in the .cilo format (see
+# code_gen.cil_format).
+
+CACHE_DIR_NAME = "__coolcache__"
+FRAGMENT_SUFFIX = ".fragment"
+
+# the cached code is optimized, it depends on the optimizer and the level
+OPTIMIZER = Path(__file__).parent / "cil_optimizer.py"
+
+
+class ClassFragment:
+    def __init__(self, fingerprint, code, data):
+        self.fingerprint = fingerprint
+        self.code = code  # cil.FunctionNode of the class
+        self.data = data  # cil.DataNode of the class
+        self.procedures = {}  # function name -> mips.ProcedureNode (assembled if cached)
+        self.dependencies = {}  # class name -> fingerprint, of the classes whose code was inlined
+
+    def dumps(self):
+        from code_gen.mips_writer import MIPSWriter
+
+        writer = MIPSWriter()
+        header = {
+            "fingerprint": self.fingerprint,
+            "dependencies": self.dependencies,
+            "procedures": {name: writer.assemble_procedure(proc) for name, proc in self.procedures.items()},
+        }
+        return json.dumps(header) + "\n" + dumps(cil.ProgramNode([], self.data, self.code))
+
+    @staticmethod
+    def loads(text):
+        # raises ValueError (or CILFormatError) if `text` isn't a fragment
+        header, _, body = text.partition("\n")
+        header = json.loads(header)
+        program = loads(body, check=False)
+
+        fragment = ClassFragment(str(header["fingerprint"]), program.dotcode, program.dotdata)
+        fragment.dependencies = {str(name): str(fingerprint) for name, fingerprint in header["dependencies"].items()}
+        fragment.procedures = {
+            str(name): mips.AssembledProcedureNode(str(name), str(text)) for name, text in header["procedures"].items()
+        }
+        return fragment
+
+
+def fields(node):
+    # ast nodes are slotted, other objects keep their fields in __dict__
+    for cls in type(node).__mro__:
+        for key in getattr(cls, "__slots__", ()):
+            if hasattr(node, key):
+                yield key, getattr(node, key)
+    yield from getattr(node, "__dict__", {}).items()
+
+
+def feed(hasher, value):
+    if isinstance(value, (list, tuple)):
+        hasher.update(b"[")
+        for item in value:
+            feed(hasher, item)
+        hasher.update(b"]")
+    elif hasattr(value, "name") and hasattr(value, "conforms_to"):
+        # semantic Type held by the typed ast, it's identified by its name
+        hasher.update(f"<{value.name}>".encode())
+    elif hasattr(value, "__slots__") or hasattr(value, "__dict__"):
+        hasher.update(f"({type(value).__name__}".encode())
+        for key, item in fields(value):
+            hasher.update(key.encode())
+            feed(hasher, item)
+        hasher.update(b")")
+    else:
+        hasher.update(repr(value).encode())
+
+
+def optimizer_key(opt_level):
+    stat = OPTIMIZER.stat()
+    return f"-O{opt_level} {stat.st_mtime_ns} {stat.st_size}"
+
+
+def interface_fingerprint(context, opt_level):
+    hasher = hashlib.md5(cache_key().encode())
+    hasher.update(optimizer_key(opt_level).encode())
+    for typex in context.types.values():
+        parent = None if typex.parent is None else typex.parent.name
+        attributes = [(attr.name, attr.type.name) for attr in typex.attributes]
+        methods = [
+            (
+                method.name,
+                method.param_names,
+                [param_type.name for param_type in method.param_types],
+                method.return_type.name,
+            )
+            for method in typex.methods
+        ]
+        feed(hasher, (typex.name, parent, attributes, methods))
+    return hasher.hexdigest()
+
+
+def class_fingerprint(node, interface):
+    hasher = hashlib.md5(interface.encode())
+    feed(hasher, node)
+    return hasher.hexdigest()
+
+
+class ClassCache:
+    def __init__(self, input_file: Path, program, opt_level=1):
+        self.directory = input_file.parent / CACHE_DIR_NAME
+        self.prefix = input_file.stem
+
+        interface = interface_fingerprint(program.context, opt_level)
+        self.fingerprints = {
+            declaration.id: class_fingerprint(declaration, interface)
+            for declaration in program.declarations
+        }
+
+        self.procedures = {}  # function name -> cached mips.ProcedureNode
+        self.built = {}  # class name -> ClassFragment generated in this compile
+        self.owners = {}  # function name -> ClassFragment generated in this compile
+        self.fragments = {}  # class name -> ClassFragment, generated or taken from the cache
+        self.classes = {}  # function name -> class name
+
+    def fragment_path(self, cname):
+        return self.directory / f"{self.prefix}.{cname}{FRAGMENT_SUFFIX}"
+
+    def lookup(self, cname):
+        try:
+            fragment = ClassFragment.loads(self.fragment_path(cname).read_text(encoding="utf-8"))
+        except (OSError, UnicodeDecodeError, ValueError, TypeError, KeyError, AttributeError, CILFormatError):
+            return None
+
+        if fragment.fingerprint != self.fingerprints[cname]:
+            return None
+        if any(self.fingerprints.get(name) != fingerprint for name, fingerprint in fragment.dependencies.items()):
+            return None
+        if any(function.name not in fragment.procedures for function in fragment.code):
+            return None
+
+        self.procedures.update(fragment.procedures)
+        self.add_fragment(cname, fragment)
+        return fragment
+
+    def add_fragment(self, cname, fragment):
+        self.fragments[cname] = fragment
+        for function in fragment.code:
+            self.classes[function.name] = cname
+
+    def store_cil(self, cname, code, data):
+        fragment = ClassFragment(self.fingerprints[cname], code, data)
+        self.built[cname] = fragment
+        self.add_fragment(cname, fragment)
+        for function in code:
+            self.owners[function.name] = fragment
+
+    def store_inlined(self, inlined):
+        # `inlined` maps each function to the functions whose code it got
+        for fname, callees in inlined.items():
+            fragment = self.owners.get(fname)
+            if fragment is None:
+                continue
+            for callee in callees:
+                cname = self.classes.get(callee)
+                if cname is None:
+                    continue
+                fragment.dependencies[cname] = self.fingerprints[cname]
+                # the code of a class taken from the cache may have code of other classes too
+                fragment.dependencies.update(self.fragments[cname].dependencies)
+
+    def lookup_procedure(self, fname):
+        return self.procedures.get(fname)
+
+    def store_procedure(self, procedure):
+        fragment = self.owners.get(procedure.label)
+        if fragment is not None:
+            fragment.procedures[procedure.label] = procedure
+
+    def save(self):
+        try:
+            self.directory.mkdir(exist_ok=True)
+            for cname, fragment in self.built.items():
+                path = self.fragment_path(cname)
+                tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_text(fragment.dumps(), encoding="utf-8")
+                os.replace(tmp_path, path)
+
+            # fragments of classes removed from the program
+            for path in self.directory.glob(f"{self.prefix}.*{FRAGMENT_SUFFIX}"):
+                cname = path.name[len(self.prefix) + 1 : -len(FRAGMENT_SUFFIX)]
+                if cname not in self.fingerprints:
+                    path.unlink()
+        except OSError:
+            pass  # classes are generated again on the next compile
@@ -11,6 +11,7 @@ FUNCTION_OFFSET = 4
 RA_OFFSET = 8
 OLD_FP_OFFSET = 4
 TYPEINFO_ATTR_OFFSET = 0
+TYPE_ID_OFFSET = -4  # the id of a type is the word before its vtable, see cil.type_intervals
 
 # str attributes offsets
 LENGTH_ATTR_OFFSET = 4
@@ -107,31 +108,70 @@ class MemoryManager:
 
 
 class MIPSBuilder:
-    def __init__(self):
+    def __init__(self, writer=None, runtime=None, cache=None):
+        # with a writer, procedures are written out as soon as they are built
+        # (once the data section is complete) instead of kept in self.text
+        self.writer = writer
+        # prebuilt built-in classes and auxiliar procedures (code_gen.runtime)
+        self.runtime = runtime
+        # code_gen.incremental.ClassCache with the procedures of unchanged classes
+        self.cache = cache
+        self.data_written = False
         self.mips_code = ""
         self.main_size = 0
         self.text = []
         self.data = []
         self.params = []
         self.locals = []
+        self.offsets = {}
         self.types = {}
+        self.type_ids = {}
         self.attr_offset = {}
         self.memo = MemoryManager()
         self.pushed_args = 0
         
     
     def get_offset(self,x):
-        if x in self.locals:
-            index = self.locals.index(x)
-            return 4 * index
-        elif x in self.params:
-            index = self.params.index(x)
-            return 4 * (-len(self.params) + index)
+        return self.offsets.get(x)
+
+    def load_value(self, reg, value):
+        # operands holding ints may be given as constants (see code_gen.cil_optimizer)
+        if isinstance(value, int):
+            self.register_instruction(mips.LoadInmediate, reg, value)
+        else:
+            self.register_instruction(mips.LoadWordNode, reg, self.get_offset(value), fp)
+
+    def compute_offsets(self):
+        # offset from $fp of every local and param of the current function,
+        # looked up for each instruction operand
+        offsets = {}
+        for index, param in enumerate(self.params):
+            offsets.setdefault(param, 4 * (-len(self.params) + index))
+
+        local_offsets = {}
+        for index, local in enumerate(self.locals):
+            local_offsets.setdefault(local, 4 * index)
+        offsets.update(local_offsets)
+
+        return offsets
 
     def register_instruction(self, instruction_type, *args):
         instruction = instruction_type(*args)
         self.current_procedure.instructions.append(instruction)
 
+    def register_procedure(self, procedure):
+        if self.data_written:
+            self.writer.write_procedure(procedure)
+        else:
+            self.text.append(procedure)
+
+    def write_data_section(self):
+        self.writer.write_data(self.data, self.runtime)
+        self.data_written = True
+        for procedure in self.text:
+            self.writer.write_procedure(procedure)
+        self.text = []
+
     def register_data(self, data_type, *args):
         data = data_type(*args)
         self.data.append(data)
@@ -173,6 +213,10 @@ class MIPSBuilder:
         self.register_data(mips.DataTypeNode, ".asciiz", EMPTY_STRING, ['"\"\""'])
         self.register_data(mips.DataTypeNode, ".space", INPUT_STR_BUFFER, [BUFFER_SIZE])
 
+    def compute_type_ids(self, types):
+        intervals = cil.type_intervals({type.name: type.parent for type in types})
+        return {name: type_id for name, (type_id, _) in intervals.items()}
+
     def generate_attr_offset(self, type):
         attributes = self.types[type].attributes
         self.attr_offset[type] = {}
@@ -201,7 +245,7 @@ class MIPSBuilder:
         self.register_instruction(mips.MoveNode, a0, reg1)
         self.register_instruction(mips.Jump, ra)
 
-        self.text.append(self.current_procedure)
+        self.register_procedure(self.current_procedure)
         self.memo.clean()
             
     def generate_copy(self):
@@ -221,7 +265,7 @@ class MIPSBuilder:
         self.register_instruction(mips.Label, "copy_end")
         self.register_instruction(mips.Jump, ra)
 
-        self.text.append(self.current_procedure)
+        self.register_procedure(self.current_procedure)
         self.memo.clean()
         
         
@@ -252,7 +296,7 @@ class MIPSBuilder:
         self.register_instruction(mips.Label, "input_end")
         self.register_instruction(mips.Jump, ra)
 
-        self.text.append(self.current_procedure)
+        self.register_procedure(self.current_procedure)
         
         
  
@@ -288,7 +332,7 @@ class MIPSBuilder:
         self.register_instruction(mips.Label, "end_loop")
         self.register_instruction(mips.JumpRegister, ra)
 
-        self.text.append(self.current_procedure)
+        self.register_procedure(self.current_procedure)
         
     def generate_auxiliar_procedures(self):
         self.generate_str_length()
@@ -300,8 +344,9 @@ class MIPSBuilder:
     def visit(self, node=None):
         pass
 
-    @visitor.when(cil.ProgramNode)
-    def visit(self, node):
+    def build_runtime(self, node):
+        # node holds the built-in classes, see CILBuilder.build_runtime
+        self.type_ids = self.compute_type_ids(node.dottypes)
         for type in node.dottypes:
             self.visit(type)
             self.generate_attr_offset(type.name)
@@ -314,10 +359,37 @@ class MIPSBuilder:
         for str_data in node.dotdata:
             self.visit(str_data)
 
+        for function in node.dotcode:
+            self.visit(function)
+
+        return mips.ProgramNode(self.data, self.text)
+
+    @visitor.when(cil.ProgramNode)
+    def visit(self, node):
+        if self.runtime is None:
+            from code_gen.runtime import load_runtime
+
+            self.runtime = load_runtime()
+
+        for type in self.runtime.types:
+            self.types[type.name] = type
+            self.generate_attr_offset(type.name)
+
+        self.type_ids = self.compute_type_ids(self.runtime.types + node.dottypes)
+        for type in node.dottypes:
+            self.visit(type)
+            self.generate_attr_offset(type.name)
+
+        for str_data in node.dotdata:
+            self.visit(str_data)
+
+        if self.writer is not None:
+            self.write_data_section()
+
         for instruction in node.dotcode:
             self.visit(instruction)
 
-        return mips.ProgramNode(self.data, self.text)
+        return mips.ProgramNode(self.data, self.text, self.runtime)
 
     @visitor.when(cil.TypeNode)
     def visit(self, node):
@@ -328,10 +400,8 @@ class MIPSBuilder:
         for func in node.methods:
             values.append(func[1])
 
+        self.register_data(mips.DataTypeNode, ".word", f"{node.name}_id", [self.type_ids[node.name]])
         self.register_data(mips.DataTypeNode, ".word", node.name, values)
-        self.register_data(
-            mips.DataTypeNode, ".asciiz", f"{node.name}_cname", [f'"{node.name}"']
-        )
 
     @visitor.when(cil.DataNode)
     def visit(self, node):
@@ -345,8 +415,7 @@ class MIPSBuilder:
         self.register_instruction(mips.CommentNode, f"Receiving Arg {node.name}")
         reg = self.memo.get_unused_reg()
 
-        offset = self.get_offset(node.name)
-        self.register_instruction(mips.LoadWordNode, reg, offset, fp)
+        self.load_value(reg, node.name)
         self.register_push(reg)
         self.pushed_args += 1
 
@@ -354,9 +423,16 @@ class MIPSBuilder:
 
     @visitor.when(cil.FunctionNode)
     def visit(self, node):
+        if self.cache is not None:
+            procedure = self.cache.lookup_procedure(node.name)
+            if procedure is not None:
+                self.register_procedure(procedure)
+                return
+
         self.memo.save()
         locals_save = self.locals
         params_save = self.params
+        offsets_save = self.offsets
         self.locals, self.params = [], []
         self.current_procedure = mips.ProcedureNode(node.name)
 
@@ -382,13 +458,18 @@ class MIPSBuilder:
         for param in node.params:
             self.params.append(param.name)
 
+        self.offsets = self.compute_offsets()
+
         self.register_instruction(mips.CommentNode, "Executing instructions")
         for inst in node.instructions:
             self.visit(inst)
 
-        self.text.append(self.current_procedure)
+        self.register_procedure(self.current_procedure)
+        if self.cache is not None:
+            self.cache.store_procedure(self.current_procedure)
         self.locals = locals_save
         self.params = params_save
+        self.offsets = offsets_save
 
     @visitor.when(cil.LoadNode)
     def visit(self, node: cil.LoadNode):
@@ -464,9 +545,8 @@ class MIPSBuilder:
         self.memo.save()
         
         reg = self.memo.get_unused_reg()
-        cond_offset = self.get_offset(node.condition)
-        
-        self.register_instruction(mips.LoadWordNode,reg,cond_offset,fp)
+
+        self.load_value(reg, node.condition)
         
         self.register_instruction(mips.BranchOnNotEqZero,reg,node.label)
         self.memo.clean()
@@ -581,8 +661,7 @@ class MIPSBuilder:
         instance_offset = self.get_offset(node.instance)
         self.register_instruction(mips.LoadWordNode, reg1, instance_offset, fp)
 
-        value_offset = self.get_offset(node.value)
-        self.register_instruction(mips.LoadWordNode, reg2, value_offset, fp)
+        self.load_value(reg2, node.value)
 
         attr_os = self.attr_offset[node.type][node.attr]
         self.register_instruction(mips.StoreWordNode, reg2, attr_os, reg1)
@@ -639,11 +718,8 @@ class MIPSBuilder:
         reg_r = self.memo.get_unused_reg()
         reg_dest = self.memo.get_unused_reg()
 
-        left_offset = self.get_offset(node.left)
-        right_offset = self.get_offset(node.right)
-
-        self.register_instruction(mips.LoadWordNode, reg_l, left_offset, fp)
-        self.register_instruction(mips.LoadWordNode, reg_r, right_offset, fp)
+        self.load_value(reg_l, node.left)
+        self.load_value(reg_r, node.right)
 
         self.register_instruction(mips.AddNode, reg_dest, reg_l, reg_r)
 
@@ -660,11 +736,8 @@ class MIPSBuilder:
         reg_r = self.memo.get_unused_reg()
         reg_dest = self.memo.get_unused_reg()
 
-        left_offset = self.get_offset(node.left)
-        right_offset = self.get_offset(node.right)
-
-        self.register_instruction(mips.LoadWordNode, reg_l, left_offset, fp)
-        self.register_instruction(mips.LoadWordNode, reg_r, right_offset, fp)
+        self.load_value(reg_l, node.left)
+        self.load_value(reg_r, node.right)
 
         self.register_instruction(mips.SubNode, reg_dest, reg_l, reg_r)
 
@@ -680,11 +753,8 @@ class MIPSBuilder:
         reg1 = self.memo.get_unused_reg()
         reg2 = self.memo.get_unused_reg()
 
-        left_offset = self.get_offset(node.left)
-        right_offset = self.get_offset(node.right)
-
-        self.register_instruction(mips.LoadWordNode, reg1, left_offset, fp)
-        self.register_instruction(mips.LoadWordNode, reg2, right_offset, fp)
+        self.load_value(reg1, node.left)
+        self.load_value(reg2, node.right)
 
         self.register_instruction(mips.MultNode, reg1, reg2)
 
@@ -701,11 +771,8 @@ class MIPSBuilder:
         reg1 = self.memo.get_unused_reg()
         reg2 = self.memo.get_unused_reg()
 
-        left_offset = self.get_offset(node.left)
-        right_offset = self.get_offset(node.right)
-
-        self.register_instruction(mips.LoadWordNode, reg1, left_offset, fp)
-        self.register_instruction(mips.LoadWordNode, reg2, right_offset, fp)
+        self.load_value(reg1, node.left)
+        self.load_value(reg2, node.right)
 
         self.register_instruction(mips.DivideNode, reg1, reg2)
 
@@ -720,13 +787,12 @@ class MIPSBuilder:
         self.register_instruction(mips.CommentNode,"Executing Int Complement")
         self.memo.save()
 
-        source_offset = self.get_offset(node.source)
         dest_offset = self.get_offset(node.dest)
 
         reg1 = self.memo.get_unused_reg()
         reg2 = self.memo.get_unused_reg()
 
-        self.register_instruction(mips.LoadWordNode, reg1, source_offset, fp)
+        self.load_value(reg1, node.source)
         self.register_instruction(mips.NotNode, reg2, reg1)
         self.register_instruction(mips.AddiNode, reg2, reg2, 1)
         self.register_instruction(mips.StoreWordNode, reg2, dest_offset, fp)
@@ -1069,6 +1135,18 @@ class MIPSBuilder:
         self.register_instruction(mips.LoadInmediate, v0, SYSCALL_PRINT_INT)
         self.register_instruction(mips.SyscallNode)
 
+    @visitor.when(cil.TypeIdNode)
+    def visit(self, node):
+        self.register_instruction(mips.CommentNode, "Executing TypeId")
+        self.memo.save()
+        reg = self.memo.get_unused_reg()
+        obj_offset = self.get_offset(node.obj)
+        self.register_instruction(mips.LoadWordNode, reg, obj_offset, fp)
+        self.register_instruction(mips.LoadWordNode, reg, TYPEINFO_ATTR_OFFSET, reg)
+        self.register_instruction(mips.LoadWordNode, reg, TYPE_ID_OFFSET, reg)
+        self.register_instruction(mips.StoreWordNode, reg, self.get_offset(node.dest), fp)
+        self.memo.clean()
+
     @visitor.when(cil.TypeOfNode)
     def visit(self, node):
         self.memo.save()
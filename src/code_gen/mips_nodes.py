@@ -8,34 +8,50 @@
 
 
 class MIPS_Node:
-    pass
+    __slots__ = ()
 
 
 class ProgramNode(MIPS_Node):
-    def __init__(self, data, code):
+    __slots__ = ("data", "text", "runtime")
+
+    def __init__(self, data, code, runtime=None):
         self.data = data
         self.text = code
+        self.runtime = runtime
 
 
 class DataNode(MIPS_Node):
-    pass
+    __slots__ = ()
 
 
 class InstructionNode(MIPS_Node):
-    pass
+    __slots__ = ()
 
 
 class DataTransferNode(InstructionNode):
-    pass
+    __slots__ = ()
 
 
 class ProcedureNode(InstructionNode):
+    __slots__ = ("label", "instructions")
+
     def __init__(self, label):
         self.label = label
         self.instructions = []
 
 
+class AssembledProcedureNode(InstructionNode):
+    # a procedure already written as text, taken from a cache (see code_gen.incremental)
+    __slots__ = ("label", "text")
+
+    def __init__(self, label, text):
+        self.label = label
+        self.text = text
+
+
 class DataTransferWithOffset(DataTransferNode):
+    __slots__ = ("source", "offset", "destination")
+
     def __init__(self, source, offset, dest):
         self.source = source
         self.offset = offset
@@ -43,42 +59,59 @@ class DataTransferWithOffset(DataTransferNode):
 
 
 class LoadWordNode(DataTransferWithOffset):
+    __slots__ = ()
+
     def __str__(self):
         return f"lw {self.source}, {str(self.offset)}({self.destination})"
 
 
 class LoadByteNode(DataTransferWithOffset):
+    __slots__ = ()
+
     def __str__(self):
         return f"lb {self.source}, {str(self.offset)}({self.destination})"
 
 
 class StoreWordNode(DataTransferWithOffset):
+    __slots__ = ()
+
     def __str__(self):
         return f"sw {self.source}, {str(self.offset)}({self.destination})"
 
 
 class StoreByteNode(DataTransferWithOffset):
+    __slots__ = ()
+
     def __str__(self):
         return f"sb {self.source}, {str(self.offset)}({self.destination})"
 
 
 class LoadNode(DataTransferNode):
+    __slots__ = ("destination", "value")
+
     def __init__(self, dest, value):
         self.destination = dest
         self.value = value
 
 
 class LoadInmediate(LoadNode):
+    __slots__ = ()
+
     def __str__(self):
-        return f"li {self.destination}, {self.value}"
+        # Bool constants are Python bools (see code_gen.cil_builder)
+        return f"li {self.destination}, {self.value:d}"
 
 
 class LoadAddress(LoadNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"la {self.destination}, {self.value}"
 
 
 class MoveNode(DataTransferNode):
+    __slots__ = ("destination", "source")
+
     def __init__(self, destination, source):
         self.destination = destination
         self.source = source
@@ -88,6 +121,8 @@ class MoveNode(DataTransferNode):
 
 
 class DataTypeNode(DataNode):
+    __slots__ = ("datatype", "name", "vt_values")
+
     def __init__(self, datatype, name, vt_values):
         self.datatype = datatype
         self.name = name
@@ -101,6 +136,8 @@ class DataTypeNode(DataNode):
 
 
 class NotNode(InstructionNode):
+    __slots__ = ("dest", "source")
+
     def __init__(self, dest, source):
         self.dest = dest
         self.source = source
@@ -110,6 +147,8 @@ class NotNode(InstructionNode):
     
     
 class NegNode(InstructionNode):
+    __slots__ = ("dest", "source")
+
     def __init__(self, dest, source):
         self.dest = dest
         self.source = source
@@ -118,6 +157,8 @@ class NegNode(InstructionNode):
         return f"neg {self.dest}, {self.source}"
 
 class ArithAnfLogicNode(InstructionNode):
+    __slots__ = ("destination", "left", "right")
+
     def __init__(self, destination, left, right):
         self.destination = destination
         self.left = left
@@ -125,37 +166,51 @@ class ArithAnfLogicNode(InstructionNode):
 
 
 class AddNode(ArithAnfLogicNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"add {self.destination}, {self.left}, {self.right}"
 
 
 class AddiNode(ArithAnfLogicNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"addi {self.destination}, {self.left}, {self.right}"
 
 
 class SubNode(ArithAnfLogicNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"sub {self.destination}, {self.left}, {self.right}"
 
 
 class HiLoOperationNode(InstructionNode):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
 
 class MultNode(HiLoOperationNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"mult {self.left}, {self.right}"
 
 
 class DivideNode(HiLoOperationNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"div {self.left}, {self.right}"
 
 
 class MoveFromHi(InstructionNode):
+    __slots__ = ("register",)
+
     def __init__(self, register):
         self.register = register
 
@@ -164,6 +219,8 @@ class MoveFromHi(InstructionNode):
 
 
 class MoveFromLo(InstructionNode):
+    __slots__ = ("register",)
+
     def __init__(self, register):
         self.register = register
 
@@ -172,6 +229,8 @@ class MoveFromLo(InstructionNode):
 
 
 class ConditionalBranch(InstructionNode):
+    __slots__ = ("c1", "c2", "jump")
+
     def __init__(self, c1, c2, jump):
         self.c1 = c1
         self.c2 = c2
@@ -179,35 +238,49 @@ class ConditionalBranch(InstructionNode):
 
 
 class BranchOnEqualNode(ConditionalBranch):
+    __slots__ = ()
+
     def __str__(self):
         return f"beq {self.c1}, {self.c2}, {self.jump}"
 
 
 class BranchOnNotEqualNode(ConditionalBranch):
+    __slots__ = ()
+
     def __str__(self):
         return f"bne {self.c1}, {self.c2}, {self.jump}"
 
 
 class BranchOnGreaterThanNode(ConditionalBranch):
+    __slots__ = ()
+
     def __str__(self):
         return f"bgt {self.c1}, {self.c2}, {self.jump}"
 
 
 class BranchOnGreaterOrEqNode(ConditionalBranch):
+    __slots__ = ()
+
     def __str__(self):
         return f"bge {self.c1}, {self.c2}, {self.jump}"
 
 
 class BranchOnLessThanNode(ConditionalBranch):
+    __slots__ = ()
+
     def __str__(self):
         return f"blt {self.c1}, {self.c2}, {self.jump}"
 
 
 class BranchOnLessOrEqNode(ConditionalBranch):
+    __slots__ = ()
+
     def __str__(self):
         return f"ble {self.c1}, {self.c2}, {self.jump}"
 
 class BranchOnNotEqZero(InstructionNode):
+    __slots__ = ("reg", "label")
+
     def __init__(self,reg,label):
         self.reg = reg
         self.label = label
@@ -216,6 +289,8 @@ class BranchOnNotEqZero(InstructionNode):
         return f'bnez {self.reg}, {self.label}'
     
 class BranchOnEqZero(InstructionNode):
+    __slots__ = ("reg", "label")
+
     def __init__(self,reg,label):
         self.reg = reg
         self.label = label
@@ -224,6 +299,8 @@ class BranchOnEqZero(InstructionNode):
         return f'beqz {self.reg}, {self.label}'
     
 class BranchOnGreaterZero(InstructionNode):
+    __slots__ = ("reg", "label")
+
     def __init__(self,reg,label):
         self.reg = reg
         self.label = label
@@ -234,6 +311,8 @@ class BranchOnGreaterZero(InstructionNode):
 
 
 class ComparisonNode(InstructionNode):
+    __slots__ = ("m1", "m2", "destination")
+
     def __init__(self, dest,m1, m2 ):
         self.m1 = m1
         self.m2 = m2
@@ -241,39 +320,55 @@ class ComparisonNode(InstructionNode):
 
 
 class SetOnLessThan(ComparisonNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"slt {self.destination}, {self.m1}, {self.m2}"
 
 
 class SetOnLessOrEq(ComparisonNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"sle {self.destination}, {self.m1}, {self.m2}"
 
 class SetEq(ComparisonNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"seq {self.destination}, {self.m1}, {self.m2}"
     
 class UnconditionalJumpNode(InstructionNode):
+    __slots__ = ("jump",)
+
     def __init__(self, jump):
         self.jump = jump
 
 
 class Jump(UnconditionalJumpNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"j {self.jump}"
 
 
 class JumpRegister(UnconditionalJumpNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"jalr {self.jump}"
 
 
 class JumpAndLink(UnconditionalJumpNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"jal {self.jump}"
 
 
 class Label(InstructionNode):
+    __slots__ = ("label",)
+
     def __init__(self, label):
         self.label = label
 
@@ -282,11 +377,15 @@ class Label(InstructionNode):
 
 
 class SyscallNode(InstructionNode):
+    __slots__ = ()
+
     def __str__(self):
         return f"syscall"
 
 
 class CommentNode(MIPS_Node):
+    __slots__ = ("text",)
+
     def __init__(self, text):
         self.text = text
 
@@ -1,36 +1,87 @@
 import code_gen.mips_nodes as mips
 import cmp.visitor as visitor
 
+INDENT_SIZE = 4
+# indentation prefixes are built once and shared by every emitted line
+INDENTS = [" " * (INDENT_SIZE * level) for level in range(8)]
+
+
 class MIPSWriter(object):
     def __init__(self):
-        self.tabs = 0
+        self.level = 0
+        self.prefix = INDENTS[0]
         self.output = []
 
     def emit(self, msg):
-        self.output.append(self.tabs*" " + msg)
+        self.output.append(self.prefix + msg)
 
     def black(self):
         self.output.append('')
 
-    def visit(self, node:mips.ProgramNode):
+    def indent(self):
+        self.level += 1
+        self.prefix = INDENTS[self.level]
+
+    def dedent(self):
+        self.level -= 1
+        self.prefix = INDENTS[self.level]
+
+    def write_assembled(self, text):
+        # text is already assembled, one line per "\n"-terminated line
+        self.output.extend(text.split("\n")[:-1])
+
+    def write_data(self, data, runtime=None):
         self.emit(".data")
         self.black()
-        for data in node.data:
-            self.emit(str(data))
+        if runtime is not None:
+            self.write_assembled(runtime.data)
+        for item in data:
+            self.emit(str(item))
 
         self.black()
         self.emit(".text")
         self.emit(".globl main")
         self.black()
+        if runtime is not None:
+            self.write_assembled(runtime.text)
+
+    def write_procedure(self, proc: mips.ProcedureNode):
+        if isinstance(proc, mips.AssembledProcedureNode):
+            self.write_assembled(proc.text)
+            return
+        self.emit(f'{proc.label}:')
+        self.indent()
+        for inst in proc.instructions:
+            self.emit(str(inst))
+        self.dedent()
+
+    def assemble_procedure(self, proc: mips.ProcedureNode):
+        # text of `proc`, as written by write_procedure
+        start = len(self.output)
+        self.write_procedure(proc)
+        return "".join(line + "\n" for line in self.output[start:])
+
+    def visit(self, node:mips.ProgramNode):
+        self.write_data(node.data, node.runtime)
         for proc in node.text:
-            self.emit(f'{proc.label}:')
-            self.tabs += 4
-            for inst in proc.instructions:
-                self.emit(str(inst))
-            self.tabs -= 4
+            self.write_procedure(proc)
 
 
+class MIPSFileWriter(MIPSWriter):
+    """
+    Streams every line straight into `file` instead of keeping it in `output`.
+    Passed to MIPSBuilder, each procedure is written as soon as it is built.
+    """
 
+    def __init__(self, file):
+        MIPSWriter.__init__(self)
+        self.file = file
 
+    def emit(self, msg):
+        self.file.write(self.prefix + msg + "\n")
+
+    def black(self):
+        self.file.write("\n")
 
-     
\ No newline at end of file
+    def write_assembled(self, text):
+        self.file.write(text)
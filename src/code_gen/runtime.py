@@ -0,0 +1,113 @@
+import hashlib
+import os
+from pathlib import Path
+
+# Runtime shared by every compiled program: the built-in classes (Object, IO,
+# String, Int, Bool), the auxiliar procedures (length, copy, string_comparer,
+# Input) and the static labels and exception messages. None of it depends on
+# the program being compiled, so it is built once, cached on disk as text (its
+# CIL in the .cilo format, see code_gen.cil_format, and its assembled data and
+# procedures) and linked (concatenated) with the code generated for the user
+# classes.
+
+CACHE_DIR = Path(__file__).parent / "__pycache__"
+CACHE_PREFIX = "runtime"
+DATA_MARKER = "# ---- runtime data ----\n"
+TEXT_MARKER = "# ---- runtime procedures ----\n"
+
+# modules whose code can end up in the runtime, the cache is rebuilt when one
+# changes. Every module of the code generators and of cmp (the types of
+# cmp.semantic, the nodes of cmp.cil, ...) is listed rather than the ones known
+# to be used, so a module the generators start to import is never missed.
+GENERATOR_DIRS = [Path(__file__).parent, Path(__file__).parent.parent / "cmp"]
+GENERATORS = [Path(__file__).parent.parent / "semantic" / "cool_visitor.py"]
+
+
+class Runtime:
+    def __init__(self, cil, data, text):
+        self.cil = cil  # cil.ProgramNode of the built-in classes
+        self.data = data  # assembled .data entries
+        self.text = text  # assembled procedures
+
+    @property
+    def types(self):
+        # cil.TypeNode of each built-in class
+        return self.cil.dottypes
+
+
+def runtime_cil():
+    from code_gen.cil_builder import CILBuilder
+
+    return CILBuilder().build_runtime()
+
+
+def assemble_runtime(cil_runtime):
+    from code_gen.mips_builder import MIPSBuilder
+    from code_gen.mips_writer import MIPSWriter
+
+    mips_runtime = MIPSBuilder().build_runtime(cil_runtime)
+
+    writer = MIPSWriter()
+    for item in mips_runtime.data:
+        writer.emit(str(item))
+    data = "\n".join(writer.output) + "\n"
+
+    writer = MIPSWriter()
+    for proc in mips_runtime.text:
+        writer.write_procedure(proc)
+    text = "\n".join(writer.output) + "\n"
+
+    return data, text
+
+
+def cache_key():
+    stats = []
+    generators = [path for directory in GENERATOR_DIRS for path in sorted(directory.glob("*.py"))]
+    for generator in generators + GENERATORS:
+        stat = generator.stat()
+        stats.append((generator.parent.name, generator.name, stat.st_mtime_ns, stat.st_size))
+    return hashlib.md5(repr(stats).encode()).hexdigest()
+
+
+def read_cache(path):
+    from code_gen.cil_format import CILFormatError, loads
+
+    try:
+        cil, _, assembled = path.read_text().partition(DATA_MARKER)
+    except OSError:
+        return None
+    data, _, text = assembled.partition(TEXT_MARKER)
+    if not text:
+        return None
+    try:
+        return loads(cil), data, text
+    except CILFormatError:
+        return None
+
+
+def write_cache(path, cil, data, text):
+    from code_gen.cil_format import dumps
+
+    try:
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(dumps(cil) + DATA_MARKER + data + TEXT_MARKER + text)
+        os.replace(tmp_path, path)
+        for stale in path.parent.glob(f"{CACHE_PREFIX}-*.mips"):
+            if stale != path:
+                stale.unlink()
+    except OSError:
+        pass  # the runtime is rebuilt on the next compile
+
+
+def load_runtime(use_cache=True):
+    # the runtime is only built (CIL and MIPS) when it isn't cached
+    path = CACHE_DIR / f"{CACHE_PREFIX}-{cache_key()}.mips"
+    cached = read_cache(path) if use_cache else None
+    if cached is None:
+        cil_runtime = runtime_cil()
+        cached = (cil_runtime, *assemble_runtime(cil_runtime))
+        if use_cache:
+            write_cache(path, *cached)
+
+    return Runtime(*cached)
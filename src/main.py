@@ -1,57 +1,143 @@
-from parsing.lexical_analizer import tokenize_cool_text
-from parsing.cool_grammar import define_cool_grammar
-from semantic.cool_visitor import FormatVisitorST
-from parsing.visitor_type_ast import FormatVisitorTypedAst
+from pathlib import Path
+from cmp.errors import (
+    InvalidInputFileError,
+    InvalidArtifactError,
+    InvalidOptLevelError,
+    InvalidCILFileError,
+    UnavailableArtifactError,
+)
+from cmp.limits import RECURSION_LIMIT, STACK_SIZE
 
-from semantic.type_collector import TypeCollector
-from semantic.type_builder import TypeBuilder
-from semantic.type_checker import TypeChecker
+# Every compiler phase is imported inside `pipeline`, right before it runs, so
+# startup only pays for the phases a given input actually reaches (an input with
+# lexical errors never loads the parser, the checker or the code generators).
 
-from parsing.shift_reduce_parsers import LR1Parser, DerivationTree
-from cmp.errors import parsing_table_error, Error
+# Artifacts that can be requested with --emit, in the order they are produced
+ARTIFACTS = ["tokens", "ast", "typed-ast", "cil", "cilo", "mips"]
 
-from cmp.evaluation import evaluate_reverse_parse
-from pathlib import Path
-from cmp.errors import InvalidInputFileError
-from semantic.cool_visitor import FormatVisitor
-from code_gen.cil_builder import CILBuilder
-from code_gen.mips_builder import MIPSBuilder
-from code_gen.mips_writer import MIPSWriter
-from cmp.cil import PrintVisitor
-import typer
+# A serialized CIL program (.cilo, see code_gen.cil_format) given as input is
+# linked into MIPS as it is, only these artifacts can be emitted from it
+CIL_INPUT_SUFFIX = ".cilo"
+CIL_INPUT_ARTIFACTS = ["cil", "mips"]
+
+# Levels of optimization of the CIL code, see code_gen.cil_optimizer
+OPT_LEVELS = [0, 1, 2]
+
+OUTPUT_BUFFER_SIZE = 1 << 16
 
 
 def report_and_exit(errors):
     if len(errors) == 0:
-        raise typer.Exit(code=0)
+        raise SystemExit(0)
 
-    # typer.echo(errors[0])
     for error in errors:
-        typer.echo(error)
-    raise typer.Exit(code=1)
-
-
-def pipeline(input_file: Path, output_file: Path = None):
+        print(error)
+    raise SystemExit(1)
+
+
+def artifact_path(input_file: Path, artifact: str):
+    return input_file.with_suffix(f".{artifact}")
+
+
+def emit_lines(path: Path, lines):
+    with path.open("w") as file:
+        for line in lines:
+            file.write(line)
+            file.write("\n")
+
+
+def pipeline(
+    input_file: Path,
+    output_file: Path = None,
+    emit: str = None,
+    incremental: bool = False,
+    jobs: int = 1,
+    opt_level: int = 1,
+    stats: bool = False,
+    run: bool = False,
+):
+    # every caller gets the deep stack, not only the command line
+    run_with_deep_stack(compile_file, input_file, output_file, emit, incremental, jobs, opt_level, stats, run)
+
+
+def compile_file(
+    input_file: Path,
+    output_file: Path,
+    emit: str,
+    incremental: bool,
+    jobs: int,
+    opt_level: int,
+    stats: bool,
+    run: bool,
+):
     errors = []
 
     if not input_file.is_file:
         errors.append(InvalidInputFileError(str(input_file)))
 
+    if opt_level not in OPT_LEVELS:
+        errors.append(InvalidOptLevelError(opt_level))
+
+    # with --run nothing is emitted unless requested, see run_program
+    if emit is None:
+        emit = "" if run else "mips"
+
+    requested = set()
+    for artifact in filter(None, emit.split(",")):
+        artifact = artifact.strip()
+        if artifact not in ARTIFACTS:
+            errors.append(InvalidArtifactError(artifact))
+        requested.add(artifact)
+
+    if input_file.suffix == CIL_INPUT_SUFFIX:
+        errors.extend(
+            UnavailableArtifactError(artifact)
+            for artifact in requested
+            if artifact in ARTIFACTS and artifact not in CIL_INPUT_ARTIFACTS
+        )
+
     if len(errors) > 0:
         report_and_exit(errors)
 
-    text = input_file.read_text()
+    if input_file.suffix == CIL_INPUT_SUFFIX:
+        from code_gen.cil_format import CILFormatError, load
+        from code_gen.runtime import load_runtime
 
-    # main_error1 = ["A class Main with a method main most be provided"]
-    # main_error2 = ['"main" method in class Main does not receive any parameters']
+        try:
+            cil_ast = load(input_file, load_runtime().cil)
+        except (OSError, UnicodeDecodeError, CILFormatError) as e:
+            report_and_exit([InvalidCILFileError(str(input_file), str(e))])
+
+        generate(cil_ast, input_file, output_file, requested)
+        if run:
+            run_program(cil_ast)
+        return
+
+    # phases after the last requested artifact are not run at all, running the
+    # program needs its CIL
+    last_phase = max([ARTIFACTS.index(artifact) for artifact in requested] + [ARTIFACTS.index("cil") if run else 0])
+
+    text = input_file.read_text()
 
     # define grammar
+    from parsing.cool_grammar import define_cool_grammar
+    from parsing.lexical_analizer import tokenize_cool_text
+
     grammar, idx, type_id, string, num = define_cool_grammar()
 
     tokens = tokenize_cool_text(grammar, idx, type_id, string, num, text, errors)
 
     if len(errors) > 0:
         report_and_exit(errors)
+
+    if "tokens" in requested:
+        emit_lines(artifact_path(input_file, "tokens"), (str(token) for token in tokens))
+
+    if last_phase < ARTIFACTS.index("ast"):
+        return
+
+    from parsing.shift_reduce_parsers import LR1Parser
+
     parser = LR1Parser(grammar, errors)
 
     if len(errors) > 0:
@@ -63,57 +149,167 @@ def pipeline(input_file: Path, output_file: Path = None):
         report_and_exit(errors)
 
     # get parsing tree
+    from cmp.evaluation import evaluate_reverse_parse
+
     ast = evaluate_reverse_parse(parse, operations, tokens)
 
-    # print("-------------------------------Initial AST-------------------------------")
-    # formatter = FormatVisitorST()
-    # tree = formatter.visit(ast)
-    # print(tree)
+    if "ast" in requested:
+        from semantic.cool_visitor import FormatVisitorST
+
+        formatter = FormatVisitorST()
+        emit_lines(artifact_path(input_file, "ast"), formatter.visit(ast))
+
+    if last_phase < ARTIFACTS.index("typed-ast"):
+        return
+
+    from semantic.type_collector import TypeCollector
+    from semantic.type_builder import TypeBuilder
+    from semantic.type_checker import TypeChecker
 
     visitors = [TypeCollector(errors), TypeBuilder(errors)]
     for visitor in visitors:
         ast = visitor.visit(ast)
 
-    type_checker = TypeChecker(errors)
+    # the scopes are only needed while checking
+    type_checker = TypeChecker(errors, keep_scopes=False, jobs=jobs)
     scope, typed_ast = type_checker.visit(ast)
 
-    # formatter = FormatVisitorTypedAst()
-    # print("-------------------------------Typed AST-------------------------------")
-    # tree = formatter.visit(typed_ast)
-    # print(tree)
-
     if len(errors) > 0:
         report_and_exit(errors)
 
-    cool_to_cil_visitor = CILBuilder()
+    if "typed-ast" in requested:
+        from parsing.visitor_type_ast import FormatVisitorTypedAst
+
+        formatter = FormatVisitorTypedAst()
+        emit_lines(artifact_path(input_file, "typed-ast"), formatter.visit(typed_ast))
+
+    if last_phase < ARTIFACTS.index("cil"):
+        return
+
+    from code_gen.cil_builder import CILBuilder
+
+    # with --incremental only the classes changed since the last compile are
+    # generated again, see code_gen.incremental
+    cache = None
+    if incremental:
+        from code_gen.incremental import ClassCache
+
+        cache = ClassCache(input_file, typed_ast, opt_level)
+
+    cool_to_cil_visitor = CILBuilder(cache)
     cil_ast = cool_to_cil_visitor.visit(typed_ast)
 
-    formatter = PrintVisitor()
-    tree = formatter.visit(cil_ast)
-    print(tree)
+    from code_gen.cil_optimizer import CILOptimizer
+
+    # the code of the classes taken from the cache is already optimized
+    optimizer = CILOptimizer(opt_level)
+    optimizer.optimize(
+        cil_ast,
+        skip=None if cache is None else lambda function: cache.lookup_procedure(function.name) is not None,
+    )
+    if cache is not None:
+        cache.store_inlined(optimizer.inlined)
+
+    if stats:
+        import sys
+
+        for line in optimizer.stats.lines():
+            print(line, file=sys.stderr)
+
+    generate(cil_ast, input_file, output_file, requested, cache)
+    if run:
+        run_program(cil_ast)
+
+
+def run_program(cil_ast):
+    # runs the program with the CIL interpreter on the standard input and
+    # output, without generating MIPS
+    import sys
+    from code_gen.cil_interpreter import CILInterpreter
+
+    status = CILInterpreter(cil_ast, sys.stdin, sys.stdout).run()
+    if status != 0:
+        raise SystemExit(status)
+
+
+def generate(cil_ast, input_file: Path, output_file: Path, requested, cache=None):
+    # emits the requested CIL artifacts and the MIPS code of `cil_ast`
+    if "cil" in requested:
+        from cmp.cil import PrintVisitor
 
-    cil_to_mips_visitor = MIPSBuilder()
-    mips_ast = cil_to_mips_visitor.visit(cil_ast)
+        formatter = PrintVisitor()
+        emit_lines(artifact_path(input_file, "cil"), [formatter.visit(cil_ast)])
 
-    mips_writer = MIPSWriter()
-    output = mips_writer.visit(mips_ast)
+    if "cilo" in requested:
+        from code_gen.cil_format import dump_lines
 
-    output = '\n'.join(mips_writer.output)
+        emit_lines(artifact_path(input_file, "cilo"), dump_lines(cil_ast))
+
+    if "mips" not in requested:
+        return
+
+    from code_gen.mips_builder import MIPSBuilder
+    from code_gen.mips_writer import MIPSFileWriter
 
     if output_file is None:
-        output_file = input_file.with_suffix(".mips")
+        output_file = artifact_path(input_file, "mips")
+
+    # each procedure is written as soon as MIPSBuilder finishes it
+    with output_file.open("w", buffering=OUTPUT_BUFFER_SIZE) as file:
+        cil_to_mips_visitor = MIPSBuilder(MIPSFileWriter(file), cache=cache)
+        cil_to_mips_visitor.visit(cil_ast)
+
+    if cache is not None:
+        cache.save()
+
+
+def run_with_deep_stack(function, *args):
+    import sys
+    import threading
+
+    outcome = []
+
+    def target():
+        try:
+            function(*args)
+        except BaseException as e:
+            outcome.append(e)
+
+    # the limits are put back, they're global to the process
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursion_limit, RECURSION_LIMIT))
+    stack_size = threading.stack_size(STACK_SIZE)
+    try:
+        thread = threading.Thread(target=target)
+        thread.start()
+    finally:
+        threading.stack_size(stack_size)
+    thread.join()
+    sys.setrecursionlimit(recursion_limit)
+
+    if outcome:
+        raise outcome[0]
+
+
+def command_line(function):
+    # typer is only needed (and imported) when the compiler runs as a script,
+    # the options with a short name are set up here
+    import inspect
+    import typer
+
+    short_names = {"opt_level": typer.Option(1, "-O", "--opt-level", help="Optimization level: 0, 1 or 2.")}
 
-    with output_file.open("w") as file:
-        print(output, file=file)
-        
-    #with open(f'{input_file[:-3]}.mips','w') as f:
-    #    f.write(f'{output}')
-    #output_file.write_text(output)
+    signature = inspect.signature(function)
+    function.__signature__ = signature.replace(
+        parameters=[
+            parameter.replace(default=short_names[name]) if name in short_names else parameter
+            for name, parameter in signature.parameters.items()
+        ]
+    )
+    return function
 
 
 if __name__ == "__main__":
-    #input_file = Path("/home/sandra/Desktop/FinalProjects/Compiler/cool-compiler-2021/customized_tests/code_gen/test_goto_if.cl")
-    #output_file =  Path("/home/sandra/Desktop/FinalProjects/Compiler/cool-compiler-2021/customized_tests/test_hello_world.mips")
+    import typer
 
-    #pipeline()
-    typer.run(pipeline)
+    typer.run(command_line(pipeline))
@@ -31,6 +31,15 @@ from semantic.ast_nodes import (
 )
 
 
+# Lists are right recursive in the grammar, so their items are reduced from
+# last to first. They are built in that order, appending each item, and the
+# production using the whole list reverses it once: concatenating at every
+# reduction ([s[1]] + s[2]) made building a list quadratic in its length.
+def append(items, item):
+    items.append(item)
+    return items
+
+
 def define_cool_grammar(print_grammar=False):
     # grammar
     G = Grammar()
@@ -64,22 +73,22 @@ def define_cool_grammar(print_grammar=False):
     idx, type_id, num, new, string, true, false = G.Terminals("id type_id int new string true false")
 
     # productions
-    program %= class_list, lambda h, s: ProgramNode(s[1])
+    program %= class_list, lambda h, s: ProgramNode(s[1][::-1])
 
-    class_list %= def_class + class_list, lambda h, s: [s[1]] + s[2]
+    class_list %= def_class + class_list, lambda h, s: append(s[2], s[1])
     class_list %= def_class, lambda h, s: [s[1]]
 
     def_class %= (
         classx + type_id + ocur + feature_list + ccur + semi,
-        lambda h, s: ClassDeclarationNode(s[2], s[4], s[1]),
+        lambda h, s: ClassDeclarationNode(s[2], s[4][::-1], s[1]),
     )
     def_class %= (
         classx + type_id + inherits + type_id + ocur + feature_list + ccur + semi,
-        lambda h, s: ClassDeclarationNode(s[2], s[6], s[1], s[4]), 
+        lambda h, s: ClassDeclarationNode(s[2], s[6][::-1], s[1], s[4]), 
     )
 
-    feature_list %= def_attr + semi + feature_list, lambda h, s: [s[1]] + s[3]
-    feature_list %= def_func + semi + feature_list, lambda h, s: [s[1]] + s[3]
+    feature_list %= def_attr + semi + feature_list, lambda h, s: append(s[3], s[1])
+    feature_list %= def_func + semi + feature_list, lambda h, s: append(s[3], s[1])
     feature_list %= G.Epsilon, lambda h, s: []
 
     def_attr %= (
@@ -90,25 +99,25 @@ def define_cool_grammar(print_grammar=False):
 
     def_func %= (
         idx + opar + param_list + cpar + colon + type_id + ocur + expr + ccur,
-        lambda h, s: FuncDeclarationNode(s[1], s[3], s[6], s[8], s[2]),
+        lambda h, s: FuncDeclarationNode(s[1], s[3][::-1], s[6], s[8], s[2]),
     )
 
-    param_list %= param + param_list_rest, lambda h, s: [s[1]] + s[2]
+    param_list %= param + param_list_rest, lambda h, s: append(s[2], s[1])
     param_list %= param, lambda h, s: [s[1]]
     param_list %= G.Epsilon, lambda h, s: []
 
-    param_list_rest %= comma + param + param_list_rest, lambda h, s: [s[2]] + s[3]
+    param_list_rest %= comma + param + param_list_rest, lambda h, s: append(s[3], s[2])
     param_list_rest %= comma + param, lambda h, s: [s[2]]
     param %= idx + colon + type_id, lambda h, s: (s[1], s[3])
 
     expr %= idx + larrow + expr, lambda h, s: AssignNode(s[1], s[3], s[2])
-    expr %= let + identifiers_list + inx + expr, lambda h, s: LetNode(s[2], s[4], s[1])
+    expr %= let + identifiers_list + inx + expr, lambda h, s: LetNode(s[2][::-1], s[4], s[1])
     expr %= notx + comp, lambda h, s: NotNode(s[2], s[1])  
     expr %= comp, lambda h, s: s[1]
 
     identifiers_list %= (
         identifier_init + comma + identifiers_list,
-        lambda h, s: [s[1]] + s[3],
+        lambda h, s: append(s[3], s[1]),
     )
     identifiers_list %= identifier_init, lambda h, s: [s[1]]
 
@@ -143,10 +152,10 @@ def define_cool_grammar(print_grammar=False):
         lambda h, s: IfNode(s[2], s[4], s[6], s[1]),
     )
     element %= whilex + expr + loop + expr + pool, lambda h, s: WhileNode(s[2], s[4], s[1])
-    element %= case + expr + of + case_block + esac, lambda h, s: CaseNode(s[2], s[4], s[1])
+    element %= case + expr + of + case_block + esac, lambda h, s: CaseNode(s[2], s[4][::-1], s[1])
     element %= new + type_id, lambda h, s: InstantiateNode(s[2], s[1])
     element %= opar + expr + cpar, lambda h, s: s[2]
-    element %= ocur + block + ccur, lambda h, s: BlockNode(s[2], s[1])
+    element %= ocur + block + ccur, lambda h, s: BlockNode(s[2][::-1], s[1])
     element %= (element + dot + func_call, lambda h, s: CallNode(*s[3], obj=s[1], token = s[2]))
     element %= (
         element + at + type_id + dot + func_call,
@@ -155,7 +164,7 @@ def define_cool_grammar(print_grammar=False):
     element %= func_call, lambda h, s: CallNode(*s[1],)
     element %= atom, lambda h, s: s[1]
 
-    case_block %= case_item + case_block, lambda h, s: [s[1]] + s[2]
+    case_block %= case_item + case_block, lambda h, s: append(s[2], s[1])
     case_block %= case_item, lambda h, s: [s[1]]
     case_item %= (
         idx + colon + type_id + rarrow + expr + semi,
@@ -172,15 +181,15 @@ def define_cool_grammar(print_grammar=False):
     atom %= string, lambda h, s: StringNode(s[1])
 
     block %= expr + semi, lambda h, s: [s[1]]
-    block %= expr + semi + block, lambda h, s: [s[1]] + s[3]
+    block %= expr + semi + block, lambda h, s: append(s[3], s[1])
 
-    func_call %= idx + opar + arg_list + cpar, lambda h, s: (s[1], s[3])
+    func_call %= idx + opar + arg_list + cpar, lambda h, s: (s[1], s[3][::-1])
 
-    arg_list %= expr + arg_list_rest, lambda h, s: [s[1]] + s[2]
+    arg_list %= expr + arg_list_rest, lambda h, s: append(s[2], s[1])
     arg_list %= expr, lambda h, s: [s[1]]
     arg_list %= G.Epsilon, lambda h, s: []
 
-    arg_list_rest %= comma + expr + arg_list_rest, lambda h, s: [s[2]] + s[3]
+    arg_list_rest %= comma + expr + arg_list_rest, lambda h, s: append(s[3], s[2])
     arg_list_rest %= comma + expr, lambda h, s: [s[2]]
 
     if print_grammar:
@@ -46,6 +46,9 @@ def tokenize_cool_text(grammar, idx, type_id, string, num, data, errors, printin
 
     tokens = []
     pos_data = []
+    # tokens come in order, so only the text after the previous token is
+    # searched for the start of the line (find_column searches back to it)
+    line_start = scanned = 0
     # Tokenize
     while True:
         tok = lexer.token()
@@ -71,7 +74,11 @@ def tokenize_cool_text(grammar, idx, type_id, string, num, data, errors, printin
                     ttype = type_id
                 else:
                     ttype = num
-            tokens.append(Token(tval, ttype, (tok.lineno, find_column(data, tok.lexpos))))
+            newline = data.rfind("\n", scanned, tok.lexpos)
+            if newline != -1:
+                line_start = newline + 1
+            scanned = tok.lexpos
+            tokens.append(Token(tval, ttype, (tok.lineno, tok.lexpos - line_start + 1)))
 
     if printing:
         pprint_tokens(tokens)
@@ -2,11 +2,15 @@ from cmp.semantic import Context
 from cmp.utils import Token 
 
 class Node:
+    __slots__ = ("token",)
+
     def __init__(self, token):
         self.token = token
 
 
 class ProgramNode(Node):
+    __slots__ = ("declarations", "context")
+
     def __init__(self,  declarations, context=None):
         super().__init__(Token("", "", (0,0))) # symbolic initial token
         self.declarations = declarations
@@ -14,10 +18,12 @@ class ProgramNode(Node):
 
 
 class ExpressionNode(Node):
-    pass
+    __slots__ = ()
 
 
 class ClassDeclarationNode:
+    __slots__ = ("id", "parent", "features", "token")
+
     def __init__(self, idx, features, token, parent=None):
         self.id = idx
         self.parent = parent
@@ -26,6 +32,8 @@ class ClassDeclarationNode:
 
 
 class FuncDeclarationNode:
+    __slots__ = ("id", "params", "type", "body", "token")
+
     def __init__(self, idx, params, return_type, body, token):
         self.id = idx
         self.params = params
@@ -35,6 +43,8 @@ class FuncDeclarationNode:
 
 
 class AttrDeclarationNode:
+    __slots__ = ("id", "type", "init_exp", "token")
+
     def __init__(self, idx, typex, init_exp=None, token = Token("", "", (0,0))):
         self.id = idx
         self.type = typex
@@ -43,6 +53,8 @@ class AttrDeclarationNode:
 
 
 class AssignNode(ExpressionNode):
+    __slots__ = ("id", "expr")
+
     def __init__(self, idx, expr, token):
         self.id = idx
         self.expr = expr
@@ -50,6 +62,8 @@ class AssignNode(ExpressionNode):
 
 
 class LetNode(ExpressionNode):
+    __slots__ = ("identifiers", "body")
+
     def __init__(self, identifiers, body, token):
         self.identifiers = identifiers
         self.body = body
@@ -58,6 +72,8 @@ class LetNode(ExpressionNode):
 
 #No tiene uno asi
 class VarDeclarationNode:
+    __slots__ = ("id", "type", "expr", "token")
+
     def __init__(self, token, typex, expr=None):
         self.id = token.lex
         self.type = typex
@@ -66,6 +82,8 @@ class VarDeclarationNode:
 
 
 class IfNode(ExpressionNode):
+    __slots__ = ("if_expr", "then_expr", "else_expr")
+
     def __init__(self, if_exp, then_exp, else_exp, token):
         self.if_expr = if_exp
         self.then_expr = then_exp
@@ -74,6 +92,8 @@ class IfNode(ExpressionNode):
 
 
 class WhileNode(ExpressionNode):
+    __slots__ = ("condition", "body")
+
     def __init__(self, condition, body, token):
         self.condition = condition
         self.body = body
@@ -81,12 +101,16 @@ class WhileNode(ExpressionNode):
 
 
 class CaseNode(ExpressionNode):
+    __slots__ = ("expr", "case_items")
+
     def __init__(self, exp, case_items, token):
         self.expr = exp
         self.case_items = case_items
         self.token = token
 
 class CaseItemNode(ExpressionNode):
+    __slots__ = ("id", "type", "expr")
+
     def __init__(self, idx, typex, exp, token):
         self.id = idx
         self.type = typex
@@ -95,6 +119,8 @@ class CaseItemNode(ExpressionNode):
 
 
 class CallNode(ExpressionNode):
+    __slots__ = ("obj", "id", "args", "at_type")
+
     def __init__(self, idx, args, obj=None, at_type=None, token = Token("", "", (-1,-1))):
         self.obj = obj
         self.id = idx
@@ -107,24 +133,32 @@ class CallNode(ExpressionNode):
 
 
 class BlockNode(ExpressionNode):
+    __slots__ = ("expression_list",)
+
     def __init__(self, expression_list, token):
         self.expression_list = expression_list
         self.token = token
  
 
 class AtomicNode(ExpressionNode):
+    __slots__ = ("lex",)
+
     def __init__(self, token):
         self.lex = token.lex
         self.token = token
 
 
 class UnaryNode(ExpressionNode):
+    __slots__ = ("expr",)
+
     def __init__(self, expr, token):
         self.expr = expr
         self.token = token
 
 
 class BinaryNode(ExpressionNode):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right, token):
         self.left = left
         self.right = right
@@ -132,75 +166,79 @@ class BinaryNode(ExpressionNode):
 
 
 class ArithmeticOperation(BinaryNode):
-    pass
+    __slots__ = ()
 
 
 class ComparisonOperation(BinaryNode):
-    pass
+    __slots__ = ()
 
 
 class ConstantNumNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class VariableNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class StringNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class BooleanNode(AtomicNode):
-    pass
+    __slots__ = ()
 
 
 class InstantiateNode(AtomicNode):
+    __slots__ = ()
+
     def __init__(self, lex, token):
         self.lex = lex
         self.token = token
 
 
 class NotNode(UnaryNode):
-    pass
+    __slots__ = ()
 
 
 class IsvoidNode(UnaryNode):
-    pass
+    __slots__ = ()
 
 
 class NegNode(UnaryNode):
-    pass
+    __slots__ = ()
 
 
 class PlusNode(ArithmeticOperation):
-    pass
+    __slots__ = ()
 
 
 class MinusNode(ArithmeticOperation):
-    pass
+    __slots__ = ()
 
 
 class StarNode(ArithmeticOperation):
-    pass
+    __slots__ = ()
 
 
 class DivNode(ArithmeticOperation):
-    pass
+    __slots__ = ()
 
 
 class LessNode(ComparisonOperation):
-    pass
+    __slots__ = ()
 
 
 class LessEqualNode(ComparisonOperation):
-    pass
+    __slots__ = ()
 
 
 class EqualNode(ComparisonOperation):
-    pass
+    __slots__ = ()
 
 
 class DefaultValueNode(ExpressionNode):
+    __slots__ = ("type",)
+
     def __init__(self, typex):
         self.type = typex
@@ -0,0 +1,182 @@
+import gc
+import io
+import pickle
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from cmp.limits import RECURSION_LIMIT, STACK_SIZE
+from cmp.pycompiler import Symbol
+from cmp.semantic import Scope, Type
+
+# Type checking of the classes of a program in a pool of processes, see the
+# jobs option of TypeChecker. Once the context is frozen a class is checked
+# reading only the context, and the scopes of the classes it inherits from
+# (self and their attributes). Every worker gets the context and the classes
+# once (forked workers inherit them), then checks ranges of classes and sends
+# back the typed classes and the errors found in them, which are merged in the
+# order the classes would be checked sequentially.
+
+# ranges of classes sent to each worker, more ranges balance the load better
+CHUNKS_PER_JOB = 4
+
+# the context the types received by this process are resolved in
+context = None
+
+# state of a worker process, set by init_worker
+declarations = None
+scope_parents = None  # class name -> class whose scope encloses its scope
+class_scopes = None  # class name -> scope with its self and attributes
+root_scope = None
+checker = None
+
+
+def context_type(name):
+    return context.types[name]
+
+
+class TypePickler(pickle.Pickler):
+    # the types of the context (when given) are sent by name, the receiving
+    # process resolves them in its own context so that they keep their identity.
+    # The grammar symbols of the tokens aren't needed to check a class, only
+    # their names are sent
+    def __init__(self, file, context=None):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.context = context
+
+    def reducer_override(self, obj):
+        if isinstance(obj, Symbol):
+            return str, (obj.Name,)
+        if self.context is not None and isinstance(obj, Type) and self.context.types.get(obj.name) is obj:
+            return context_type, (obj.name,)
+        return NotImplemented
+
+
+def dumps(value, context=None):
+    file = io.BytesIO()
+    TypePickler(file, context).dump(value)
+    return file.getvalue()
+
+
+def loads(data):
+    # the collector would walk the whole heap several times while the objects
+    # are created
+    gc.disable()
+    try:
+        return pickle.loads(data)
+    finally:
+        gc.enable()
+
+
+class WorkerState:
+    def __init__(self, context, declarations, scope_parents):
+        self.context = context
+        self.declarations = declarations
+        self.scope_parents = scope_parents
+
+    def __reduce__(self):
+        # only for workers that aren't forked
+        return load_worker_state, (dumps(self.__dict__),)
+
+
+def load_worker_state(data):
+    state = WorkerState.__new__(WorkerState)
+    state.__dict__.update(loads(data))
+    return state
+
+
+def init_worker(state):
+    global context, declarations, scope_parents, class_scopes, root_scope, checker
+    from semantic.type_checker import TypeChecker
+
+    # classes are checked in a thread with the deep stack of the compiler
+    sys.setrecursionlimit(RECURSION_LIMIT)
+    threading.stack_size(STACK_SIZE)
+
+    context = state.context
+    declarations = state.declarations
+    scope_parents = state.scope_parents
+    class_scopes = {}
+    root_scope = Scope(keep_children=False)
+    checker = TypeChecker(keep_scopes=False)
+    checker.context = context
+
+    # the context and the classes live as long as the worker, the collector
+    # doesn't need to walk them
+    gc.freeze()
+
+
+def class_scope(name):
+    # the scope the sequential checker leaves after visiting the class
+    chain = []
+    while name is not None and name not in class_scopes:
+        chain.append(name)
+        name = scope_parents[name]
+
+    scope = root_scope if name is None else class_scopes[name]
+    for name in reversed(chain):
+        typex = context.get_type(name)
+        scope = scope.create_child()
+        scope.define_variable("self", typex)
+        for attr in typex.attributes:
+            scope.define_variable(attr.name, attr.type)
+        class_scopes[name] = scope
+    return scope
+
+
+def check_range(bounds):
+    start, stop = bounds
+    outcome = []
+
+    def target():
+        try:
+            results = []
+            for declaration in declarations[start:stop]:
+                checker.errors = []
+                scope = class_scope(scope_parents[declaration.id.lex]).create_child()
+                results.append((checker.visit(declaration, scope), checker.errors))
+            outcome.append(dumps(results, context))
+        except BaseException as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+    if isinstance(outcome[0], BaseException):
+        raise outcome[0]
+    return outcome[0]
+
+
+def check_classes(program_context, program_declarations, jobs, errors):
+    """
+    Checks the class declarations (in inheritance order) in `jobs` processes.
+    Returns the typed classes and adds the errors found to `errors`, both in
+    the order the TypeChecker reports them when it checks the classes itself.
+    """
+    global context
+    context = program_context
+
+    # as in TypeChecker, the scope of a class encloses the scopes of its
+    # children that are checked after it, redefined classes are skipped
+    parents = {}
+    checked = []
+    for declaration in program_declarations:
+        name = declaration.id.lex
+        if name in parents:
+            continue
+        parent = None if declaration.parent is None else declaration.parent.lex
+        parents[name] = parent if parent in parents else None
+        checked.append(declaration)
+
+    size = max(1, -(-len(checked) // (jobs * CHUNKS_PER_JOB)))
+    ranges = [(start, min(start + size, len(checked))) for start in range(0, len(checked), size)]
+
+    state = WorkerState(context, checked, parents)
+    typed_classes = []
+    with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(state,)) as pool:
+        for data in pool.map(check_range, ranges):
+            for typed_class, class_errors in loads(data):
+                typed_classes.append(typed_class)
+                errors.extend(class_errors)
+    return typed_classes
@@ -1,4 +1,5 @@
 import copy
+import itertools
 from cmp.semantic import SemanticError as SError
 from cmp.semantic import Attribute, Method, Type
 from cmp.semantic import VoidType, IntType, ErrorType, StringType, BoolType
@@ -11,7 +12,6 @@ from semantic.ast_nodes import (
 )
 import cmp.visitor as visitor
 from semantic.tset import Tset
-from collections import deque
 from semantic.cool_visitor import CopyVisitor
 from cmp.errors import SemanticError, TypeError
 
@@ -92,57 +92,27 @@ class TypeBuilder:
         method.tset.locals["l"] = {"Int"}
 
         # ------checking for in order definitions and cyclic heritage
-        self.check_cycles(node.declarations)
-
-        parent_child_dict = {}
-        queue = deque()
-        visited = {}
-        not_visited = []  # ++
-        for class_declaration in node.declarations:
-            not_visited.append(class_declaration)  
-            try:
-                parent_type = class_declaration.parent.lex
-                self.context.get_type(parent_type)
-                try:
-                    parent_child_dict[parent_type].append(class_declaration)
-                except:  # KeyError
-                    parent_child_dict[parent_type] = [class_declaration]
-            except Exception:  # parent is None or not definition provided
-                queue.append(class_declaration)
-
-        while not_visited:  # ++
-            while queue:
-                class_declaration = queue.popleft()
-                try: # avoid redefining classes involved in a ciclyc heritage
-                    class_visited = visited[class_declaration]  # .id
-                except:
-                    not_visited.remove(class_declaration)
-                    try:
-                        children = parent_child_dict[class_declaration.id.lex]
-                        for declaration in children:
-                            queue.append(declaration)
-                    except:  # no one inherits from this class
-                        pass
-
-                    self.visit(class_declaration)
-                    visited[class_declaration] = True  # .id
-
-            if not_visited:
-                queue.append(not_visited[0])
+        order = self.order_classes(node.declarations)
+        for i in order:
+            self.visit(node.declarations[i])
 
-        try:
-            main_meth = self.context.get_type("Main").get_method("main", non_rec=True)
-            if len(main_meth.param_names) > 0:
-                self.errors.append(
-                    SemanticError(0, 0, '"main" method in class Main does not receive any parameters')
-                )
-            # modify in semantic get_method in order to get some ancestor where the method is already defined
-        except SError:
+        main_type = self.context.find_type("Main")
+        main_meth = None if main_type is None else main_type.find_method("main", non_rec=True)
+        if main_meth is None:
             self.errors.append(SemanticError(0, 0 ,"A class Main with a method main most be provided"))
+        elif len(main_meth.param_names) > 0:
+            self.errors.append(
+                SemanticError(0, 0, '"main" method in class Main does not receive any parameters')
+            )
+
+        # every type is built, later phases share the context read only
+        self.context.freeze()
 
         copy_visitor = CopyVisitor()
         newAst = copy_visitor.visit(node)
         newAst.context = self.context
+        # later phases take the classes in inheritance order too
+        newAst.declarations = [newAst.declarations[i] for i in order]
 
         # Reset state
         self.context = None
@@ -201,64 +171,68 @@ class TypeBuilder:
             self.errors.append(SemanticError(node_row, node_col,error.text))
 
     def get_type(self, ntype, comp_error_mesg):
-        try:
-            return self.context.get_type(ntype.lex)
-        except SError as error:
+        typex = self.context.find_type(ntype.lex)
+        if typex is None:
             node_row, node_col = ntype.location
             self.errors.append(TypeError(node_row, node_col, f"Type {ntype.lex} " + comp_error_mesg + " is not defined."))
             return ErrorType()
+        return typex
+
+    def order_classes(self, class_declarations):
+        """
+        Returns the positions of the class declarations in inheritance order: a
+        depth first preorder of the inheritance forest (children in declaration
+        order), where classes inheriting from a builtin or undefined class are
+        roots, followed by the classes involved in an inheritance cycle and
+        their descendants. Reports each cycle at the declaration that closes it.
+        """
+        # first declaration of each class, redefinitions are reported by the TypeCollector
+        position = {}
+        for i, class_declaration in enumerate(class_declarations):
+            position.setdefault(class_declaration.id.lex, i)
+
+        children = {}
+        roots = []
+        for i, class_declaration in enumerate(class_declarations):
+            if class_declaration.parent is None or class_declaration.parent.lex not in position:
+                roots.append(i)
+            else:
+                children.setdefault(class_declaration.parent.lex, []).append(i)
+
+        # each class has a single parent, so following parents from every class
+        # finds each cycle once, in the walk that first enters it
+        walked = {}  # class name -> walk that reached it
+        cycles = []
+        for name, i in position.items():
+            walk = []
+            while name not in walked:
+                walked[name] = i
+                walk.append(name)
+                parent = class_declarations[position[name]].parent
+                if parent is None or parent.lex not in position:
+                    break
+                name = parent.lex
+            else:
+                if walked[name] == i:
+                    cycle = walk[walk.index(name):]
+                    cycles.append(max(position[member] for member in cycle))
+
+        for i in sorted(cycles):
+            class_declaration = class_declarations[i]
+            node_row, node_col = class_declaration.parent.location
+            self.errors.append(
+                SemanticError(node_row, node_col, f"Class {class_declaration.id.lex}, or an ancestor of {class_declaration.id.lex}, is involved in an inheritance cycle.")
+            )
 
-    def check_cycles(self, class_declarations):
-        # checking for cycles
-        paths = []
-        modified_paths = paths
-
-        for class_declaration in class_declarations:
-            if not (class_declaration.parent is None):
-                d = class_declaration.id.lex
-                p = class_declaration.parent.lex
-
-                modified_paths = paths
-
-                already_in_some_path = False
-                for i in range(0,len(paths)):
-                    path = paths[i]
-                    if path[-1] == d:
-                        if not (p in path):
-                            modified_paths[i] = path + [p]
-                            # add parent to last pos
-                        else:
-                            # error
-                            node_row, node_col = class_declaration.parent.location
-                            self.errors.append(
-                                SemanticError(node_row, node_col, f"Class {class_declaration.id.lex}, or an ancestor of {class_declaration.id.lex}, is involved in an inheritance cycle.")
-                            )
-                        already_in_some_path = True
-
-                    elif path[0] == p:
-                        if not (d in path):
-                            # add himself to first pos
-                            modified_paths[i] = [d] + path
-                        else:
-                            # error
-                            node_row, node_col = class_declaration.parent.location
-                            self.errors.append(
-                                SemanticError(node_row, node_col, f"Class {class_declaration.id.lex}, or an ancestor of {class_declaration.id.lex}, is involved in an inheritance cycle.")
-                            )
-                        already_in_some_path = True
-                        
-                    elif p in path:
-                        # duplicate list
-                        indx = path.index(p)
-                        modified_paths = modified_paths + [[d] + path[indx:len(path)]] 
-                        already_in_some_path = True
-
-                if not already_in_some_path: 
-                    if d != p:
-                        modified_paths = paths + [[d, p]]
-                    else: # class inherits from itself
-                        node_row, node_col = class_declaration.parent.location
-                        self.errors.append(
-                            SemanticError(node_row, node_col, f"Class {class_declaration.id.lex}, or an ancestor of {class_declaration.id.lex}, is involved in an inheritance cycle.")
-                        )
-                paths = modified_paths
\ No newline at end of file
+        order = []
+        visited = [False] * len(class_declarations)
+        for start in itertools.chain(roots, range(len(class_declarations))):
+            pending = [start]
+            while pending:
+                i = pending.pop()
+                if visited[i]:
+                    continue
+                visited[i] = True
+                order.append(i)
+                pending.extend(reversed(children.get(class_declarations[i].id.lex, [])))
+        return order
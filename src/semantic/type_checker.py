@@ -1,5 +1,3 @@
-from email import message
-import cmp.nbpackage
 import cmp.visitor as visitor
 
 from semantic.ast_nodes import LessEqualNode, LessNode, Node, ProgramNode, ExpressionNode
@@ -34,7 +32,6 @@ from semantic.ast_nodes import (
 )
 from semantic.cool_visitor import FormatVisitor
 
-from cmp.semantic import SemanticError as SError
 from cmp.semantic import Attribute, Method, Type
 from cmp.semantic import VoidType, ErrorType, IntType
 from cmp.semantic import Context
@@ -42,7 +39,6 @@ from cmp.semantic import Context
 from cmp.semantic import Scope
 from cmp.utils import find_least_type
 
-import copy
 from cmp.errors import TypeError, NameError, SemanticError, AttributeError
 import code_gen.ast_typed_nodes as cool_type_nodes
 
@@ -56,58 +52,46 @@ INVALID_OPERATION = 'Operation is not defined between "%s" and "%s".'
 
 
 class TypeChecker:
-    def __init__(self, errors=[]):
+    def __init__(self, errors=[], keep_scopes=True, jobs=1):
         self.context = None
         self.current_type = None
         self.current_method = None
         self.errors = errors
+        # with keep_scopes=False the returned scope doesn't hold the scopes of
+        # the classes and methods, they are released as soon as they're checked
+        self.keep_scopes = keep_scopes
+        # with jobs > 1 the classes are checked in that many processes, see
+        # semantic.parallel_checker
+        self.jobs = jobs
 
     @visitor.on("node")
-    def visit(self, node, scope=None, parent_children_dict=None):
+    def visit(self, node, scope=None):
         pass
 
     @visitor.when(ProgramNode)
     def visit(self, node):
-        scope = Scope()
-        self.context = copy.copy(node.context)
-
-        #visit classes in order (from tree root to leaves)
-        parent_children_dict = {}
-        initial_nodes = []
-        visited = {}
-        self.class_to_visit = []
-        self.class_visited = {}
-        for declaration in node.declarations:
-            try:
-                visited[declaration.id.lex] # checking if visited
-            except:
-                visited[declaration.id.lex] = True
-                self.class_visited[declaration.id.lex] = False
-                self.class_to_visit.append(declaration)
-                if declaration.parent is None or declaration.parent.lex in ["IO", "Int", "String", "Bool"]: # is node has no parent, mark it to visit it first later
-                    initial_nodes.append(declaration)
-                else:
-                    try:
-                        self.context.get_type(declaration.parent.lex)
-                        try:
-                            parent_children_dict[declaration.parent.lex].append(declaration)
-                        except:
-                            parent_children_dict[declaration.parent.lex] = [declaration]
-                    except: # add declarations where parent is not defined
-                        initial_nodes.append(declaration)
-
-        # initialize a list for classDeclNodes of typed ast
-        self.tast_class_nodes = []
-
-        for declaration in initial_nodes: # first visit root nodes
-            self.visit(declaration, scope.create_child(), parent_children_dict)
-
-        while self.class_to_visit: # visiting classes involved in ciclyc heritage
-            declaration = self.class_to_visit[0]
-            self.visit(declaration, scope.create_child(), parent_children_dict)
-            
+        scope = Scope(keep_children=self.keep_scopes)
+        self.context = node.context
 
-        program_node = (scope, cool_type_nodes.ProgramNode(self.tast_class_nodes, copy.copy(self.context)))
+        # classes come in inheritance order (see TypeBuilder.order_classes), so
+        # the scope of a class is created as a child of its parent's one
+        if self.jobs > 1:
+            from semantic.parallel_checker import check_classes
+
+            self.tast_class_nodes = check_classes(self.context, node.declarations, self.jobs, self.errors)
+        else:
+            class_scopes = {}
+            self.tast_class_nodes = []
+            for declaration in node.declarations:
+                if declaration.id.lex in class_scopes: # redefined class
+                    continue
+                parent_scope = scope
+                if declaration.parent is not None:
+                    parent_scope = class_scopes.get(declaration.parent.lex, scope)
+                class_scopes[declaration.id.lex] = parent_scope.create_child()
+                self.tast_class_nodes.append(self.visit(declaration, class_scopes[declaration.id.lex]))
+
+        program_node = (scope, cool_type_nodes.ProgramNode(self.tast_class_nodes, self.context))
 
         self.context = None
         self.current_type = None
@@ -116,10 +100,7 @@ class TypeChecker:
         return program_node
 
     @visitor.when(ClassDeclarationNode)
-    def visit(self, node, scope, parent_children_dict):
-        self.class_to_visit.remove(node)
-        self.class_visited[node.id.lex] = True # arked class as visited
-
+    def visit(self, node, scope):
         self.current_type = self.context.get_type(node.id.lex)
         scope.define_variable("self", self.current_type)
 
@@ -131,34 +112,21 @@ class TypeChecker:
             feature_node = self.visit(feature, scope)
             new_features.append(feature_node)
         
-        try:
-            children = parent_children_dict[node.id.lex]
-            for child in children: # after initialization, each parent class visits its children (note the child scope creation) 
-                if not self.class_visited[child.id.lex]:
-                    self.visit(child, scope.create_child(), parent_children_dict)
-        except:
-            # return
-            pass
         if node.parent is None:
             parent = None
         else:
             parent = node.parent.lex
 
-        self.tast_class_nodes.append(cool_type_nodes.ClassDeclarationNode(node.id.lex, new_features, parent))
+        return cool_type_nodes.ClassDeclarationNode(node.id.lex, new_features, parent)
         
 
     @visitor.when(AttrDeclarationNode)
     def visit(self, node, scope):
-        type_not_found = False
-        try:
-            typex = self.context.get_type(node.type.lex)
-
-            if typex.name == "SELF_TYPE":
-                typex = self.current_type
-
-        except SError as e:
-            # ERROR already reported in type builder
-            type_not_found = True
+        typex = self.context.find_type(node.type.lex)
+        # ERROR already reported in type builder
+        type_not_found = typex is None
+        if not type_not_found and typex.name == "SELF_TYPE":
+            typex = self.current_type
 
         if node.init_exp != None:
             init_expr_type, init_exp  = self.visit(node.init_exp, scope)
@@ -213,38 +181,36 @@ class TypeChecker:
             node_row, node_col = node.body.token.location
             self.errors.append(TypeError( node_row, node_col, f"Inferred return type '{body_type.name}' of method '{node.id.lex}' (the type of the last expression) does not conform to declared return type '{method_return_type.name}'."))
 
+        parent_method = None
         if self.current_type.parent is not None:
-            try:
-                parent_method = self.current_type.parent.get_method(
-                    self.current_method.name
-                )
-                # ensure same return type of redefined method
-                if parent_method.return_type != self.current_method.return_type:
-                    node_row, node_col = node.type.location
-                    self.errors.append(SemanticError(node_row, node_col, f"In redefined method '{node.id.lex}', return type {self.current_method.return_type.name} is different from original return type {parent_method.return_type.name}."))
-                
-                # redefined method most have same number of parameters
-                if len(parent_method.param_names) != len(self.current_method.param_names):
-                    node_row, node_col = node.id.location
-                    self.errors.append(SemanticError(node_row, node_col, f"Incompatible number of formal parameters in redefined method '{node.id.lex}'."))                    
-                    len_parent_params = len(parent_method.param_names)
-                    len_current_params = len(self.current_method.param_names)
-                    if len_current_params >= len_parent_params:
-                        max_len = len_parent_params
-                    else:
-                        max_len = len_current_params
+            # None if the parent has no method named like this
+            parent_method = self.current_type.parent.find_method(self.current_method.name)
+
+        if parent_method is not None:
+            # ensure same return type of redefined method
+            if parent_method.return_type != self.current_method.return_type:
+                node_row, node_col = node.type.location
+                self.errors.append(SemanticError(node_row, node_col, f"In redefined method '{node.id.lex}', return type {self.current_method.return_type.name} is different from original return type {parent_method.return_type.name}."))
+            
+            # redefined method most have same number of parameters
+            if len(parent_method.param_names) != len(self.current_method.param_names):
+                node_row, node_col = node.id.location
+                self.errors.append(SemanticError(node_row, node_col, f"Incompatible number of formal parameters in redefined method '{node.id.lex}'."))                    
+                len_parent_params = len(parent_method.param_names)
+                len_current_params = len(self.current_method.param_names)
+                if len_current_params >= len_parent_params:
+                    max_len = len_parent_params
                 else:
-                    max_len = len(parent_method.param_names)
-
-                # check that each param has the same type as in the original method
-                for i in range(0, max_len):
-                    if self.current_method.param_types[i] != parent_method.param_types[i]:
-                        param_i_name, param_i_type = node.params[i]
-                        node_row, node_col = param_i_name.location
-                        self.errors.append(SemanticError(node_row, node_col, f"In redefined method '{node.id.lex}', type {self.current_method.param_types[i].name} of parameter {param_i_name.lex} is different from original type {parent_method.param_types[i].name}."))                    
-                    
-            except SError:
-                pass # parent has no method named like this
+                    max_len = len_current_params
+            else:
+                max_len = len(parent_method.param_names)
+
+            # check that each param has the same type as in the original method
+            for i in range(0, max_len):
+                if self.current_method.param_types[i] != parent_method.param_types[i]:
+                    param_i_name, param_i_type = node.params[i]
+                    node_row, node_col = param_i_name.location
+                    self.errors.append(SemanticError(node_row, node_col, f"In redefined method '{node.id.lex}', type {self.current_method.param_types[i].name} of parameter {param_i_name.lex} is different from original type {parent_method.param_types[i].name}."))                    
 
         return cool_type_nodes.FuncDeclarationNode(node.id.lex, new_params, node.type.lex, body_exp)
 
@@ -254,14 +220,15 @@ class TypeChecker:
             node_row, node_col = node.token.location
             self.errors.append(SemanticError(node_row, node_col, "Cannot assign to 'self'. " + SELF_IS_READONLY))
         var_type = None
-        if not scope.is_defined(node.id.lex):
+        var = scope.find_variable(node.id.lex)
+        if var is None:
             node_row, node_col = node.id.location
             self.errors.append(
                 NameError(node_row, node_col, VARIABLE_NOT_DEFINED % (node.id.lex, self.current_method.name))
             )
             var_type = ErrorType()
         else:
-            var_type = scope.find_variable(node.id.lex).type
+            var_type = var.type
 
         expr_type, exp_node = self.visit(node.expr, scope)
         if not expr_type.conforms_to(var_type):
@@ -291,24 +258,29 @@ class TypeChecker:
             arg_types.append(arg_type)
             
         method = None
-        try:
-            if not( node.at_type is None):
-                at_type = node.at_type.lex
-                node_at_type = self.context.get_type(node.at_type.lex)
-                method = node_at_type.get_method(node.id.lex)
-                if not typex.conforms_to(node_at_type):
+        if not( node.at_type is None):
+            at_type = node.at_type.lex
+            node_at_type = self.context.find_type(node.at_type.lex)
+            if node_at_type is None:
+                error_text = f'Type "{node.at_type.lex}" is not defined.'
+            else:
+                method = node_at_type.find_method(node.id.lex)
+                error_text = f'Method "{node.id.lex}" is not defined in {node_at_type.name}.'
+                if method is not None and not typex.conforms_to(node_at_type):
                     node_row, node_col = node.at_type.location # maybe in node.obj
                     self.errors.append(
                         TypeError(node_row, node_col, f"Expression type {typex.name} does not conform to declared static dispatch type {node_at_type.name}.")
                     )
                     return (ErrorType(), cool_type_nodes.CallNode(node.id.lex, new_args, obj_exp, at_type, typex, ErrorType()))
 
-            else:
-                at_type = None
-                method = typex.get_method(node.id.lex)
-        except SError as error:
+        else:
+            at_type = None
+            method = typex.find_method(node.id.lex)
+            error_text = f'Method "{node.id.lex}" is not defined in {typex.name}.'
+
+        if method is None:
             node_col, node_row = node.token.location
-            self.errors.append(AttributeError(node_col, node_row ,error.text))
+            self.errors.append(AttributeError(node_col, node_row ,error_text))
             return (ErrorType(), cool_type_nodes.CallNode(node.id.lex, new_args, obj_exp, at_type, typex, ErrorType()))
 
 
@@ -396,18 +368,15 @@ class TypeChecker:
             node_row, node_col = node.token.location
             self.errors.append(SemanticError(node_row, node_col, "'self' cannot be bound in a 'let' expression. " + SELF_IS_READONLY))
 
-        static_type = None
-        try:
-            static_type = self.context.get_type(node.type.lex)
-            if static_type.name == "SELF_TYPE":
-                static_type = self.current_type
-
-        except SError as e:
+        static_type = self.context.find_type(node.type.lex)
+        if static_type is None:
             node_row, node_col = node.type.location
             self.errors.append(
-               TypeError(node_row, node_col, e.text)
+               TypeError(node_row, node_col, f'Type "{node.type.lex}" is not defined.')
             )
             static_type = ErrorType()
+        elif static_type.name == "SELF_TYPE":
+            static_type = self.current_type
 
         if node.expr != None:
             typex, node_exp = self.visit(node.expr, scope)
@@ -449,10 +418,10 @@ class TypeChecker:
             node_row, node_col = node.id.location
             self.errors.append(SemanticError(node_row, node_col, "'self' cannot be bound in a 'case' expression. " + SELF_IS_READONLY))
 
-        try:
-            static_type = self.context.get_type(node.type.lex)
+        static_type = self.context.find_type(node.type.lex)
+        if static_type is not None:
             scope.define_variable(node.id.lex, static_type)
-        except SError as e:
+        else:
             node_row, node_col = node.type.location
             self.errors.append(TypeError(node_row, node_col, f"Type {node.type.lex} of case branch is undefined."))
 
@@ -462,17 +431,16 @@ class TypeChecker:
 
     @visitor.when(InstantiateNode)  # NewNode
     def visit(self, node, scope):
-        try:
-            typex = self.context.get_type(node.lex.lex)
-            if typex.name == "SELF_TYPE":
-                return self.current_type
-            return (typex, cool_type_nodes.InstantiateNode(node.lex.lex, typex))
-
-        except SError as error:
+        typex = self.context.find_type(node.lex.lex)
+        if typex is None:
             node_row, node_col = node.lex.location
             self.errors.append(TypeError(node_row, node_col, f"Type {node.lex.lex} of 'new' expression is not defined."))
             return (ErrorType(), cool_type_nodes.InstantiateNode(node.lex.lex, ErrorType()))
 
+        if typex.name == "SELF_TYPE":
+            return self.current_type
+        return (typex, cool_type_nodes.InstantiateNode(node.lex.lex, typex))
+
     @visitor.when(IsvoidNode)
     def visit(self, node, scope):
         type_exp, node_exp = self.visit(node.expr, scope)
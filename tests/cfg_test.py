@@ -0,0 +1,145 @@
+import pytest
+import sys
+
+src_dir = __file__.rpartition('/')[0] + '/../src/'
+sys.path.insert(0, src_dir)
+
+import cmp.cil as cil
+from code_gen.cil_cfg import OPERANDS, ControlFlowGraph, defined
+from code_gen.cil_dataflow import liveness, reaching_definitions
+from code_gen.cil_ssa import from_ssa, sequentialize, to_ssa
+
+
+def swap_loop():
+    # a, b = 1, 2; while i < n: a, b = b, a; i = i + 1; return a * 10 + b
+    return cil.FunctionNode('swap', [cil.ParamNode('n')], [cil.LocalNode(name) for name in 'abcit'], [
+        cil.AssignNode('a', 1),
+        cil.AssignNode('b', 2),
+        cil.AssignNode('i', 0),
+        cil.LabelNode('WHILE'),
+        cil.LessNode('c', 'i', 'n'),
+        cil.GotoIfNode('c', 'BODY'),
+        cil.GotoNode('END'),
+        cil.LabelNode('BODY'),
+        cil.AssignNode('t', 'a'),
+        cil.AssignNode('a', 'b'),
+        cil.AssignNode('b', 't'),
+        cil.PlusNode('i', 'i', 1),
+        cil.GotoNode('WHILE'),
+        cil.LabelNode('END'),
+        cil.StarNode('t', 'a', 10),
+        cil.PlusNode('t', 't', 'b'),
+        cil.ReturnNode('t'),
+    ])
+
+
+OPERATIONS = {
+    cil.PlusNode: lambda left, right: left + right,
+    cil.StarNode: lambda left, right: left * right,
+    cil.LessNode: lambda left, right: int(left < right),
+}
+
+
+def run(function, *args):
+    # just enough of CIL to run the functions in these tests
+    variables = {param.name: arg for param, arg in zip(function.params, args)}
+    value = lambda operand: operand if isinstance(operand, int) else variables[operand]
+    labels = {instruction.name: index for index, instruction in enumerate(function.instructions)
+        if isinstance(instruction, cil.LabelNode)}
+
+    index = 0
+    while True:
+        instruction = function.instructions[index]
+        index += 1
+        if isinstance(instruction, cil.AssignNode):
+            variables[instruction.dest] = value(instruction.source)
+        elif type(instruction) in OPERATIONS:
+            variables[instruction.dest] = OPERATIONS[type(instruction)](value(instruction.left), value(instruction.right))
+        elif isinstance(instruction, cil.GotoIfNode):
+            if value(instruction.condition):
+                index = labels[instruction.label]
+        elif isinstance(instruction, cil.GotoNode):
+            index = labels[instruction.label]
+        elif isinstance(instruction, cil.ReturnNode):
+            return value(instruction.value)
+
+
+@pytest.mark.cfg
+@pytest.mark.run(order=5)
+def test_blocks_and_dominators():
+    cfg = ControlFlowGraph(swap_loop().instructions)
+    entry, header, exit_jump, body, end = cfg.blocks
+
+    assert [block.label for block in cfg.blocks] == [None, 'WHILE', None, 'BODY', 'END']
+    assert header.predecessors == [entry, body]
+    assert header.successors == [body, exit_jump]
+    assert end.predecessors == [exit_jump]
+
+    idom = cfg.immediate_dominators()
+    assert idom == {entry: None, header: entry, exit_jump: header, body: header, end: exit_jump}
+    assert cfg.dominates(header, end, idom) and not cfg.dominates(body, end, idom)
+    assert cfg.dominance_frontiers(idom)[body] == {header}
+
+
+@pytest.mark.cfg
+@pytest.mark.run(order=5)
+def test_dataflow():
+    cfg = ControlFlowGraph(swap_loop().instructions)
+    entry, header, exit_jump, body, end = cfg.blocks
+
+    live_in, live_out = liveness(cfg)
+    assert live_in[header.index] == {'a', 'b', 'i', 'n'}
+    assert live_out[exit_jump.index] == {'a', 'b'}
+    assert live_in[entry.index] == {'n'}
+
+    reach_in, _ = reaching_definitions(cfg)
+    assert {(name, block) for name, block, _ in reach_in[header.index] if name == 'a'} == {
+        ('a', entry.index), ('a', body.index)}
+
+
+@pytest.mark.cfg
+@pytest.mark.run(order=5)
+def test_ssa_round_trip():
+    function = swap_loop()
+    cfg = to_ssa(function)
+
+    definitions = [defined(instruction) for block in cfg.blocks for instruction in block.instructions]
+    definitions = [dest for dest in definitions if dest is not None]
+    assert len(definitions) == len(set(definitions))
+
+    header = next(block for block in cfg.blocks if block.label == 'WHILE')
+    phis = [instruction for instruction in header.instructions if isinstance(instruction, cil.PhiNode)]
+    assert sorted(phi.dest.partition('.')[0] for phi in phis) == ['a', 'b', 'i']
+    assert all(set(phi.sources) == set(header.predecessors) for phi in phis)
+
+    # copies propagated in SSA form leave the phis of the header swapping a and b
+    copies = {}
+    for block in cfg.blocks:
+        for instruction in block.instructions:
+            if type(instruction) is cil.AssignNode and isinstance(instruction.source, str):
+                copies[instruction.dest] = instruction.source
+    for block in cfg.blocks:
+        for instruction in block.instructions:
+            if isinstance(instruction, cil.PhiNode):
+                instruction.sources = {pred: copies.get(name, name) for pred, name in instruction.sources.items()}
+            for field in OPERANDS.get(type(instruction), ()):
+                name = getattr(instruction, field)
+                setattr(instruction, field, copies.get(name, name))
+
+    from_ssa(function, cfg)
+    assert not any(isinstance(instruction, cil.PhiNode) for instruction in function.instructions)
+    for n in range(4):
+        assert run(function, n) == run(swap_loop(), n) == (12 if n % 2 == 0 else 21)
+
+
+@pytest.mark.cfg
+@pytest.mark.run(order=5)
+def test_parallel_copies():
+    names = iter(['tmp'])
+    assignments = sequentialize({'a': 'b', 'b': 'c', 'c': 'a', 'd': 'a'}, lambda: next(names))
+
+    values = {'a': 1, 'b': 2, 'c': 3, 'd': 4}
+    for assignment in assignments:
+        values[assignment.dest] = values[assignment.source]
+    assert (values['a'], values['b'], values['c'], values['d']) == (2, 3, 1, 1)
+    assert len(assignments) == 5
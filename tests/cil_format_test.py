@@ -0,0 +1,106 @@
+import pytest
+import shutil
+import sys
+
+from utils import run_compiler
+
+src_dir = __file__.rpartition('/')[0] + '/../src/'
+tests_dir = __file__.rpartition('/')[0] + '/codegen/'
+sys.path.insert(0, src_dir)
+
+import cmp.cil as cil
+from code_gen.cil_format import FORMAT_HEADER, FORMAT_VERSION, CILFormatError, dumps, load, loads
+from code_gen.cil_optimizer import CILOptimizer
+from code_gen.runtime import runtime_cil
+
+RUNTIME = runtime_cil()
+
+# B inherits A.f, main calls it through the vtable
+FIXTURE = f'''{FORMAT_HEADER} {FORMAT_VERSION}
+["type","A","Object",[],[["f","A_f"]]]
+["type","B","A",[],[["f","A_f"]]]
+["function","A_f",["self"],[]]
+["Return",7]
+["function","main",[],["a","t","r"]]
+["Allocate","B","a"]
+["TypeOf","a","t",false,null]
+["Arg","a"]
+["DynamicCall","t",0,"r","A"]
+["PrintInt","r"]
+["Exit"]
+'''
+
+
+@pytest.mark.cil_format
+@pytest.mark.run(order=5)
+def test_round_trip(tmp_path):
+    cool_file = tmp_path / 'book_list.cl'
+    shutil.copy(tests_dir + 'book_list.cl', cool_file)
+
+    sp = run_compiler(cool_file, '--emit=cil,cilo')
+    assert sp.returncode == 0, sp.stdout.decode()
+
+    cilo = (tmp_path / 'book_list.cilo').read_text()
+    program = load(tmp_path / 'book_list.cilo', RUNTIME)
+    assert dumps(program) == cilo
+    assert cil.PrintVisitor().visit(program) + '\n' == (tmp_path / 'book_list.cil').read_text()
+
+
+@pytest.mark.cil_format
+@pytest.mark.run(order=5)
+def test_compile_cil_program(tmp_path):
+    cool_file = tmp_path / 'fib.cl'
+    shutil.copy(tests_dir + 'fib.cl', cool_file)
+    assert run_compiler(cool_file, '--emit=cilo').returncode == 0
+
+    cilo_file = tmp_path / 'fib.cilo'
+    sp = run_compiler(cilo_file)
+    assert sp.returncode == 0, sp.stdout.decode()
+    assert 'Main_main:' in (tmp_path / 'fib.mips').read_text()
+
+    sp = run_compiler(cilo_file, '--emit=tokens,mips')
+    assert sp.returncode == 1
+    assert 'Artifact `tokens` can\'t be emitted' in sp.stdout.decode()
+
+
+@pytest.mark.cil_format
+@pytest.mark.run(order=5)
+def test_invalid_cil_program(tmp_path):
+    cilo_file = tmp_path / 'old.cilo'
+    cilo_file.write_text(FIXTURE.replace(f'{FORMAT_HEADER} {FORMAT_VERSION}', f'{FORMAT_HEADER} 0'))
+
+    sp = run_compiler(cilo_file)
+    assert sp.returncode == 1
+    assert 'CompilerError' in sp.stdout.decode() and 'unsupported version' in sp.stdout.decode()
+
+    # records of the wrong shape or holding the wrong fields
+    cilo_file.write_text(FIXTURE.replace('["Exit"]', '["Goto",5]'))
+    sp = run_compiler(cilo_file)
+    assert sp.returncode == 1
+    assert 'CompilerError' in sp.stdout.decode() and 'invalid label' in sp.stdout.decode()
+
+    for old, new in [
+        ('["Return",7]', '["Return"]'),
+        ('["Exit"]', '["Jump","END"]'),
+        ('[["f","A_f"]]]', '5]'),
+        ('["Exit"]', '["StaticCall","nope","r"]'),
+        ('["Exit"]', '["PrintInt","nope"]'),
+        ('["Allocate","B","a"]', '["Allocate","C","a"]'),
+        ('"t",false,null', '"t",0,null'),
+        ('["Arg","a"]', '["Arg",["a"]]'),
+    ]:
+        with pytest.raises(CILFormatError):
+            loads(FIXTURE.replace(old, new), RUNTIME)
+
+
+@pytest.mark.cil_format
+@pytest.mark.run(order=5)
+def test_optimizer_fixture():
+    program = loads(FIXTURE, RUNTIME)
+    CILOptimizer(1).optimize(program)
+
+    main = next(function for function in program.dotcode if function.name == 'main')
+    printer = cil.PrintVisitor()
+    code = [printer.visit(instruction) for instruction in main.instructions]
+    assert not any('VCALL' in line for line in code)
+    assert 'PRINT INT 7' in code
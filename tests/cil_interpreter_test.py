@@ -0,0 +1,120 @@
+import io
+import os
+import pytest
+import shutil
+import sys
+
+src_dir = __file__.rpartition('/')[0] + '/../src/'
+tests_dir = __file__.rpartition('/')[0] + '/codegen/'
+sys.path.insert(0, src_dir)
+
+from code_gen.cil_format import load
+from code_gen.cil_interpreter import CILInterpreter
+from code_gen.runtime import runtime_cil
+from main import run_with_deep_stack
+from utils import UNEXPECTED_OUTPUT, run_compiler
+
+tests = [(file) for file in os.listdir(tests_dir) if file.endswith('.cl')]
+
+VOID_PROGRAM = '''
+class A { f() : Int { 1 }; };
+class Main inherits IO {
+    a : A;
+    main() : Object {{
+        if isvoid a then out_string("void\\n") else out_string("object\\n") fi;
+        out_int(10 / in_int());
+        a.f();
+    }};
+};
+'''
+
+BOOL_PROGRAM = '''
+class A { x : Int <- 5; f() : Int { x }; };
+class Main inherits IO {
+    a : A;
+    main() : Object {{
+        let o : Object <- not false in {
+            out_string(o.type_name());
+            case o of b : Bool => out_string(" Bool\\n"); n : Int => out_string(" Int\\n"); esac;
+        };
+        a@A.f();
+    }};
+};
+'''
+
+RECURSIVE_PROGRAM = '''
+class Main inherits IO {
+    f(n : Int) : Int { 1 + f(n + 1) };
+    main() : Object {{ out_string("start\\n"); out_int(f(0)); }};
+};
+'''
+
+
+def interpret(cilo_file, input_file_path):
+    runtime = runtime_cil()
+    output = io.StringIO()
+    with open(input_file_path, 'r') as stdin:
+        # deeply recursive programs need the stack of the compiler
+        run_with_deep_stack(lambda: CILInterpreter(load(cilo_file, runtime), stdin, output, runtime).run())
+    return output.getvalue()
+
+
+@pytest.mark.cil_interpreter
+@pytest.mark.run(order=5)
+@pytest.mark.parametrize("cool_file", tests)
+def test_interpreter(tmp_path, cool_file):
+    shutil.copy(tests_dir + cool_file, tmp_path / cool_file)
+    sp = run_compiler(tmp_path / cool_file, '--emit=cilo')
+    assert sp.returncode == 0, sp.stdout.decode()
+
+    output = interpret(tmp_path / (cool_file[:-3] + '.cilo'), tests_dir + cool_file[:-3] + '_input.txt')
+
+    with open(tests_dir + cool_file[:-3] + '_output.txt', 'r') as fd:
+        eoutput = fd.read()
+    assert output == eoutput, UNEXPECTED_OUTPUT % (cool_file, repr(output), repr(eoutput))
+
+
+@pytest.mark.cil_interpreter
+@pytest.mark.run(order=5)
+def test_run_program(tmp_path):
+    cool_file = tmp_path / 'void.cl'
+    cool_file.write_text(VOID_PROGRAM)
+
+    # a runtime error stops the program with an error status
+    sp = run_compiler(cool_file, '--run', input=b'5\n')
+    assert sp.returncode == 1
+    assert sp.stdout.decode() == 'void\n2Dispatch on void\n'
+    # nothing is emitted unless requested
+    assert not (tmp_path / 'void.mips').exists()
+
+    sp = run_compiler(cool_file, '--run', input=b'0\n')
+    assert sp.returncode == 1
+    assert sp.stdout.decode() == 'void\nDivision by zero\n'
+
+
+@pytest.mark.cil_interpreter
+@pytest.mark.run(order=5)
+def test_bool_values(tmp_path):
+    cool_file = tmp_path / 'bool.cl'
+    cool_file.write_text(BOOL_PROGRAM)
+
+    # Bool values keep their type in an Object, a static dispatch on void fails
+    sp = run_compiler(cool_file, '--run')
+    assert sp.returncode == 1
+    assert sp.stdout.decode() == 'Bool Bool\nDispatch on void\n'
+
+
+@pytest.mark.cil_interpreter
+@pytest.mark.run(order=5)
+def test_stack_overflow(tmp_path):
+    cool_file = tmp_path / 'recursive.cl'
+    cool_file.write_text(RECURSIVE_PROGRAM)
+    sp = run_compiler(cool_file, '--emit=cilo')
+    assert sp.returncode == 0, sp.stdout.decode()
+
+    # without the deep stack the recursion limit is reached right away
+    runtime = runtime_cil()
+    output = io.StringIO()
+    interpreter = CILInterpreter(load(tmp_path / 'recursive.cilo', runtime), io.StringIO(), output, runtime)
+    assert interpreter.run() == 1
+    assert output.getvalue() == 'start\nStack overflow\n'
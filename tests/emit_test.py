@@ -0,0 +1,81 @@
+import pytest
+import os
+import shutil
+
+from utils import run_compiler
+
+tests_dir = __file__.rpartition('/')[0] + '/codegen/'
+
+ARTIFACTS = ['tokens', 'ast', 'typed-ast', 'cil', 'mips']
+
+
+@pytest.mark.emit
+@pytest.mark.run(order=5)
+def test_emit_only_requested(tmp_path):
+    cool_file = tmp_path / 'fib.cl'
+    shutil.copy(tests_dir + 'fib.cl', cool_file)
+
+    sp = run_compiler(cool_file, '--emit=tokens')
+    assert sp.returncode == 0, sp.stdout.decode()
+
+    emitted = sorted(file for file in os.listdir(tmp_path) if not file.endswith('.cl'))
+    assert emitted == ['fib.tokens']
+
+
+@pytest.mark.emit
+@pytest.mark.run(order=5)
+def test_emit_all_artifacts(tmp_path):
+    cool_file = tmp_path / 'fib.cl'
+    shutil.copy(tests_dir + 'fib.cl', cool_file)
+
+    sp = run_compiler(cool_file, '--emit=' + ','.join(ARTIFACTS))
+    assert sp.returncode == 0, sp.stdout.decode()
+    assert sp.stdout.decode() == '', 'Nothing but errors may be printed to stdout'
+
+    for artifact in ARTIFACTS:
+        assert (tmp_path / ('fib.' + artifact)).stat().st_size > 0, 'Missing %s artifact' % artifact
+
+
+@pytest.mark.emit
+@pytest.mark.run(order=5)
+def test_emit_unknown_artifact(tmp_path):
+    cool_file = tmp_path / 'fib.cl'
+    shutil.copy(tests_dir + 'fib.cl', cool_file)
+
+    sp = run_compiler(cool_file, '--emit=mips,llvm')
+    assert sp.returncode == 1
+    assert 'CompilerError' in sp.stdout.decode()
+
+
+POOL_PROGRAM = '''
+class A {
+    greet() : String { "hello" };
+    kind(x : Object) : Int { case x of s : String => 1; o : Object => 2; esac };
+};
+
+class Main inherits IO {
+    main() : Object {{
+        out_string("hello");
+        out_string((new A).greet());
+        out_int((new A).kind("hello"));
+        out_int(case self of m : Main => 3; o : Object => 4; esac);
+    }};
+};
+'''
+
+
+@pytest.mark.emit
+@pytest.mark.run(order=5)
+def test_emit_pooled_data(tmp_path):
+    cool_file = tmp_path / 'pool.cl'
+    cool_file.write_text(POOL_PROGRAM)
+
+    sp = run_compiler(cool_file)
+    assert sp.returncode == 0, sp.stdout.decode()
+
+    mips = (tmp_path / 'pool.mips').read_text()
+    data = mips[:mips.index('.text')]
+    labels = [line.split(':')[0].strip() for line in data.splitlines() if ':' in line]
+    assert len(labels) == len(set(labels)), 'Data labels defined twice'
+    assert data.count('"hello"') == 1
+    assert data.count('"No branch can be selected for evaluation\\n"') == 1
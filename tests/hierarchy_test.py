@@ -0,0 +1,167 @@
+import pytest
+import random
+import sys
+
+from utils import run_compiler
+
+src_dir = __file__.rpartition('/')[0] + '/../src/'
+sys.path.insert(0, src_dir)
+
+from cmp.semantic import Context
+
+
+DEPTH = 300
+WIDTH = 2000
+MAIN = '''
+class Main inherits IO {
+    pick(b : Bool) : C0 { if b then new C%d else new C%d fi };
+    main() : Object { out_int(case pick(true) of x : C%d => x.v(); y : C0 => 0 - 1; esac) };
+};
+'''
+
+
+def deep_hierarchy(depth):
+    classes = ['class C0 inherits IO { v() : Int { 0 }; };']
+    classes += ['class C%d inherits C%d { v() : Int { %d }; };' % (i, i - 1, i) for i in range(1, depth)]
+    return '\n'.join(classes) + MAIN % (depth - 1, depth // 2, depth // 2)
+
+
+def build_context(parents):
+    context = Context()
+    for name in parents:
+        context.create_type(name)
+    for name, parent in parents.items():
+        if parent is not None:
+            context.get_type(name).set_parent(context.get_type(parent))
+    return context.freeze()
+
+
+def ancestors(typex):
+    chain = []
+    while typex is not None:
+        chain.append(typex)
+        typex = typex.parent
+    return chain
+
+
+def check_hierarchy(context, pairs):
+    # the index against walking the parents
+    hierarchy = context.hierarchy
+    chains = {name: ancestors(typex) for name, typex in context.types.items()}
+    for a, b in pairs:
+        type_a, type_b = context.get_type(a), context.get_type(b)
+        assert hierarchy.conforms_to(type_a, type_b) == any(typex is type_b for typex in chains[a]), (a, b)
+        names_b = {typex.name for typex in chains[b]}
+        common = next((typex for typex in chains[a] if typex.name in names_b), None)
+        assert hierarchy.least_common_ancestor(type_a, type_b) is common, (a, b)
+
+
+@pytest.mark.hierarchy
+@pytest.mark.run(order=5)
+def test_deep_hierarchy(tmp_path):
+    cool_file = tmp_path / 'chain.cl'
+    cool_file.write_text(deep_hierarchy(DEPTH))
+
+    sp = run_compiler(cool_file)
+    assert sp.returncode == 0, sp.stdout.decode()[-1000:]
+    assert (tmp_path / 'chain.mips').stat().st_size > 0
+
+
+@pytest.mark.hierarchy
+@pytest.mark.run(order=5)
+def test_hierarchy_index():
+    # a deep chain, a wide fan-out under the middle of it, a random tree
+    # and a second root, declared in a shuffled order
+    parents = {'C0': None}
+    parents.update(('C%d' % i, 'C%d' % (i - 1)) for i in range(1, DEPTH))
+    parents.update(('W%d' % i, 'C%d' % (DEPTH // 2)) for i in range(WIDTH))
+    rng = random.Random(0)
+    names = list(parents)
+    for i in range(WIDTH):
+        parents['R%d' % i] = rng.choice(names)
+        names.append('R%d' % i)
+    parents['X0'] = None
+    parents.update(('X%d' % i, 'X%d' % rng.randrange(i)) for i in range(1, 50))
+    declared = list(parents.items())
+    rng.shuffle(declared)
+    context = build_context(dict(declared))
+
+    names = list(parents)
+    chain = ['C%d' % i for i in range(DEPTH)]
+    pairs = [(a, b) for a in chain for b in chain[::7]]
+    pairs += [(a, b) for a in names for b in ('C0', 'C%d' % (DEPTH // 2), 'C%d' % (DEPTH - 1), 'X0', a)]
+    pairs += [(rng.choice(names), rng.choice(names)) for _ in range(20000)]
+    check_hierarchy(context, pairs)
+
+
+@pytest.mark.hierarchy
+@pytest.mark.run(order=5)
+def test_case_dispatch(tmp_path):
+    cool_file = tmp_path / 'chain.cl'
+    cool_file.write_text(deep_hierarchy(DEPTH))
+
+    sp = run_compiler(cool_file, '-O0', '--emit=cil')
+    assert sp.returncode == 0, sp.stdout.decode()[-1000:]
+    cil = (tmp_path / 'chain.cil').read_text()
+    start = cil.index('function Main_main {')
+    main = cil[start:cil.index('\n}', start)]
+
+    # a test per branch, not per class conforming to C0
+    assert main.count('TYPEID') == 1
+    assert main.count('IF ') <= 4
+
+
+@pytest.mark.hierarchy
+@pytest.mark.run(order=5)
+def test_case_errors(tmp_path):
+    cool_file = tmp_path / 'case.cl'
+    program = '''
+class A {};
+class Main inherits IO {
+    main() : Object { case %s of b : Bool => 0; i : Int => 1; esac };
+};
+'''
+    # a case on void and a case without a branch for the type fail apart
+    for expr, error in [('while false loop 0 pool', 'Case on void'), ('new A', 'No branch can be selected for evaluation')]:
+        cool_file.write_text(program % expr)
+        sp = run_compiler(cool_file, '--run')
+        assert sp.returncode == 1
+        assert sp.stdout.decode() == error + '\n'
+
+
+@pytest.mark.hierarchy
+@pytest.mark.run(order=5)
+def test_wide_hierarchy(tmp_path):
+    # a binary tree of classes, declared from the root down
+    classes = ['class C%d inherits %s { x%d : Int <- %d; f() : Int { x%d }; };' % (i, 'C%d' % ((i - 1) // 2) if i else 'IO', i, i, i)
+        for i in range(WIDTH)]
+    classes.append('class Main inherits IO { main() : Object { out_int((new C%d).f()) }; };' % (WIDTH - 1))
+    cool_file = tmp_path / 'tree.cl'
+    cool_file.write_text('\n'.join(classes))
+
+    sp = run_compiler(cool_file)
+    assert sp.returncode == 0, sp.stdout.decode()[-1000:]
+    assert (tmp_path / 'tree.mips').stat().st_size > 0
+
+
+@pytest.mark.hierarchy
+@pytest.mark.run(order=5)
+def test_inheritance_cycles(tmp_path):
+    classes = [
+        'class A inherits B { };',
+        'class B inherits C { };',
+        'class D inherits D { };',
+        'class C inherits A { };',
+        'class E inherits A { };',
+    ]
+    cool_file = tmp_path / 'cycles.cl'
+    cool_file.write_text('\n'.join(classes) + '\nclass Main { main() : Int { 0 }; };')
+
+    sp = run_compiler(cool_file)
+    assert sp.returncode == 1
+    errors = [line for line in sp.stdout.decode().split('\n') if 'inheritance cycle' in line]
+    # each cycle once, where its last class is declared
+    assert errors == [
+        '(3, 18) - SemanticError: Class D, or an ancestor of D, is involved in an inheritance cycle.',
+        '(4, 18) - SemanticError: Class C, or an ancestor of C, is involved in an inheritance cycle.',
+    ]
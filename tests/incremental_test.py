@@ -0,0 +1,107 @@
+import pytest
+import re
+
+from utils import run_compiler
+
+PROGRAM = '''
+class Greeter inherits IO {
+    greet(name : String) : Object { out_string("Hello, ".concat(name).concat("\\n")) };
+};
+
+class Main inherits IO {
+    main() : Object { (new Greeter).greet("%s") };
+};
+'''
+
+
+def compile_incremental(cool_file, timeout=100):
+    sp = run_compiler(cool_file, '--incremental', timeout=timeout)
+    assert sp.returncode == 0, sp.stdout.decode()
+    assert (cool_file.parent / (cool_file.stem + '.mips')).stat().st_size > 0
+
+
+def fragments(cool_file):
+    cache_dir = cool_file.parent / '__coolcache__'
+    return {path.name: path.stat().st_mtime_ns for path in cache_dir.glob(cool_file.stem + '.*.fragment')}
+
+
+@pytest.mark.incremental
+@pytest.mark.run(order=5)
+def test_incremental_regenerates_changed_classes(tmp_path):
+    cool_file = tmp_path / 'greeter.cl'
+    cool_file.write_text(PROGRAM % 'World')
+    compile_incremental(cool_file)
+
+    cached = fragments(cool_file)
+    assert sorted(cached) == ['greeter.Greeter.fragment', 'greeter.Main.fragment']
+
+    cool_file.write_text(PROGRAM % 'COOL')
+    compile_incremental(cool_file)
+
+    recompiled = fragments(cool_file)
+    assert recompiled['greeter.Greeter.fragment'] == cached['greeter.Greeter.fragment']
+    assert recompiled['greeter.Main.fragment'] != cached['greeter.Main.fragment']
+    mips = (tmp_path / 'greeter.mips').read_text()
+    assert '"COOL"' in mips and '"World"' not in mips
+
+
+@pytest.mark.incremental
+@pytest.mark.run(order=5)
+def test_incremental_interface_change(tmp_path):
+    cool_file = tmp_path / 'greeter.cl'
+    cool_file.write_text(PROGRAM % 'World')
+    compile_incremental(cool_file)
+    cached = fragments(cool_file)
+
+    # a new attribute changes the layout every class is compiled against
+    cool_file.write_text(PROGRAM.replace('inherits IO {\n    greet', 'inherits IO {\n    x : Int;\n    greet') % 'World')
+    compile_incremental(cool_file)
+
+    recompiled = fragments(cool_file)
+    assert all(recompiled[name] != cached[name] for name in cached)
+
+
+@pytest.mark.incremental
+@pytest.mark.run(order=5)
+def test_incremental_inlined_code(tmp_path):
+    cool_file = tmp_path / 'counter.cl'
+    program = '''
+class Counter {
+    step() : Int { %d };
+};
+
+class Main inherits IO {
+    main() : Object { out_int((new Counter).step()) };
+};
+'''
+    cool_file.write_text(program % 1)
+    compile_incremental(cool_file)
+    cached = fragments(cool_file)
+
+    # Main_main got the code of Counter_step, it's generated again with it
+    cool_file.write_text(program % 2)
+    compile_incremental(cool_file)
+
+    recompiled = fragments(cool_file)
+    assert recompiled['counter.Counter.fragment'] != cached['counter.Counter.fragment']
+    assert recompiled['counter.Main.fragment'] != cached['counter.Main.fragment']
+
+
+@pytest.mark.incremental
+@pytest.mark.run(order=5)
+def test_incremental_fragments_are_text(tmp_path):
+    cool_file = tmp_path / 'greeter.cl'
+    cool_file.write_text(PROGRAM % 'World')
+    compile_incremental(cool_file)
+    # the temporaries are picked at random
+    registers = lambda text: re.sub(r'\$t\d', '$t', text)
+    mips = registers((tmp_path / 'greeter.mips').read_text())
+
+    # a fragment is data, a broken one is generated again
+    fragment = tmp_path / '__coolcache__' / 'greeter.Greeter.fragment'
+    assert 'Greeter_greet:' in fragment.read_text()
+    fragment.write_bytes(b'\x80\x04\x95 not a fragment')
+    compile_incremental(cool_file)
+
+    assert 'Greeter_greet:' in fragment.read_text()
+    assert registers((tmp_path / 'greeter.mips').read_text()) == mips
@@ -0,0 +1,55 @@
+import pytest
+import subprocess
+import sys
+
+from utils import SRC_DIR, run_compiler
+
+DEPTH = 10000
+PROGRAM = '''
+class Main inherits IO {
+    main() : Object { out_int(%s) };
+};
+'''
+
+NESTED = {
+    'if': 'if true then ' * DEPTH + '1' + ' else 0 fi' * DEPTH,
+    'let': 'let x : Int <- 1 in ' * DEPTH + 'x',
+    'parenthesis': '(' * DEPTH + '1' + ')' * DEPTH,
+    'block': '{ ' + '1; ' * DEPTH + '}',
+}
+
+
+@pytest.mark.nesting
+@pytest.mark.run(order=5)
+@pytest.mark.parametrize("kind", NESTED)
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_deep_nesting(tmp_path, kind, jobs):
+    cool_file = tmp_path / (kind + '.cl')
+    cool_file.write_text(PROGRAM % NESTED[kind])
+
+    # the processes checking the classes need the deep stack too
+    sp = run_compiler(cool_file, '--jobs', str(jobs), timeout=300)
+
+    assert sp.returncode == 0, sp.stderr.decode()[-1000:]
+    assert (tmp_path / (kind + '.mips')).stat().st_size > 0
+
+
+@pytest.mark.nesting
+@pytest.mark.run(order=5)
+def test_pipeline_deep_stack(tmp_path):
+    cool_file = tmp_path / 'let.cl'
+    cool_file.write_text(PROGRAM % NESTED['let'])
+
+    # the compiler used as a library, the limits of the caller are kept
+    code = '\n'.join([
+        'import main, sys',
+        'from pathlib import Path',
+        'limit = sys.getrecursionlimit()',
+        'main.pipeline(Path(%r))' % str(cool_file),
+        'print(sys.getrecursionlimit() == limit)',
+    ])
+    sp = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, capture_output=True, timeout=300)
+
+    assert sp.returncode == 0, sp.stderr.decode()[-1000:]
+    assert sp.stdout.decode() == 'True\n'
+    assert (tmp_path / 'let.mips').stat().st_size > 0
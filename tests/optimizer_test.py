@@ -0,0 +1,190 @@
+import pytest
+
+from utils import run_compiler
+
+
+PASSES = ['devirtualization', 'inlining', 'copy-propagation', 'constant-folding', 'dead-code', 'unreachable-code', 'slot-coalescing']
+PROGRAM = '''
+class Main inherits IO {
+    x : Int <- 3;
+    f(a : Int) : Int { let y : Int <- 2 * 3 + 4, z : Int <- y in if y < 5 then a else z - a fi };
+    main() : Object { out_int(f(x)) };
+};
+'''
+
+SLOTS_PROGRAM = '''
+class Main inherits IO {
+    f(a : Int, b : Int) : Int { a * b - a };
+    main() : Object {{
+        out_int(f(1, 2) + f(3, 4));
+        out_int(f(5, 6) + f(7, 8));
+        out_int(f(9, 10) + f(11, 12));
+    }};
+};
+'''
+
+
+DISPATCH_PROGRAM = '''
+class A {
+    f() : Int { 1 };
+    g() : Int { 2 };
+};
+class B inherits A {
+    f() : Int { 3 };
+};
+class Main inherits IO {
+    a : A <- new B;
+    main() : Object {{
+        out_int((new A).f());
+        out_int((new A).g());
+        out_int(a.g());
+    }};
+};
+'''
+
+INLINE_PROGRAM = '''
+class Main inherits IO {
+    max(a : Int, b : Int) : Int { if a < b then b else a fi };
+    fact(n : Int) : Int { if n = 0 then 1 else n * fact(n - 1) fi };
+    main() : Object {{
+        out_int(max(in_int(), in_int()));
+        out_int(self@Main.fact(5));
+    }};
+};
+'''
+
+TRAP_PROGRAM = '''
+class Main inherits IO {
+    main() : Object {
+        let z : Int <- 0, x : Int <- 1 / z, y : Int <- in_int() + 1 in out_string("ok\\n")
+    };
+};
+'''
+
+
+def function_code(cil, name):
+    start = cil.index('function %s {' % name)
+    return cil[start:cil.index('\n}', start)]
+
+
+@pytest.mark.optimizer
+@pytest.mark.run(order=5)
+def test_optimization_levels(tmp_path):
+    cool_file = tmp_path / 'fold.cl'
+    cool_file.write_text(PROGRAM)
+
+    code = {}
+    for level in ['0', '1', '2']:
+        sp = run_compiler(cool_file, '-O' + level, '--emit=cil')
+        assert sp.returncode == 0, sp.stdout.decode()
+        code[level] = function_code((tmp_path / 'fold.cil').read_text(), 'Main_f')
+
+    # 2 * 3 + 4 is computed, the branch on 10 < 5 and its labels are gone
+    assert 'IF ' in code['0'] and 'LABEL' in code['0']
+    for level in ['1', '2']:
+        assert 'IF ' not in code[level] and 'LABEL' not in code[level]
+        assert len(code[level].splitlines()) < len(code['0'].splitlines())
+
+    # -O2 repeats the passes, the constant reaches the code of the else branch
+    assert '10 - param_a' in code['2']
+
+
+@pytest.mark.optimizer
+@pytest.mark.run(order=5)
+def test_slot_coalescing(tmp_path):
+    cool_file = tmp_path / 'slots.cl'
+    cool_file.write_text(SLOTS_PROGRAM)
+
+    frames = {}
+    for level in ['0', '1']:
+        sp = run_compiler(cool_file, '-O' + level, '--emit=cil')
+        assert sp.returncode == 0, sp.stdout.decode()
+        code = function_code((tmp_path / 'slots.cil').read_text(), 'Main_main')
+        frames[level] = code.count('LOCAL ')
+
+    # the temporaries of each call are dead once it's printed, they share slots
+    assert frames['1'] < frames['0'] // 2
+
+
+@pytest.mark.optimizer
+@pytest.mark.run(order=5)
+def test_devirtualization(tmp_path):
+    cool_file = tmp_path / 'dispatch.cl'
+    cool_file.write_text(DISPATCH_PROGRAM)
+
+    code = {}
+    for level in ['0', '1']:
+        sp = run_compiler(cool_file, '-O' + level, '--emit=cil')
+        assert sp.returncode == 0, sp.stdout.decode()
+        code[level] = function_code((tmp_path / 'dispatch.cil').read_text(), 'Main_main')
+
+    assert code['0'].count('VCALL') == 6
+    # Main has no subclasses and g is only defined by A, but f is overridden
+    # by B and the attribute may be void
+    assert code['1'].count('VCALL') == 2
+    assert code['1'].count('CALL IO_out_int') == 3
+
+    sp = run_compiler(cool_file, '-O1', '--stats')
+    assert 'dynamic calls 6, 4 devirtualized' in sp.stderr.decode()
+
+
+@pytest.mark.optimizer
+@pytest.mark.run(order=5)
+def test_inlining(tmp_path):
+    cool_file = tmp_path / 'inline.cl'
+    cool_file.write_text(INLINE_PROGRAM)
+
+    sp = run_compiler(cool_file, '-O1', '--emit=cil')
+    assert sp.returncode == 0, sp.stdout.decode()
+    cil = (tmp_path / 'inline.cil').read_text()
+    main, fact = function_code(cil, 'Main_main'), function_code(cil, 'Main_fact')
+
+    # the labels of max are renamed, the recursive fact is called
+    assert 'CALL Main_max' not in main
+    assert 'LABEL Main_main_INLINE_' in main and 'IF ' in main
+    assert 'CALL Main_fact' in fact
+
+
+@pytest.mark.optimizer
+@pytest.mark.run(order=5)
+def test_dead_traps(tmp_path):
+    cool_file = tmp_path / 'trap.cl'
+    cool_file.write_text(TRAP_PROGRAM)
+
+    # the unused division and add may trap, they are kept at every level
+    for level in ['0', '1', '2']:
+        sp = run_compiler(cool_file, '-O' + level, '--emit=cil')
+        assert sp.returncode == 0, sp.stdout.decode()
+        main = function_code((tmp_path / 'trap.cil').read_text(), 'Main_main')
+        assert ' / ' in main and ' + ' in main
+
+        sp = run_compiler(cool_file, '-O' + level, '--run')
+        assert 'Division by zero' in sp.stdout.decode()
+        assert 'ok' not in sp.stdout.decode()
+
+
+@pytest.mark.optimizer
+@pytest.mark.run(order=5)
+def test_optimization_stats(tmp_path):
+    cool_file = tmp_path / 'fold.cl'
+    cool_file.write_text(PROGRAM)
+
+    sp = run_compiler(cool_file, '-O2', '--stats')
+    assert sp.returncode == 0, sp.stdout.decode()
+    assert sp.stdout.decode() == '', 'Nothing but errors may be printed to stdout'
+
+    stats = sp.stderr.decode()
+    assert 'optimization level -O2' in stats
+    for name in PASSES:
+        assert name in stats
+
+
+@pytest.mark.optimizer
+@pytest.mark.run(order=5)
+def test_unknown_optimization_level(tmp_path):
+    cool_file = tmp_path / 'fold.cl'
+    cool_file.write_text(PROGRAM)
+
+    sp = run_compiler(cool_file, '-O3')
+    assert sp.returncode == 1
+    assert 'CompilerError' in sp.stdout.decode()
@@ -0,0 +1,58 @@
+import pytest
+
+from utils import run_compiler
+
+
+CLASSES = 200
+CLASS = '''
+class C%(i)d inherits %(parent)s {
+    x%(i)d : Int <- %(i)d;
+    f%(i)d(a : Int) : Int { let y : Int <- a * x%(i)d in if y < 10 then y + 1 else y - 1 fi };
+    g%(i)d() : Object { case self of c : C0 => c.f0(1); o : Object => %(error)s; esac };
+};
+'''
+MAIN = '''
+class Main inherits IO {
+    main() : Object { out_int((new C%d).f0(2)) };
+};
+'''
+
+
+def program(errors):
+    classes = [CLASS % {
+        'i': i,
+        'parent': 'C%d' % ((i - 1) // 3) if i else 'IO',
+        'error': 'undefined%d' % i if errors and i % 7 == 0 else 'o',
+    } for i in range(CLASSES)]
+    return ''.join(classes) + MAIN % (CLASSES - 1)
+
+
+@pytest.mark.parallel
+@pytest.mark.run(order=5)
+def test_parallel_artifacts(tmp_path):
+    cool_file = tmp_path / 'classes.cl'
+    cool_file.write_text(program(errors=False))
+
+    artifacts = {}
+    for jobs in ['1', '3']:
+        sp = run_compiler(cool_file, '--emit=typed-ast,cil', '--jobs', jobs)
+        assert sp.returncode == 0, sp.stdout.decode()[-1000:]
+        artifacts[jobs] = [(tmp_path / ('classes.' + artifact)).read_text() for artifact in ['typed-ast', 'cil']]
+
+    assert artifacts['1'] == artifacts['3']
+
+
+@pytest.mark.parallel
+@pytest.mark.run(order=5)
+def test_parallel_errors(tmp_path):
+    cool_file = tmp_path / 'classes.cl'
+    cool_file.write_text(program(errors=True))
+
+    outputs = {}
+    for jobs in ['1', '3']:
+        sp = run_compiler(cool_file, '--jobs', jobs)
+        assert sp.returncode == 1
+        outputs[jobs] = sp.stdout.decode()
+
+    assert outputs['1'].count('NameError') == len(range(0, CLASSES, 7))
+    assert outputs['1'] == outputs['3']
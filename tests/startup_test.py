@@ -0,0 +1,84 @@
+import pytest
+import subprocess
+import sys
+
+src_dir = __file__.rpartition('/')[0] + '/../src/'
+
+# Every module the compiler imports on its way from source text to .mips
+COMPILER_MODULES = [
+    'main',
+    'parsing.cool_grammar',
+    'parsing.lexical_analizer',
+    'parsing.shift_reduce_parsers',
+    'cmp.evaluation',
+    'semantic.type_collector',
+    'semantic.type_builder',
+    'semantic.type_checker',
+    'code_gen.cil_builder',
+    'code_gen.mips_builder',
+    'code_gen.mips_writer',
+    'code_gen.runtime',
+    'code_gen.incremental',
+    'code_gen.cil_optimizer',
+    'code_gen.cil_cfg',
+    'code_gen.cil_dataflow',
+    'cmp.cil',
+    'cmp.limits',
+]
+NOTEBOOK_MODULES = ['IPython', 'nbformat', 'cmp.nbpackage']
+
+# Packages of the compiler phases, `pipeline` imports them when a phase runs
+PHASE_PACKAGES = ['parsing', 'semantic', 'code_gen']
+
+# A program with a lexical error, the compiler stops before parsing it
+LEXICAL_ERROR = 'class Main { main() : Int { 0 } ; } #'
+
+
+def import_times(modules):
+    sp = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)],
+        cwd=src_dir, capture_output=True, timeout=100)
+    assert sp.returncode == 0, sp.stderr.decode()
+
+    times = {}
+    for line in sp.stderr.decode().split('\n')[1:]:
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(cumulative), not name.startswith('  '))
+    return times
+
+
+@pytest.mark.startup
+@pytest.mark.run(order=0)
+def test_no_notebook_tooling():
+    times = import_times(COMPILER_MODULES)
+    loaded = [name for name in times if name.split('.')[0] in NOTEBOOK_MODULES or name in NOTEBOOK_MODULES]
+    assert not loaded, 'Notebook tooling imported by the compiler: %s' % ', '.join(loaded)
+
+
+def loaded_modules(code):
+    # modules loaded after running `code`, written to stderr (the compiler prints to stdout)
+    sp = subprocess.run([sys.executable, '-c', code + '\nimport sys\nprint(*sys.modules, file=sys.stderr)'],
+        cwd=src_dir, capture_output=True, timeout=100)
+    return sp.stderr.decode().split()
+
+
+@pytest.mark.startup
+@pytest.mark.run(order=0)
+def test_phases_imported_on_demand(tmp_path):
+    loaded = [name for name in loaded_modules('import main') if name.split('.')[0] in PHASE_PACKAGES]
+    assert not loaded, 'Phases imported by main: %s' % ', '.join(loaded)
+
+    cool_file = tmp_path / 'lexical.cl'
+    cool_file.write_text(LEXICAL_ERROR)
+    loaded = loaded_modules('\n'.join([
+        'import main',
+        'from pathlib import Path',
+        'try:',
+        '    main.pipeline(Path(%r))' % str(cool_file),
+        'except SystemExit:',
+        '    pass',
+    ]))
+    assert 'parsing.lexical_analizer' in loaded
+    for module in ['parsing.shift_reduce_parsers', 'semantic.type_checker', 'code_gen.cil_builder', 'code_gen.mips_builder']:
+        assert module not in loaded, '%s imported for a program with lexical errors' % module
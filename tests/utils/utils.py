@@ -1,4 +1,6 @@
+import os
 import subprocess
+import sys
 import re
 
 
@@ -11,6 +13,8 @@ BAD_ERROR_FORMAT = '''El error no esta en formato: (<línea>,<columna>) - <tipo_
 UNEXPECTED_ERROR = 'Se esperaba un %s en (%d, %d). Su error fue un %s en (%d, %d)'
 UNEXPECTED_OUTPUT = 'La salida de %s no es la esperada:\n%s\nEsperada:\n%s'
 
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src')
+
 ERROR_FORMAT = r'^\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)\s*-\s*(\w+)\s*:(.*)$'
 
 def parse_error(error: str):
@@ -43,6 +47,13 @@ def get_file_name(path: str):
     except ValueError:
         return path
 
+def run_compiler(cool_file, *args, input=None, timeout=100):
+    try:
+        return subprocess.run([sys.executable, 'main.py', str(cool_file), *args], cwd=SRC_DIR,
+            input=input, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        assert False, COMPILER_TIMEOUT
+
 def compare_errors(compiler_path: str, cool_file_path: str, error_file_path: str, cmp=first_error, timeout=100):
     try:
         sp = subprocess.run(['bash', compiler_path, cool_file_path], capture_output=True, timeout=timeout)
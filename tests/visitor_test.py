@@ -0,0 +1,90 @@
+import pytest
+import sys
+
+src_dir = __file__.rpartition('/')[0] + '/../src/'
+sys.path.insert(0, src_dir)
+
+import cmp.visitor as visitor
+
+
+class Node:
+    pass
+
+
+class Expr(Node):
+    pass
+
+
+class Leaf(Expr):
+    pass
+
+
+class Named:
+    pass
+
+
+class NamedLeaf(Leaf, Named):
+    pass
+
+
+class Other:
+    pass
+
+
+class Printer:
+    @visitor.on('node')
+    def visit(self, node):
+        pass
+
+    @visitor.when(Node)
+    def visit(self, node):
+        return 'node'
+
+    @visitor.when(Expr)
+    def visit(self, node):
+        return 'expr'
+
+    @visitor.when(Named)
+    def visit(self, node):
+        return 'named'
+
+
+@pytest.mark.visitor
+@pytest.mark.run(order=5)
+def test_most_specific_handler():
+    printer = Printer()
+    assert printer.visit(Node()) == 'node'
+    assert printer.visit(Expr()) == 'expr'
+    # a class without a handler takes the first one of its MRO, not the
+    # results of every handler of a superclass
+    assert printer.visit(Leaf()) == 'expr'
+    assert printer.visit(NamedLeaf()) == 'expr'
+    assert printer.visit(Named()) == 'named'
+
+
+@pytest.mark.visitor
+@pytest.mark.run(order=5)
+def test_no_handler():
+    # the function decorated with `on` runs when nothing matches
+    assert Printer().visit(Other()) is None
+
+
+@pytest.mark.visitor
+@pytest.mark.run(order=5)
+def test_handler_added_later():
+    class Visitor:
+        @visitor.on('node')
+        def visit(self, node):
+            return 'default'
+
+        @visitor.when(Node)
+        def visit(self, node):
+            return 'node'
+
+    dispatcher = Visitor.visit.dispatcher
+    assert Visitor().visit(Leaf()) == 'node'
+    assert Visitor().visit(Other()) == 'default'
+
+    # handlers resolved before are looked up again
+    dispatcher.add_target(Leaf, lambda self, node: 'leaf')
+    assert Visitor().visit(Leaf()) == 'leaf'